@@ -0,0 +1,300 @@
+"""
+DevBridge load-testing harness.
+
+Starts the server under uvicorn (separate process, temporary DB) and drives
+N simulated WebSocket clients against real PTYs running scripted workloads.
+Reports throughput, echo latency, server CPU/RSS, DB write volume and
+dropped chunks as JSON. Linux only (reads /proc), no network access needed.
+
+    python benchmarks/run.py --clients 4 --duration 10
+    python benchmarks/run.py --workloads echo --out after.json --baseline before.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import websockets
+
+ROOT = Path(__file__).resolve().parent.parent
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+BURST_SCRIPT = r"""
+import random, sys, time
+random.seed(1)
+words = "thinking reading editing running tests applying patch done".split()
+while True:
+    for _ in range(random.randint(5, 60)):
+        line = " ".join(random.choice(words) for _ in range(random.randint(3, 14)))
+        sys.stdout.write(f"\x1b[3{random.randint(1, 6)}m●\x1b[0m {line} ── \U0001f916\n")
+    sys.stdout.flush()
+    time.sleep(random.uniform(0.05, 0.3))
+"""
+
+WORKLOADS = ("yes", "cat", "echo", "burst")
+
+
+# ----- serwer -----
+class Server:
+    def __init__(self, workdir: Path) -> None:
+        self.workdir = workdir
+        self.port = _free_port()
+        self.db_path = workdir / "bench.sqlite3"
+        self.proc: subprocess.Popen | None = None
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> None:
+        env = dict(os.environ, DB_PATH=str(self.db_path), METRICS_TOKEN="bench")
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "webterm.main:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning"],
+            cwd=ROOT,
+            env=env,
+        )
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            try:
+                self.get("/api/sessions")
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError("Server did not start")
+
+    def stop(self) -> None:
+        if self.proc:
+            self.proc.terminate()
+            self.proc.wait(timeout=10)
+
+    def request(self, method: str, path: str, body: dict | None = None) -> dict:
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method=method)
+        req.add_header("Content-Type", "application/json")
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return json.loads(resp.read())
+
+    def get(self, path: str) -> dict:
+        return self.request("GET", path)
+
+    def metrics(self) -> dict[str, float]:
+        """Sum /metrics samples per metric name (labels collapsed)."""
+        req = urllib.request.Request(self.base + "/metrics", headers={"Authorization": "Bearer bench"})
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            text = resp.read().decode()
+        out: dict[str, float] = {}
+        for line in text.splitlines():
+            if not line or line.startswith("#"):
+                continue
+            name_labels, value = line.rsplit(" ", 1)
+            name = name_labels.split("{", 1)[0]
+            out[name] = out.get(name, 0.0) + float(value)
+        return out
+
+    def cpu_seconds(self) -> float:
+        fields = Path(f"/proc/{self.proc.pid}/stat").read_text().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLK_TCK
+
+    def rss_bytes(self) -> int:
+        return int(Path(f"/proc/{self.proc.pid}/statm").read_text().split()[1]) * PAGE_SIZE
+
+    def db_bytes(self) -> int:
+        total = 0
+        for suffix in ("", "-wal"):
+            p = Path(str(self.db_path) + suffix)
+            if p.exists():
+                total += p.stat().st_size
+        return total
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    data = sorted(values)
+    return round(data[min(len(data) - 1, int(q * len(data)))], 3)
+
+
+# ----- klienci -----
+async def _client(server: Server, workload: str, duration: float, workdir: Path) -> dict:
+    sid = server.request("POST", "/api/sessions", {"cwd": str(workdir), "shell": "/bin/sh", "cols": 120, "rows": 30})["id"]
+    received = 0
+    latencies: list[float] = []
+    uri = f"ws://127.0.0.1:{server.port}/ws/terminal/{sid}"
+    try:
+        async with websockets.connect(uri, max_size=None) as ws:
+            await asyncio.sleep(0.3)  # prompt
+            command = {
+                "yes": "yes devbridge-benchmark-line\n",
+                "cat": f"while true; do cat {workdir / 'big.txt'}; done\n",
+                "burst": f"{sys.executable} {workdir / 'burst.py'}\n",
+                "echo": "cat\n",
+            }[workload]
+            await ws.send(json.dumps({"type": "input", "data": command}))
+
+            end = time.perf_counter() + duration
+            if workload == "echo":
+                await asyncio.sleep(0.3)
+                i = 0
+                while time.perf_counter() < end:
+                    ch = "abcdefghijklmnopqrstuvwxyz"[i % 26]
+                    i += 1
+                    t0 = time.perf_counter()
+                    await ws.send(json.dumps({"type": "input", "data": ch}))
+                    while True:
+                        msg = json.loads(await asyncio.wait_for(ws.recv(), timeout=5))
+                        received += len(msg.get("data", ""))
+                        if ch in msg.get("data", ""):
+                            latencies.append((time.perf_counter() - t0) * 1000)
+                            break
+                    await asyncio.sleep(0.03)
+            else:
+                while (left := end - time.perf_counter()) > 0:
+                    try:
+                        msg = json.loads(await asyncio.wait_for(ws.recv(), timeout=left))
+                    except asyncio.TimeoutError:
+                        break
+                    received += len(msg.get("data", ""))
+            await ws.send(json.dumps({"type": "input", "data": "\x03"}))
+    finally:
+        server.request("DELETE", f"/api/sessions/{sid}")
+    return {"received": received, "latencies": latencies}
+
+
+async def _sample_resources(server: Server, stop: asyncio.Event, peak: dict) -> None:
+    while not stop.is_set():
+        peak["rss"] = max(peak["rss"], server.rss_bytes())
+        await asyncio.sleep(0.25)
+
+
+async def run_workload(server: Server, workload: str, clients: int, duration: float, workdir: Path) -> dict:
+    m0 = server.metrics()
+    cpu0 = server.cpu_seconds()
+    db0 = server.db_bytes()
+    peak = {"rss": server.rss_bytes()}
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(_sample_resources(server, stop, peak))
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*[_client(server, workload, duration, workdir) for _ in range(clients)])
+    elapsed = time.perf_counter() - t0
+
+    # Liczniki per sesja znikają po zabiciu sesji - DB i CPU czytamy po zakończeniu
+    stop.set()
+    await sampler
+    m1 = server.metrics()
+    cpu = server.cpu_seconds() - cpu0
+    received = sum(r["received"] for r in results)
+    latencies = [x for r in results for x in r["latencies"]]
+    return {
+        "workload": workload,
+        "clients": clients,
+        "elapsed_s": round(elapsed, 3),
+        "received_chars": received,
+        "throughput_chars_per_s": round(received / elapsed, 1),
+        "echo_latency_ms": {"p50": _pct(latencies, 0.5), "p99": _pct(latencies, 0.99), "count": len(latencies)},
+        "server_cpu_s": round(cpu, 3),
+        "server_cpu_percent": round(100 * cpu / elapsed, 1),
+        "server_rss_peak_bytes": peak["rss"],
+        "db_bytes_written": server.db_bytes() - db0,
+        "db_ops": int(m1.get("devbridge_db_op_seconds_count", 0) - m0.get("devbridge_db_op_seconds_count", 0)),
+        # Seria per sesja znika razem z sesją - licznik globalny zostaje
+        "dropped_chunks": int(
+            m1.get("devbridge_dropped_chunks_all_total", 0) - m0.get("devbridge_dropped_chunks_all_total", 0)
+        ),
+        "pty_reads": int(m1.get("devbridge_pty_read_bytes_count", 0) - m0.get("devbridge_pty_read_bytes_count", 0)),
+    }
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    """Percent change of numeric fields per workload (positive = higher than baseline)."""
+    base = {r["workload"]: r for r in baseline.get("results", [])}
+    out = {}
+    for r in current["results"]:
+        b = base.get(r["workload"])
+        if not b:
+            continue
+        diff = {}
+        for key in ("throughput_chars_per_s", "server_cpu_s", "server_rss_peak_bytes", "db_bytes_written", "dropped_chunks"):
+            if b.get(key):
+                diff[key] = round(100 * (r[key] - b[key]) / b[key], 1)
+        for q in ("p50", "p99"):
+            now, before = r["echo_latency_ms"][q], b["echo_latency_ms"].get(q)
+            if now is not None and before:
+                diff[f"echo_latency_{q}"] = round(100 * (now - before) / before, 1)
+        out[r["workload"]] = diff
+    return out
+
+
+async def main(args: argparse.Namespace) -> dict:
+    workloads = [w for w in args.workloads.split(",") if w]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        raise SystemExit(f"Unknown workloads: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory(prefix="devbridge-bench-") as tmp:
+        workdir = Path(tmp)
+        (workdir / "burst.py").write_text(BURST_SCRIPT)
+        line = "lorem ipsum dolor sit amet \x1b[1mconsectetur\x1b[0m adipiscing elit 0123456789\n"
+        (workdir / "big.txt").write_text(line * (args.cat_mb * 1024 * 1024 // len(line)))
+
+        server = Server(workdir)
+        server.start()
+        try:
+            results = []
+            for w in workloads:
+                print(f"running {w} x{args.clients} for {args.duration}s...", file=sys.stderr)
+                results.append(await run_workload(server, w, args.clients, args.duration, workdir))
+        finally:
+            server.stop()
+
+    report = {
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "git": _git_rev(),
+        "results": results,
+    }
+    if args.baseline:
+        report["vs_baseline_percent"] = compare(report, json.loads(Path(args.baseline).read_text()))
+    return report
+
+
+def _git_rev() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--clients", type=int, default=4, help="simulated WebSocket clients (one session each)")
+    p.add_argument("--duration", type=float, default=10.0, help="seconds per workload")
+    p.add_argument("--workloads", default=",".join(WORKLOADS), help=f"comma separated: {','.join(WORKLOADS)}")
+    p.add_argument("--cat-mb", type=int, default=8, help="size of the file used by the cat workload")
+    p.add_argument("--out", help="write JSON report to this file")
+    p.add_argument("--baseline", help="earlier JSON report to compare against")
+    args = p.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    print(text)
@@ -0,0 +1,34 @@
+import asyncio
+import json
+
+from webterm.batch import BatchRunner
+
+
+def _events(run) -> list[str]:
+    return [frame.split("\n")[1].removeprefix("event: ") for frame in run.events]
+
+
+def test_cancel_before_start_finishes_the_run(tmp_path):
+    async def run():
+        runner = BatchRunner()
+        batch = runner.start("true", [{"name": "p", "path": str(tmp_path)}], 1, 10)
+        assert runner.cancel(batch.id)
+        await asyncio.sleep(0.01)
+        assert batch.status == "cancelled" and batch.finished_at is not None
+        assert _events(batch) == ["summary"]
+        summary = json.loads(batch.events[-1].split("data: ", 1)[1])
+        assert summary["unfinished"] == 1
+
+    asyncio.run(run())
+
+
+def test_finished_run_emits_one_summary(tmp_path):
+    async def run():
+        runner = BatchRunner()
+        batch = runner.start("true", [{"name": "p", "path": str(tmp_path)}], 1, 10)
+        await batch.task
+        await asyncio.sleep(0)
+        assert batch.status == "done"
+        assert _events(batch) == ["started", "result", "summary"]
+
+    asyncio.run(run())
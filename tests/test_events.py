@@ -0,0 +1,57 @@
+from webterm.events import EventLog
+
+
+def test_resume_after_version_in_log():
+    log = EventLog()
+    log.publish("created", "a")
+    v = log.version
+    log.publish("resized", "a", cols=80, rows=24)
+    log.publish("killed", "a")
+    assert [e.type for e in log.since(v)] == ["resized", "killed"]
+    assert log.since(log.version) == []
+
+
+def test_resume_after_restart_resyncs():
+    before = EventLog(start=1_000)
+    for _ in range(57):
+        before.publish("activity", "a")
+    last_seen = before.version
+
+    # Restart: new log, numbering continues from a later boot time
+    after = EventLog()
+    assert after.version > last_seen
+    assert after.since(last_seen) is None
+    after.publish("created", "b")
+    assert after.since(last_seen) is None
+    assert [e.type for e in after.since(after.version - 1)] == ["created"]
+
+
+def test_version_from_the_future_resyncs():
+    # Client saw more events than this log ever issued (clock went back, old boot)
+    log = EventLog(start=100)
+    log.publish("created", "a")
+    assert log.since(500) is None
+
+
+def test_gap_resyncs():
+    log = EventLog(maxlen=2, start=0)
+    for _ in range(5):
+        log.publish("activity", "a")
+    assert log.since(1) is None
+    assert len(log.since(3)) == 2
+
+
+def test_activity_stays_out_of_the_versioned_log():
+    log = EventLog(maxlen=3, start=0)
+    log.publish("created", "a")
+    for _ in range(100):
+        log.touch("a", last_activity_at=1.0)
+    # Wersje się nie zmieniły - klient wznawia bez pełnej synchronizacji
+    assert log.version == 1 and [e.type for e in log.since(0)] == ["created"]
+    seq = log.activity_seq
+    assert log.activity_since(0) == [("a", {"last_activity_at": 1.0})]
+    assert log.activity_since(seq) == []
+    log.touch("a", last_activity_at=2.0)
+    assert log.activity_since(seq) == [("a", {"last_activity_at": 2.0})]
+    log.publish("exited", "a")
+    assert log.activity_since(0) == []
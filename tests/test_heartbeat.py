@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from webterm.db import DB
+from webterm.heartbeat import Heartbeat, Peer
+from webterm.terminal_manager import Output, TerminalManager
+
+
+def _peer(queues=(), pings=None, closed=None) -> Peer:
+    return Peer(
+        "terminal",
+        lambda: list(queues),
+        lambda at: pings.append(at) if pings is not None else None,
+        lambda: closed.append(True) if closed is not None else None,
+    )
+
+
+def test_timeout_covers_at_least_two_pings():
+    hb = Heartbeat()
+    hb.configure({"ws_ping_interval_seconds": 30, "ws_ping_timeout_seconds": 10})
+    assert hb.timeout == 60
+
+
+def test_sweep_pings_live_peers_and_returns_silent_ones():
+    hb = Heartbeat()
+    hb.timeout = 60
+    pings: list[float] = []
+    live, dead = _peer(pings=pings), _peer(pings=pings)
+    dead.last_seen = time.monotonic() - 61
+    hb.register(live)
+    hb.register(dead)
+    assert hb.sweep() == [dead]
+    assert len(pings) == 1  # martwy nie dostaje już pinga
+    assert hb.peers == {live}
+
+
+def test_pong_keeps_peer_alive():
+    hb = Heartbeat()
+    hb.timeout = 60
+    p = _peer()
+    p.last_seen = time.monotonic() - 61
+    p.seen()
+    hb.register(p)
+    assert hb.sweep() == []
+
+
+def test_reclaim_drops_subscription_and_frees_queue(tmp_path):
+    async def run():
+        tm = TerminalManager(DB(str(tmp_path / "t.sqlite3")))
+        q = await tm.subscribe("s")
+        other = await tm.subscribe("s")
+        q.put_nowait(Output(3, "abc"))
+        q.put_nowait(Output(7, "żółw"))
+        tm.stalled[q] = 0
+        tm.hidden[q] = 0
+        closed: list[bool] = []
+        peer = _peer(queues=[("s", q)], closed=closed)
+        peer.last_seen = time.monotonic() - tm.heartbeat.timeout - 1
+        tm.heartbeat.register(peer)
+
+        tm._heartbeat()
+
+        assert closed == [True]
+        assert tm.subscribers["s"] == {other}
+        assert q.empty()
+        assert q not in tm.stalled and q not in tm.hidden
+        assert tm.heartbeat.reclaimed_connections == 1
+        assert tm.heartbeat.reclaimed_bytes == 3 + len("żółw".encode("utf-8"))
+        assert peer not in tm.heartbeat.peers
+
+    asyncio.run(run())
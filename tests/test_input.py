@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from webterm.db import DB
+from webterm.scrollback import Scrollback
+from webterm.terminal_manager import InputAck, Session, TerminalManager
+
+
+class _SlowPty:
+    """Accepts at most ``room`` bytes per write, like a full PTY input buffer."""
+
+    def __init__(self, room: int) -> None:
+        self.room = room
+        self.written = b""
+
+    def write(self, data: bytes) -> int:
+        n = min(self.room, len(data))
+        self.written += data[:n]
+        return n
+
+
+def test_partial_write_acks_only_complete_messages(tmp_path):
+    async def run():
+        tm = TerminalManager(DB(str(tmp_path / "t.sqlite3")))
+        pty = _SlowPty(5)
+        now = time.time()
+        sess = Session("s", "/tmp", "/bin/sh", 80, 24, now, now, "running", Scrollback(1000), pty, None)
+        q = asyncio.Queue()
+        sess.inbox = [(b"abc", None, InputAck(1, q)), (b"defg", None, InputAck(2, q)), (b"h", None, InputAck(3, q))]
+        tm._flush_input(sess)
+        assert pty.written == b"abcde"
+        assert [q.get_nowait().seq for _ in range(q.qsize())] == [1]
+        pty.room = 100
+        await asyncio.sleep(0.05)
+        assert pty.written == b"abcdefgh"
+        assert [q.get_nowait().seq for _ in range(q.qsize())] == [2, 3]
+
+    asyncio.run(run())
@@ -0,0 +1,22 @@
+from pathlib import Path
+
+from webterm import isolation
+from webterm.isolation import CgroupManager, PreparedLimits, SessionLimits
+
+
+def test_prepare_resolves_everything_for_the_child(tmp_path):
+    limits = SessionLimits(cpu_seconds=100, nice=3, cgroup=tmp_path)
+    prepared = limits.prepare()
+    assert prepared.cgroup_procs == bytes(tmp_path / "cgroup.procs")
+    assert [value for _, value, _ in prepared.rlimits] == [(100, 100)]
+    assert prepared.nice == 3 and prepared.nice_error.startswith(b"devbridge: ")
+
+
+def test_no_resource_module_means_no_limits(monkeypatch):
+    # Jak na Windows: moduł się importuje, limity i cgroupy są wyłączone
+    monkeypatch.setattr(isolation, "resource", None)
+    limits = SessionLimits(cpu_seconds=100, nice=3, cgroup=Path("/tmp"))
+    assert limits.prepare() == PreparedLimits()
+    cg = CgroupManager()
+    assert not cg.setup() and cg.error
+    assert cg.create("s", 100, 0, 0) is None and cg.remove("s")
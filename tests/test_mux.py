@@ -0,0 +1,105 @@
+import asyncio
+import json
+import time
+
+from webterm.db import DB
+from webterm.mux import MuxConnection
+from webterm.scrollback import Scrollback
+from webterm.terminal_manager import Session, TerminalManager
+
+
+class _FakeWs:
+    def __init__(self) -> None:
+        self.sent: list[dict] = []
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(json.loads(text))
+
+    def output(self) -> list[dict]:
+        return [m for m in self.sent if m["type"] == "output"]
+
+
+def _setup(tmp_path) -> tuple[TerminalManager, Session, MuxConnection, _FakeWs]:
+    tm = TerminalManager(DB(str(tmp_path / "t.sqlite3")))
+    now = time.time()
+    sess = Session("s", "/tmp", "/bin/sh", 80, 24, now, now, "running", Scrollback(100_000), None, None)
+    tm.sessions["s"] = sess
+    ws = _FakeWs()
+    return tm, sess, MuxConnection(ws, tm), ws
+
+
+def _emit(tm: TerminalManager, sess: Session, chunk: str) -> None:
+    # Tak jak pętla odczytu PTY: najpierw scrollback i offset, potem subskrybenci
+    sess.scrollback.append(chunk)
+    sess.output_offset += len(chunk)
+    tm._broadcast(sess.id, chunk, sess.output_offset)
+
+
+def test_output_waits_for_credit_and_resumes_on_ack(tmp_path):
+    async def run():
+        tm, sess, mux, ws = _setup(tmp_path)
+        await mux.handle({"type": "subscribe", "ch": "s"})
+        ch = mux.channels["s"]
+        ch.credit = 10
+        _emit(tm, sess, "a" * 10)
+        await asyncio.sleep(0.01)
+        assert [m["data"] for m in ws.output()] == ["a" * 10]
+        assert ch.credit == 0 and not ch.has_credit.is_set()
+
+        _emit(tm, sess, "bbb")
+        await asyncio.sleep(0.01)
+        assert len(ws.output()) == 1  # okno wyczerpane - nic więcej nie idzie
+
+        await mux.handle({"type": "ack", "ch": "s", "chars": 10})
+        await asyncio.sleep(0.01)
+        assert ws.output()[-1] == {"type": "output", "ch": "s", "data": "bbb", "offset": 13}
+        assert ch.credit == 7
+        await mux.handle({"type": "unsubscribe", "ch": "s"})
+        assert not tm.subscribers["s"]
+
+    asyncio.run(run())
+
+
+def test_ack_never_grows_credit_past_the_window(tmp_path):
+    async def run():
+        tm, sess, mux, ws = _setup(tmp_path)
+        await mux.handle({"type": "subscribe", "ch": "s"})
+        ch = mux.channels["s"]
+        window = ch.credit
+        await mux.handle({"type": "ack", "ch": "s", "chars": 10 * window})
+        await mux.handle({"type": "ack", "ch": "s", "chars": -5})
+        assert ch.credit == window
+        await mux.unsubscribe("s")
+
+    asyncio.run(run())
+
+
+def test_overflowed_channel_resyncs_without_gaps(tmp_path):
+    async def run():
+        tm, sess, mux, ws = _setup(tmp_path)
+        await mux.handle({"type": "subscribe", "ch": "s"})
+        ch = mux.channels["s"]
+        ch.credit = 0
+        ch.has_credit.clear()
+        chunks = [f"{i:04d}\n" for i in range(ch.queue.maxsize + 50)]
+        for c in chunks:
+            _emit(tm, sess, c)
+        await asyncio.sleep(0.01)
+        assert ch.queue in tm.stalled
+        assert ws.output() == []
+
+        await mux.handle({"type": "ack", "ch": "s", "chars": 1 << 30})
+        await asyncio.sleep(0.05)
+        assert ch.queue not in tm.stalled
+        out = ws.output()
+        # Zgubione przy pełnej kolejce kawałki dosłane z scrollbacku, bez dziur i dubli
+        assert "".join(m["data"] for m in out) == "".join(chunks)
+        assert out[-1]["offset"] == sess.output_offset
+
+        # Po dogonieniu wyjście płynie dalej normalnie
+        _emit(tm, sess, "tail\n")
+        await asyncio.sleep(0.01)
+        assert ws.output()[-1]["data"] == "tail\n"
+        await mux.unsubscribe("s")
+
+    asyncio.run(run())
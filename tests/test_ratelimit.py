@@ -0,0 +1,29 @@
+from webterm.ratelimit import OutputLimiter
+
+
+def _limiter() -> OutputLimiter:
+    lim = OutputLimiter()
+    lim.configure({"output_rate_limit_user_chars": 100, "output_burst_seconds": 1})
+    return lim
+
+
+def test_logged_in_sessions_share_the_users_bucket():
+    lim = _limiter()
+    a = OutputLimiter.owner_key("alice", "10.0.0.1")
+    b = OutputLimiter.owner_key("alice", "10.0.0.2")
+    assert a == b == "alice"
+    assert lim.admit("s1", a, 100, True)
+    assert not lim.admit("s2", b, 100, True)
+
+
+def test_anonymous_sessions_are_limited_per_client_address():
+    lim = _limiter()
+    one = OutputLimiter.owner_key(None, "10.0.0.1")
+    other = OutputLimiter.owner_key(None, "10.0.0.2")
+    assert lim.admit("s1", one, 100, True)
+    # Inny klient ma własny kubełek, ten sam adres dzieli go z poprzednią sesją
+    assert lim.admit("s2", other, 100, True)
+    assert not lim.admit("s3", one, 100, True)
+    # Adres nie trafia do kubełka użytkownika o tej samej nazwie
+    assert OutputLimiter.owner_key(None, "alice") != OutputLimiter.owner_key("alice", None)
+    assert OutputLimiter.owner_key(None, None) is None
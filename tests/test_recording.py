@@ -0,0 +1,38 @@
+import gzip
+import json
+
+from webterm import recording
+from webterm.recording import Recorder, RecordingWriter
+
+
+def _events(path):
+    with gzip.open(path / "part-0000.cast.gz", "rt") as f:
+        return [json.loads(line) for line in f.read().splitlines()[1:]]
+
+
+def test_backlog_requests_flush_and_overflow_leaves_marker(tmp_path, monkeypatch):
+    monkeypatch.setattr(recording, "FLUSH_CHARS", 10)
+    monkeypatch.setattr(recording, "MAX_PENDING_CHARS", 20)
+    rec = Recorder(tmp_path / "s", cols=80, rows=24, shell="/bin/sh")
+    woken = []
+    rec.on_backlog = lambda: woken.append(1)
+    rec.output("a" * 8)
+    assert not woken
+    rec.output("b" * 8)
+    assert woken
+    rec.output("c" * 8)  # 24 >= 20 - następne są pomijane
+    rec.output("d" * 5)
+    rec.close()
+    events = _events(tmp_path / "s")
+    assert [e[2] for e in events if e[1] == "o"] == ["a" * 8, "b" * 8, "c" * 8]
+    assert events[-1][1] == "m" and "5 characters" in events[-1][2]
+
+
+def test_sweep_removes_recordings_of_pruned_sessions(tmp_path):
+    writer = RecordingWriter(tmp_path)
+    for sid in ("kept", "pruned"):
+        rec = Recorder(writer.path(sid), cols=80, rows=24, shell="/bin/sh")
+        rec.output("x")
+        rec.close()
+    assert writer.sweep({"kept"}) == 1
+    assert writer.exists("kept") and not writer.exists("pruned")
@@ -0,0 +1,101 @@
+import asyncio
+
+from webterm.scheduler import Scheduler
+
+
+def test_jobs_run_in_deadline_order():
+    async def run():
+        s = Scheduler()
+        fired = []
+        s.call_later(0.03, "c", lambda: fired.append("c"))
+        s.call_later(0.01, "a", lambda: fired.append("a"))
+        s.call_later(0.02, "b", lambda: fired.append("b"))
+        await asyncio.sleep(0.08)
+        assert fired == ["a", "b", "c"]
+        assert len(s) == 0
+
+    asyncio.run(run())
+
+
+def test_rekey_replaces_earlier_deadline():
+    async def run():
+        s = Scheduler()
+        fired = []
+        s.call_later(0.01, "k", lambda: fired.append("old"))
+        s.call_later(0.05, "k", lambda: fired.append("new"))
+        assert len(s) == 1
+        await asyncio.sleep(0.03)
+        assert fired == []  # stary termin przepadł razem z poprzednim zadaniem
+        await asyncio.sleep(0.05)
+        assert fired == ["new"]
+
+    asyncio.run(run())
+
+
+def test_rekey_to_earlier_deadline_rearms():
+    async def run():
+        s = Scheduler()
+        fired = []
+        s.call_later(10.0, "k", lambda: fired.append("late"))
+        s.call_later(0.01, "k", lambda: fired.append("early"))
+        await asyncio.sleep(0.05)
+        assert fired == ["early"]
+        assert not s.scheduled("k")
+
+    asyncio.run(run())
+
+
+def test_cancel_skips_job_and_keeps_others():
+    async def run():
+        s = Scheduler()
+        fired = []
+        s.call_later(0.01, "a", lambda: fired.append("a"))
+        s.call_later(0.02, "b", lambda: fired.append("b"))
+        s.cancel("a")
+        s.cancel("missing")  # nieznany klucz to nie błąd
+        assert not s.scheduled("a") and s.scheduled("b")
+        await asyncio.sleep(0.05)
+        assert fired == ["b"]
+
+    asyncio.run(run())
+
+
+def test_every_repeats_until_cancelled():
+    async def run():
+        s = Scheduler()
+        ticks = []
+        s.every(0.01, "tick", lambda: ticks.append(1), first=0.0)
+        await asyncio.sleep(0.055)
+        s.cancel("tick")
+        n = len(ticks)
+        assert n >= 3
+        await asyncio.sleep(0.03)
+        assert len(ticks) == n
+
+    asyncio.run(run())
+
+
+def test_failing_job_does_not_stop_the_heap():
+    async def run():
+        s = Scheduler()
+        fired = []
+        s.call_later(0.01, "bad", lambda: 1 / 0)
+        s.call_later(0.01, "good", lambda: fired.append("good"))
+        await asyncio.sleep(0.04)
+        assert fired == ["good"]
+
+    asyncio.run(run())
+
+
+def test_coroutine_jobs_start_as_tasks():
+    async def run():
+        s = Scheduler()
+        done = asyncio.Event()
+
+        async def job():
+            done.set()
+
+        s.call_later(0.0, "co", job)
+        await asyncio.wait_for(done.wait(), 1.0)
+
+    asyncio.run(run())
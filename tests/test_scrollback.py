@@ -0,0 +1,61 @@
+import struct
+import zlib
+
+from webterm.scrollback import Scrollback
+from webterm.spill import SpillStore
+
+
+def _save(sb: Scrollback, saved: dict[int, tuple[int, int, bytes]]) -> bytes:
+    blocks, first, upto = sb.delta()
+    for b in blocks:
+        saved[b[0]] = b
+    for seq in [s for s in saved if s < first]:
+        del saved[seq]
+    sb.mark_saved(upto)
+    return sb.tail_bytes()
+
+
+def test_round_trip_writes_each_block_once():
+    sb = Scrollback(10_000, block_chars=100)
+    saved: dict[int, tuple[int, int, bytes]] = {}
+    sb.append("a" * 550)
+    _save(sb, saved)
+    assert sorted(saved) == [0, 1, 2, 3, 4]
+
+    sb.append("b" * 230)
+    blocks, _, _ = sb.delta()
+    assert [b[0] for b in blocks] == [5, 6]
+    tail = _save(sb, saved)
+
+    back = Scrollback.from_bytes(tail, 10_000, [saved[s] for s in sorted(saved)])
+    assert back.text() == sb.text()
+    # Po wczytaniu nic nie czeka na zapis, nowe bloki dostają dalsze numery
+    assert back.delta()[0] == []
+    back.block_chars = 100
+    back.append("c" * 100)
+    assert [b[0] for b in back.delta()[0]] == [7]
+
+
+def test_dropped_blocks_are_reported_and_spilled_ones_not_reread(tmp_path):
+    sb = Scrollback(300, block_chars=100)
+    saved: dict[int, tuple[int, int, bytes]] = {}
+    sb.append("x" * 1000)
+    _save(sb, saved)
+    assert min(saved) == sb.blocks[0].seq
+
+    store = SpillStore(tmp_path)
+    sb.spill(store, "s")
+    store.drop("s")  # zapisane bloki nie mogą być już czytane
+    assert sb.delta()[0] == []
+
+
+def test_legacy_blob_loads_and_is_saved_as_blocks():
+    records = [("old" * 40, 1), ("tail", 1)]
+    blob = b"SB1\n"
+    for text, _ in records:
+        data = zlib.compress(text.encode())
+        blob += struct.pack(">II", len(text), len(data)) + data
+    sb = Scrollback.from_bytes(blob, 10_000)
+    assert sb.text() == "old" * 40 + "tail"
+    blocks, first, _ = sb.delta()
+    assert [b[0] for b in blocks] == [0] and first == 0
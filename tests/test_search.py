@@ -0,0 +1,58 @@
+import pytest
+
+from webterm.db import DB
+from webterm.search import PRUNE_STEP, ScrollbackIndexer
+
+
+def _offsets(db: DB, sid: str) -> list[int]:
+    rows = db.fetchall("SELECT start_offset FROM scrollback_segments WHERE session_id = ?", (sid,))
+    return sorted(r["start_offset"] for r in rows)
+
+
+def test_prune_keeps_only_the_scrollback_window(tmp_path):
+    db = DB(str(tmp_path / "t.sqlite3"))
+    if not db.fts_enabled:
+        pytest.skip("SQLite built without FTS5")
+    idx = ScrollbackIndexer(db, segment_chars=1000)
+    line = "word " * 199 + "\n"
+    offset = 0
+    for _ in range(300):
+        idx.feed("s", offset, line)
+        offset += len(line)
+    idx.flush("s", force=True)
+    assert len(_offsets(db, "s")) == 300
+
+    # Okno przesunęło się za mało - nic nie znika
+    idx.prune("s", PRUNE_STEP // 2)
+    assert len(_offsets(db, "s")) == 300
+
+    window_start = offset - 20_000
+    idx.prune("s", window_start)
+    kept = _offsets(db, "s")
+    assert kept[0] >= window_start - 1000
+    assert kept[-1] > offset - 1000
+    assert len(db.search_scrollback('"word"', session_id="s", limit=500)) == len(kept)
+
+
+def test_drop_forgets_pending_output(tmp_path):
+    db = DB(str(tmp_path / "t.sqlite3"))
+    idx = ScrollbackIndexer(db)
+    idx.feed("s", 0, "pending")
+    idx.drop("s")
+    idx.flush(force=True)
+    assert _offsets(db, "s") == []
+
+
+def test_forced_flush_keeps_escape_sequences_whole(tmp_path):
+    db = DB(str(tmp_path / "t.sqlite3"))
+    if not db.fts_enabled:
+        pytest.skip("SQLite built without FTS5")
+    idx = ScrollbackIndexer(db, segment_chars=20)
+    idx.feed("s", 0, "hello \x1b[3")
+    segments = idx.take(force=True)
+    assert [t for _, _, t in segments] == ["hello"]
+    # Reszta sekwencji przychodzi w następnym kawałku i znika w całości
+    idx.feed("s", 9, "1mworld\x1b[0m " + "abc" * 10)
+    texts = [t for _, _, t in idx.take(force=True)]
+    assert texts and texts[0].startswith("world")
+    assert not any("[" in t or "1m" in t for t in texts)
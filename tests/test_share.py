@@ -0,0 +1,33 @@
+import asyncio
+from dataclasses import dataclass
+
+from webterm.security import make_session_token, make_share_token, parse_session_token, parse_share_token
+from webterm.share import ShareLog
+
+
+@dataclass
+class _Item:
+    offset: int
+
+
+def test_share_and_login_tokens_are_not_interchangeable():
+    share = make_share_token("abc", 1, 60)
+    assert parse_share_token(share) == ("abc", 1)
+    assert parse_session_token(share) is None
+    login = make_session_token("abc")
+    assert parse_session_token(login) == "abc"
+    assert parse_share_token(login) is None
+
+
+def test_append_while_reader_is_busy_ends_its_wait():
+    async def run():
+        log = ShareLog(0)
+        sp = log.join(0)
+        changed = log.changed()
+        assert log.read(sp) == []
+        # Wpis dodany, zanim czytelnik zaczął czekać (np. wysyłał ping)
+        log.append(_Item(5), 5)
+        await asyncio.wait_for(changed.wait(), 1)
+        assert [i.offset for i in log.read(sp)] == [5]
+
+    asyncio.run(run())
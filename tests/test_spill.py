@@ -0,0 +1,32 @@
+from webterm.scrollback import Scrollback
+from webterm.spill import SpillStore
+
+
+def test_spilled_blocks_read_back_through_mmap(tmp_path):
+    sb = Scrollback(5000, block_chars=100)
+    text = "".join(f"{i}\n" for i in range(1500))[-5000:]
+    sb.append(text)
+    before = sb.text()
+    freed = sb.spill(SpillStore(tmp_path), "s")
+    assert freed > 0
+    assert all(b.data is None for b in sb.blocks)
+    assert sb.text() == before
+    assert sb.tail(10) == before[-10:]
+
+
+def test_trimming_compacts_the_spill_file(tmp_path):
+    store = SpillStore(tmp_path)
+    sb = Scrollback(1000, block_chars=100)
+    for i in range(200):
+        sb.append("x" * 100)
+        sb.spill(store, "s")
+    # Zostały tylko bloki okna; martwy prefiks pliku nie rośnie bez końca
+    assert sb.text() == "x" * 1000
+    assert store.size("s") <= sb.spilled_bytes() + 2 * 1024 * 1024
+
+
+def test_store_is_scratch_space(tmp_path):
+    store = SpillStore(tmp_path)
+    store.write("a", b"data")
+    SpillStore(tmp_path)  # nowy start serwera czyści pozostałości
+    assert store.size("a") == 0
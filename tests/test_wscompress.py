@@ -0,0 +1,45 @@
+import json
+import zlib
+
+from webterm.wscompress import Deflater, from_settings
+
+
+def _frames(n: int) -> list[str]:
+    return [json.dumps({"type": "output", "data": f"line {i} " * 20}) for i in range(n)]
+
+
+def test_small_batches_stay_plain_text():
+    d = Deflater("test", min_bytes=256)
+    texts = [json.dumps({"type": "output", "data": "a"})]
+    assert d.encode(texts) == texts
+    assert d.stats.frames_plain == 1 and d.stats.frames_compressed == 0
+    d.close()
+
+
+def test_context_takeover_round_trip():
+    d = Deflater("test", context_takeover=True)
+    inflate = zlib.decompressobj(-15)  # jeden strumień na całe połączenie, jak w przeglądarce
+    for batch in (_frames(3), _frames(5)):
+        data = d.encode(batch)
+        assert isinstance(data, bytes)
+        text = inflate.decompress(data).decode()
+        assert text.endswith("\n\n")
+        assert text[:-2].split("\n") == batch
+    assert d.stats.sent_bytes < d.stats.raw_bytes
+    d.close()
+
+
+def test_independent_frames_without_takeover():
+    d = Deflater("test", context_takeover=False, window_bits=10)
+    batch = _frames(4)
+    for _ in range(2):
+        # Każda ramka to osobny, kompletny strumień
+        assert zlib.decompress(d.encode(batch), -10).decode()[:-2].split("\n") == batch
+    d.close()
+
+
+def test_off_by_default():
+    assert from_settings("terminal", {}) is None
+    d = from_settings("terminal", {"ws_compression_enabled": True})
+    assert isinstance(d, Deflater)
+    d.close()
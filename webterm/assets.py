@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import Request, Response
+
+try:  # opcjonalne: pip install brotli
+    import brotli
+except ImportError:
+    brotli = None
+
+# Pliki, które warto kompresować (obrazki i ikony są już skompresowane)
+_COMPRESSIBLE = {".js", ".css", ".html", ".json", ".svg", ".txt", ".map"}
+_FINGERPRINT = re.compile(r"^(?P<stem>.+)\.(?P<digest>[0-9a-f]{12})(?P<ext>\.[^./]+)$")
+_STATIC_REF = re.compile(r'(?P<attr>href|src)="/static/(?P<name>[^"?#]+)"')
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+@dataclass
+class Asset:
+    data: bytes
+    content_type: str
+    digest: str  # 12 znaków sha256 - w ETag i w nazwie pliku
+    gzip: bytes | None = None
+    br: bytes | None = None
+
+    def variant(self, accept_encoding: str) -> tuple[bytes, str | None]:
+        """Body and Content-Encoding for the client's ``Accept-Encoding``."""
+        accepted = {e.split(";")[0].strip() for e in accept_encoding.lower().split(",")}
+        if self.br is not None and "br" in accepted:
+            return self.br, "br"
+        if self.gzip is not None and "gzip" in accepted:
+            return self.gzip, "gzip"
+        return self.data, None
+
+    def etag(self, encoding: str | None) -> str:
+        # Silny ETag musi się różnić między reprezentacjami
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+
+def _make_asset(data: bytes, name: str) -> Asset:
+    ctype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if name.endswith(".js"):
+        ctype = "application/javascript"
+    if ctype.startswith("text/") or ctype in ("application/javascript", "application/json"):
+        ctype += "; charset=utf-8"
+    asset = Asset(data=data, content_type=ctype, digest=hashlib.sha256(data).hexdigest()[:12])
+    if Path(name).suffix in _COMPRESSIBLE and len(data) > 512:
+        asset.gzip = gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli is not None:
+            asset.br = brotli.compress(data, quality=11)
+    return asset
+
+
+class AssetStore:
+    """Static files and HTML templates, loaded and compressed once at startup.
+
+    Templates reference static files through fingerprinted URLs
+    (``/static/app.<sha256[:12]>.js``) served with ``Cache-Control:
+    immutable``; the plain names still work and are revalidated by ETag.
+    The service worker's cache name and asset list are generated from the
+    same digests, so a deploy invalidates exactly the files that changed.
+    """
+
+    def __init__(self, static_dir: Path, templates_dir: Path) -> None:
+        self.static_dir = static_dir
+        self.templates_dir = templates_dir
+        self.static: dict[str, Asset] = {}
+        self.pages: dict[str, Asset] = {}
+        self.version = ""
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.static)
+
+    def load(self) -> None:
+        static: dict[str, Asset] = {}
+        for path in sorted(self.static_dir.rglob("*")):
+            if path.is_file():
+                name = path.relative_to(self.static_dir).as_posix()
+                static[name] = _make_asset(path.read_bytes(), name)
+        self.static = static
+
+        pages: dict[str, Asset] = {}
+        for path in sorted(self.templates_dir.glob("*.html")):
+            html = _STATIC_REF.sub(self._rewrite_ref, path.read_text(encoding="utf-8"))
+            pages[path.name] = _make_asset(html.encode("utf-8"), path.name)
+        self.pages = pages
+
+        combined = hashlib.sha256()
+        for name, asset in sorted({**static, **pages}.items()):
+            combined.update(f"{name}:{asset.digest}\n".encode())
+        self.version = combined.hexdigest()[:12]
+
+        sw = static.get("sw.js")
+        if sw is not None:
+            self.static["sw.js"] = _make_asset(self._service_worker(sw.data.decode("utf-8")), "sw.js")
+
+    def url(self, name: str) -> str:
+        asset = self.static.get(name)
+        if asset is None:
+            return f"/static/{name}"
+        stem, dot, ext = name.rpartition(".")
+        if not dot:
+            return f"/static/{name}"
+        return f"/static/{stem}.{asset.digest}.{ext}"
+
+    def _rewrite_ref(self, m: re.Match) -> str:
+        name = m.group("name")
+        if name == "sw.js":
+            return m.group(0)
+        return f'{m.group("attr")}="{self.url(name)}"'
+
+    def _service_worker(self, source: str) -> bytes:
+        # Pliki ładowane z JS po stałej nazwie (Worker, importScripts) też idą do cache
+        urls = ["/"] + [self.url(n) for n in self.static if n != "sw.js"]
+        urls += [f"/static/{n}" for n in ("term-worker.js", "inflate.js") if n in self.static]
+        listing = ",\n".join(f"  '{u}'" for u in urls)
+        source = re.sub(r"const CACHE_NAME = '[^']*';", f"const CACHE_NAME = 'devbridge-{self.version}';", source)
+        source = re.sub(r"const STATIC_ASSETS = \[[^\]]*\];", f"const STATIC_ASSETS = [\n{listing}\n];", source)
+        return source.encode("utf-8")
+
+    def lookup(self, name: str) -> tuple[Asset, str] | None:
+        """Asset for a request path below ``/static/`` and its Cache-Control."""
+        if not self.loaded:
+            self.load()
+        asset = self.static.get(name)
+        if asset is not None:
+            return asset, REVALIDATE
+        m = _FINGERPRINT.match(name)
+        if m:
+            asset = self.static.get(m.group("stem") + m.group("ext"))
+            if asset is not None:
+                # Stary odcisk (sprzed wdrożenia) - oddaj aktualną treść, ale bez immutable
+                return asset, IMMUTABLE if asset.digest == m.group("digest") else REVALIDATE
+        return None
+
+    def page(self, name: str) -> Asset:
+        if not self.loaded:
+            self.load()
+        return self.pages[name]
+
+
+def response(request: Request, asset: Asset, cache_control: str) -> Response:
+    """Serve the best precompressed variant; 304 when the client's ETag matches."""
+    body, encoding = asset.variant(request.headers.get("accept-encoding", ""))
+    etag = asset.etag(encoding)
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=asset.content_type, headers=headers)
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import signal
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Znaków wyjścia na projekt w wynikach wsadu (zostaje koniec - tam są błędy)
+OUTPUT_LIMIT = 64 * 1024
+MAX_CONCURRENCY = 16
+# Ile zakończonych wsadów trzymać w pamięci do podglądu
+KEEP_FINISHED = 20
+
+
+def list_projects(base_path: Path) -> list[dict]:
+    """Subdirectories of ``base_path`` (hidden ones skipped), sorted by name."""
+    projects = []
+    for item in base_path.iterdir():
+        if item.is_dir() and not item.name.startswith('.'):
+            # Check if has .git directory
+            has_git = (item / '.git').exists()
+
+            projects.append({
+                'name': item.name,
+                'path': str(item),
+                'hasGit': has_git
+            })
+
+    # Sort by name
+    projects.sort(key=lambda x: x['name'].lower())
+    return projects
+
+
+async def run_command(command: str, cwd: str, timeout: float = 60.0) -> dict:
+    """Run ``command`` in a shell in ``cwd``; the quick-action result dict."""
+    try:
+        # Determine shell based on OS
+        if os.name == "nt":
+            # Windows
+            shell_cmd = ["powershell.exe", "-Command", command]
+        else:
+            # Unix/Linux
+            shell_cmd = ["/bin/bash", "-c", command]
+
+        # Execute command in background with timeout
+        process = await asyncio.create_subprocess_exec(
+            *shell_cmd,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            # Własna grupa procesów - przerwanie zabija też dzieci (git, npm, ...)
+            start_new_session=os.name != "nt",
+        )
+
+        try:
+            # Wait for command to complete
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(),
+                timeout=timeout
+            )
+
+            output = stdout.decode("utf-8", errors="ignore")
+            error_output = stderr.decode("utf-8", errors="ignore")
+
+            # Combine output
+            combined_output = output
+            if error_output:
+                combined_output += "\n" + error_output
+
+            success = process.returncode == 0
+
+            return {
+                "success": success,
+                "exit_code": process.returncode,
+                "output": combined_output.strip(),
+                "error": error_output.strip() if not success else None
+            }
+
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # Kill process if it times out or the caller gave up
+            try:
+                if os.name == "nt":
+                    process.kill()
+                else:
+                    os.killpg(process.pid, signal.SIGKILL)
+                await process.wait()
+            except Exception:
+                pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+
+            return {
+                "success": False,
+                "exit_code": -1,
+                "output": "",
+                "error": f"Command timed out after {timeout:g} seconds"
+            }
+
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        return {
+            "success": False,
+            "exit_code": -1,
+            "output": "",
+            "error": str(e)
+        }
+
+
+@dataclass
+class BatchRun:
+    id: str
+    command: str
+    projects: list[dict]
+    concurrency: int
+    timeout: float
+    status: str = "running"  # running / done / cancelled
+    started_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    results: list[dict] = field(default_factory=list)
+    events: list[str] = field(default_factory=list)  # gotowe ramki SSE; id = numer ramki
+    task: asyncio.Task | None = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def emit(self, type: str, data: dict) -> None:
+        self.events.append(f"id: {len(self.events) + 1}\nevent: {type}\ndata: {json.dumps(data)}\n\n")
+        # Obudź wszystkie strumienie i przygotuj nowe zdarzenie na następną ramkę
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, seen: int, timeout: float) -> None:
+        """Return once there are more than ``seen`` events or ``timeout`` has passed."""
+        if seen < len(self.events):
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def summary(self) -> dict:
+        failed = [r["name"] for r in self.results if not r["success"]]
+        end = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": len(self.projects),
+            "succeeded": len(self.results) - len(failed),
+            "failed": len(failed),
+            "unfinished": len(self.projects) - len(self.results),
+            "failed_projects": failed,
+            "seconds": round(end - self.started_at, 3),
+        }
+
+    def snapshot(self) -> dict:
+        return {**self.summary(), "command": self.command, "concurrency": self.concurrency, "results": self.results}
+
+
+class BatchRunner:
+    """One command fanned out over many project directories (``/api/batch``).
+
+    At most ``concurrency`` projects run at a time. Every run keeps an
+    append-only list of SSE frames - ``started`` and ``result`` per project
+    as they happen, then one ``summary`` - so any number of streams can
+    follow it and resume by ``Last-Event-ID``. ``cancel`` stops the whole
+    batch: running commands are killed and the rest never start.
+    """
+
+    def __init__(self) -> None:
+        self.runs: dict[str, BatchRun] = {}
+
+    def start(self, command: str, projects: list[dict], concurrency: int, timeout: float) -> BatchRun:
+        run = BatchRun(
+            id=uuid.uuid4().hex,
+            command=command,
+            projects=projects,
+            concurrency=max(1, min(MAX_CONCURRENCY, concurrency)),
+            timeout=timeout,
+        )
+        run.task = asyncio.create_task(self._run(run))
+        run.task.add_done_callback(lambda _: self._finished(run))
+        self.runs[run.id] = run
+        finished = [r for r in self.runs.values() if r.status != "running"]
+        for old in sorted(finished, key=lambda r: r.started_at)[:-KEEP_FINISHED]:
+            del self.runs[old.id]
+        return run
+
+    async def _run(self, run: BatchRun) -> None:
+        pending = iter(run.projects)
+
+        async def worker() -> None:
+            # Wspólny iterator - każdy wolny worker bierze następny projekt
+            for project in pending:
+                run.emit("started", {"name": project["name"], "path": project["path"]})
+                t0 = time.monotonic()
+                res = await run_command(run.command, project["path"], run.timeout)
+                result = {
+                    "name": project["name"],
+                    "path": project["path"],
+                    **res,
+                    "output": res["output"][-OUTPUT_LIMIT:],
+                    "seconds": round(time.monotonic() - t0, 3),
+                }
+                run.results.append(result)
+                run.emit("result", result)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(run.concurrency, len(run.projects)))]
+        try:
+            await asyncio.gather(*workers)
+            run.status = "done"
+        except asyncio.CancelledError:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            run.status = "cancelled"
+        finally:
+            run.finished_at = time.time()
+            run.emit("summary", run.summary())
+
+    @staticmethod
+    def _finished(run: BatchRun) -> None:
+        # Anulowanie przed pierwszym krokiem zadania - _run nie wykonał nawet finally
+        if run.finished_at is None:
+            run.status = "cancelled"
+            run.finished_at = time.time()
+            run.emit("summary", run.summary())
+
+    def cancel(self, bid: str) -> bool:
+        run = self.runs.get(bid)
+        if not run or run.status != "running" or not run.task:
+            return False
+        run.task.cancel()
+        return True
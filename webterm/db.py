@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import contextlib
 import json
 import sqlite3
 import threading
@@ -7,6 +8,8 @@ import time
 from pathlib import Path
 from typing import Any
 
+from .metrics import DB_OP_SECONDS
+
 _SCHEMA = """
 PRAGMA journal_mode=WAL;
 
@@ -28,24 +31,73 @@ CREATE TABLE IF NOT EXISTS sessions (
   last_activity_at REAL NOT NULL,
   cols INTEGER NOT NULL,
   rows INTEGER NOT NULL,
-  scrollback TEXT NOT NULL
+  scrollback TEXT NOT NULL -- format sprzed kompresji, nowe wpisy: scrollback_z
 );
 
+CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_created ON sessions(created_at);
+
+-- Zamrożone bloki scrollbacku, zapisywane raz; sessions.scrollback_z trzyma tylko ogon
+CREATE TABLE IF NOT EXISTS scrollback_blocks (
+  session_id TEXT NOT NULL,
+  seq INTEGER NOT NULL,
+  nchars INTEGER NOT NULL,
+  data BLOB NOT NULL,
+  PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+
 CREATE TABLE IF NOT EXISTS app_settings (
   key TEXT PRIMARY KEY,
   value TEXT NOT NULL,
   updated_at REAL NOT NULL
 );
+
+-- Segmenty scrollbacku zaindeksowane w scrollback_fts (rowid = id)
+CREATE TABLE IF NOT EXISTS scrollback_segments (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  session_id TEXT NOT NULL,
+  start_offset INTEGER NOT NULL,
+  created_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_scrollback_segments_session
+  ON scrollback_segments(session_id, start_offset);
 """
 
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS scrollback_fts USING fts5(content);
+"""
+
+# Rozmiar sesji w bazie (w praktyce: scrollback - ogon w wierszu i zapisane bloki)
+_SESSION_BYTES = (
+    "length(scrollback) + COALESCE(length(scrollback_z), 0)"
+    " + COALESCE((SELECT SUM(length(b.data)) FROM scrollback_blocks b WHERE b.session_id = sessions.id), 0)"
+)
+_FINISHED = "status != 'running'"
+
+# Kolumny dodane po 1.0.0: (tabela, kolumna, definicja)
+_MIGRATIONS = [
+    ("sessions", "output_offset", "INTEGER NOT NULL DEFAULT 0"),
+    ("sessions", "scrollback_z", "BLOB"),  # webterm.scrollback.Scrollback.tail_bytes()
+]
+
 
 class DB:
     def __init__(self, path: str) -> None:
         self.path = path
         self._lock = threading.Lock()
+        self.fts_enabled = False
         Path(path).parent.mkdir(parents=True, exist_ok=True)
         self._init()
 
+    @contextlib.contextmanager
+    def _timed(self, op: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            DB_OP_SECONDS.labels(op).observe(time.perf_counter() - t0)
+
     def _conn(self) -> sqlite3.Connection:
         conn = sqlite3.connect(self.path, check_same_thread=False)
         conn.row_factory = sqlite3.Row
@@ -55,13 +107,29 @@ class DB:
         with self._lock:
             conn = self._conn()
             try:
+                # Zwolnione strony oddaje incremental_vacuum() zamiast pełnego VACUUM
+                if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                    if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0]:
+                        # Istniejąca baza: tryb zmienia się dopiero po VACUUM (jednorazowo)
+                        conn.execute("VACUUM")
                 conn.executescript(_SCHEMA)
+                for table, column, ddl in _MIGRATIONS:
+                    cols = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+                    if column not in cols:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+                try:
+                    conn.executescript(_FTS_SCHEMA)
+                    self.fts_enabled = True
+                except sqlite3.OperationalError as e:
+                    # SQLite zbudowany bez FTS5 - wyszukiwanie wyłączone
+                    print(f"Scrollback search disabled: {e}")
                 conn.commit()
             finally:
                 conn.close()
 
     def exec(self, sql: str, params: tuple = ()) -> None:
-        with self._lock:
+        with self._timed("exec"), self._lock:
             conn = self._conn()
             try:
                 conn.execute(sql, params)
@@ -70,7 +138,7 @@ class DB:
                 conn.close()
 
     def fetchone(self, sql: str, params: tuple = ()) -> sqlite3.Row | None:
-        with self._lock:
+        with self._timed("fetchone"), self._lock:
             conn = self._conn()
             try:
                 cur = conn.execute(sql, params)
@@ -79,7 +147,7 @@ class DB:
                 conn.close()
 
     def fetchall(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
-        with self._lock:
+        with self._timed("fetchall"), self._lock:
             conn = self._conn()
             try:
                 cur = conn.execute(sql, params)
@@ -170,12 +238,65 @@ class DB:
         last_activity_at: float,
         cols: int,
         rows: int,
-        scrollback: str,
+        scrollback_z: bytes,
+        output_offset: int = 0,
+        blocks: list[tuple[int, int, bytes]] = (),
+        first_block: int | None = None,
     ) -> None:
-        self.exec(
+        """Zapisz wiersz sesji oraz nowe bloki scrollbacku (``Scrollback.delta``) w jednej transakcji.
+
+        Bloki o numerach poniżej ``first_block`` wypadły ze scrollbacku i są usuwane.
+        """
+        with self._timed("upsert_session"), self._lock:
+            conn = self._conn()
+            try:
+                self._upsert_session(
+                    conn,
+                    session_id,
+                    cwd,
+                    shell,
+                    pid,
+                    status,
+                    created_at,
+                    last_activity_at,
+                    cols,
+                    rows,
+                    scrollback_z,
+                    output_offset,
+                )
+                if blocks:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO scrollback_blocks(session_id,seq,nchars,data) VALUES(?,?,?,?)",
+                        [(session_id, seq, nchars, data) for seq, nchars, data in blocks],
+                    )
+                if first_block is not None:
+                    conn.execute(
+                        "DELETE FROM scrollback_blocks WHERE session_id = ? AND seq < ?",
+                        (session_id, first_block),
+                    )
+                conn.commit()
+            finally:
+                conn.close()
+
+    @staticmethod
+    def _upsert_session(
+        conn: sqlite3.Connection,
+        session_id: str,
+        cwd: str,
+        shell: str,
+        pid: int | None,
+        status: str,
+        created_at: float,
+        last_activity_at: float,
+        cols: int,
+        rows: int,
+        scrollback_z: bytes,
+        output_offset: int,
+    ) -> None:
+        conn.execute(
             """
-            INSERT INTO sessions(id,cwd,shell,pid,status,created_at,last_activity_at,cols,rows,scrollback)
-            VALUES(?,?,?,?,?,?,?,?,?,?)
+            INSERT INTO sessions(id,cwd,shell,pid,status,created_at,last_activity_at,cols,rows,scrollback,scrollback_z,output_offset)
+            VALUES(?,?,?,?,?,?,?,?,?,'',?,?)
             ON CONFLICT(id) DO UPDATE SET
               cwd=excluded.cwd,
               shell=excluded.shell,
@@ -184,7 +305,9 @@ class DB:
               last_activity_at=excluded.last_activity_at,
               cols=excluded.cols,
               rows=excluded.rows,
-              scrollback=excluded.scrollback
+              scrollback='',
+              scrollback_z=excluded.scrollback_z,
+              output_offset=excluded.output_offset
             """,
             (
                 session_id,
@@ -196,12 +319,182 @@ class DB:
                 last_activity_at,
                 cols,
                 rows,
-                scrollback,
+                scrollback_z,
+                output_offset,
             ),
         )
 
+    def mark_running_sessions_stale(self) -> None:
+        self.exec("UPDATE sessions SET status = 'stale' WHERE status = 'running'")
+
     def list_sessions(self) -> list[sqlite3.Row]:
         return self.fetchall("SELECT * FROM sessions ORDER BY created_at DESC")
 
+    def session_ids(self) -> set[str]:
+        return {r["id"] for r in self.fetchall("SELECT id FROM sessions")}
+
+    def get_scrollback_blocks(self, session_id: str) -> list[tuple[int, int, bytes]]:
+        rows = self.fetchall(
+            "SELECT seq, nchars, data FROM scrollback_blocks WHERE session_id = ? ORDER BY seq",
+            (session_id,),
+        )
+        return [(r["seq"], r["nchars"], r["data"]) for r in rows]
+
     def get_session(self, session_id: str) -> sqlite3.Row | None:
-        return self.fetchone("SELECT * FROM sessions WHERE id = ?", (session_id,))
\ No newline at end of file
+        return self.fetchone("SELECT * FROM sessions WHERE id = ?", (session_id,))
+
+    # ----- retencja historii -----
+    def session_history_stats(self) -> dict:
+        r = self.fetchone(f"SELECT COUNT(*) AS n, COALESCE(SUM({_SESSION_BYTES}), 0) AS b FROM sessions WHERE {_FINISHED}")
+        return {"sessions": int(r["n"]), "bytes": int(r["b"])}
+
+    def prune_sessions(self, max_age_seconds: float, max_count: int, max_bytes: int, batch: int = 50) -> list[str]:
+        """Usuń najwyżej ``batch`` zakończonych sesji spoza polityki retencji.
+
+        Najstarsze najpierw, razem z segmentami wyszukiwania, w jednej krótkiej
+        transakcji; zwraca usunięte id. Limit 0 nie jest egzekwowany.
+        """
+        queries: list[tuple[str, tuple]] = []
+        if max_age_seconds > 0:
+            queries.append((
+                f"SELECT id FROM sessions WHERE {_FINISHED} AND last_activity_at < ? ORDER BY created_at LIMIT ?",
+                (time.time() - max_age_seconds, batch),
+            ))
+        if max_count > 0:
+            queries.append((
+                f"SELECT id FROM sessions WHERE {_FINISHED} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (batch, max_count),
+            ))
+        if max_bytes > 0:
+            # Suma narastająca od najnowszych - wszystko powyżej limitu do usunięcia
+            queries.append((
+                f"""
+                SELECT id FROM (
+                  SELECT id, created_at, SUM({_SESSION_BYTES}) OVER (ORDER BY created_at DESC) AS total
+                  FROM sessions WHERE {_FINISHED}
+                ) WHERE total > ? ORDER BY created_at LIMIT ?
+                """,
+                (max_bytes, batch),
+            ))
+        if not queries:
+            return []
+        with self._timed("prune_sessions"), self._lock:
+            conn = self._conn()
+            try:
+                ids: list[str] = []
+                for sql, params in queries:
+                    for r in conn.execute(sql, params):
+                        if r["id"] not in ids:
+                            ids.append(r["id"])
+                ids = ids[:batch]
+                if not ids:
+                    return []
+                marks = ",".join("?" * len(ids))
+                if self.fts_enabled:
+                    conn.execute(
+                        f"""
+                        DELETE FROM scrollback_fts WHERE rowid IN
+                          (SELECT id FROM scrollback_segments WHERE session_id IN ({marks}))
+                        """,
+                        ids,
+                    )
+                    conn.execute(f"DELETE FROM scrollback_segments WHERE session_id IN ({marks})", ids)
+                conn.execute(f"DELETE FROM scrollback_blocks WHERE session_id IN ({marks})", ids)
+                conn.execute(f"DELETE FROM sessions WHERE id IN ({marks})", ids)
+                conn.commit()
+                return ids
+            finally:
+                conn.close()
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """Oddaj systemowi plików najwyżej ``pages`` wolnych stron; zwraca, ile wolnych zostało."""
+        with self._timed("incremental_vacuum"), self._lock:
+            conn = self._conn()
+            try:
+                # executescript: execute() zatrzymuje się po pierwszej zwolnionej stronie
+                conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+                return int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+            finally:
+                conn.close()
+
+    def file_stats(self) -> dict:
+        r = self.fetchone("SELECT * FROM pragma_page_count(), pragma_page_size(), pragma_freelist_count()")
+        wal = Path(self.path + "-wal")
+        return {
+            "file_bytes": int(r["page_count"]) * int(r["page_size"]),
+            "wal_bytes": wal.stat().st_size if wal.exists() else 0,
+            "free_pages": int(r["freelist_count"]),
+        }
+
+    # ----- scrollback search -----
+    def add_scrollback_segments(self, segments: list[tuple[str, int, str]]) -> None:
+        """Zapisz segmenty (session_id, start_offset, text) w jednej transakcji."""
+        if not self.fts_enabled or not segments:
+            return
+        now = time.time()
+        with self._timed("add_scrollback_segments"), self._lock:
+            conn = self._conn()
+            try:
+                for session_id, start_offset, text in segments:
+                    cur = conn.execute(
+                        "INSERT INTO scrollback_segments(session_id,start_offset,created_at) VALUES(?,?,?)",
+                        (session_id, start_offset, now),
+                    )
+                    conn.execute(
+                        "INSERT INTO scrollback_fts(rowid,content) VALUES(?,?)",
+                        (cur.lastrowid, text),
+                    )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def indexed_session_ids(self) -> set[str]:
+        rows = self.fetchall("SELECT DISTINCT session_id FROM scrollback_segments")
+        return {r["session_id"] for r in rows}
+
+    def delete_scrollback_segments(self, session_id: str, before: int) -> None:
+        """Usuń segmenty sesji zaczynające się przed offsetem ``before``."""
+        if not self.fts_enabled:
+            return
+        with self._timed("delete_scrollback_segments"), self._lock:
+            conn = self._conn()
+            try:
+                conn.execute(
+                    """
+                    DELETE FROM scrollback_fts WHERE rowid IN
+                      (SELECT id FROM scrollback_segments WHERE session_id = ? AND start_offset < ?)
+                    """,
+                    (session_id, before),
+                )
+                conn.execute(
+                    "DELETE FROM scrollback_segments WHERE session_id = ? AND start_offset < ?",
+                    (session_id, before),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def search_scrollback(
+        self,
+        query: str,
+        session_id: str | None = None,
+        limit: int = 50,
+    ) -> list[sqlite3.Row]:
+        if not self.fts_enabled:
+            return []
+        sql = """
+            SELECT seg.session_id, seg.start_offset,
+                   snippet(scrollback_fts, 0, '[', ']', '…', 16) AS snippet,
+                   s.status, s.cwd, s.shell, s.created_at
+            FROM scrollback_fts
+            JOIN scrollback_segments seg ON seg.id = scrollback_fts.rowid
+            LEFT JOIN sessions s ON s.id = seg.session_id
+            WHERE scrollback_fts MATCH ?
+        """
+        params: tuple = (query,)
+        if session_id:
+            sql += " AND seg.session_id = ?"
+            params += (session_id,)
+        sql += " ORDER BY seg.created_at DESC, seg.start_offset DESC LIMIT ?"
+        params += (limit,)
+        return self.fetchall(sql, params)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import json
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class SessionEvent:
+    version: int
+    type: str  # created / exited / killed / resized
+    session_id: str
+    data: dict = field(default_factory=dict)
+    at: float = field(default_factory=time.time)
+
+    def sse(self) -> str:
+        payload = {"version": self.version, "type": self.type, "id": self.session_id, "at": self.at, **self.data}
+        return f"id: {self.version}\nevent: session\ndata: {json.dumps(payload)}\n\n"
+
+
+def activity_sse(session_id: str, data: dict) -> str:
+    # Bez "id:" - aktywność nie przesuwa wersji, od której klient wznawia strumień
+    return f"event: activity\ndata: {json.dumps({'id': session_id, **data})}\n\n"
+
+
+class EventLog:
+    """Versioned log of session lifecycle changes (``GET /api/sessions/events``).
+
+    Every change gets the next version number. ``GET /api/sessions``
+    returns the version its snapshot corresponds to, and the event stream
+    resumes after any version still in the log (SSE ``Last-Event-ID``), so a
+    reconnecting client receives only what it missed. Older versions get
+    ``None`` from ``since`` and the client reloads the snapshot.
+
+    Numbering starts at the boot time in microseconds, so versions keep
+    growing across server restarts; a version this log has not issued
+    (from before a restart) also gets ``None``.
+
+    Activity of running sessions changes every few seconds and only its
+    latest state matters, so it is kept out of the log: ``touch`` replaces
+    the session's previous activity and ``activity_since`` returns what
+    changed after a stream's ``activity_seq``.
+    """
+
+    def __init__(self, maxlen: int = 1000, start: int | None = None) -> None:
+        self.version = time.time_ns() // 1000 if start is None else start
+        self.events: collections.deque[SessionEvent] = collections.deque(maxlen=maxlen)
+        self.activity: dict[str, tuple[int, dict]] = {}  # sesja -> (numer, dane) ostatniej aktywności
+        self.activity_seq = 0
+        self._changed = asyncio.Event()
+
+    def publish(self, type: str, session_id: str, **data) -> None:
+        self.version += 1
+        self.events.append(SessionEvent(self.version, type, session_id, data))
+        if type in ("exited", "killed"):
+            self.activity.pop(session_id, None)
+        self._wake()
+
+    def touch(self, session_id: str, **data) -> None:
+        """Record the latest activity of a session (unversioned, replaces the previous one)."""
+        self.activity_seq += 1
+        self.activity[session_id] = (self.activity_seq, data)
+        self._wake()
+
+    def activity_since(self, seq: int) -> list[tuple[str, dict]]:
+        return [(sid, data) for sid, (n, data) in self.activity.items() if n > seq]
+
+    def _wake(self) -> None:
+        # Obudź wszystkich czekających i przygotuj nowe zdarzenie na następną zmianę
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def since(self, version: int) -> list[SessionEvent] | None:
+        if version > self.version:
+            return None  # wersja z poprzedniego uruchomienia serwera
+        if version == self.version:
+            return []
+        if not self.events or self.events[0].version > version + 1:
+            return None  # luka - klient musi pobrać pełną listę
+        start = version + 1 - self.events[0].version
+        return list(self.events)[start:]
+
+    async def wait(self, version: int, timeout: float, activity_seq: int | None = None) -> None:
+        """Return once there is an event after ``version`` (or activity after ``activity_seq``) or ``timeout`` has passed."""
+        if version < self.version or (activity_seq is not None and activity_seq < self.activity_seq):
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+
+@dataclass(eq=False)
+class Peer:
+    """One browser WebSocket (``/ws/terminal`` or ``/ws/mux``) as seen by the heartbeat."""
+
+    kind: str  # terminal / mux
+    queues: Callable[[], list[tuple[str, asyncio.Queue]]]  # (session id, kolejka) subskrypcji
+    ping: Callable[[float], Any]  # wyślij/zakolejkuj ping; może zwrócić korutynę
+    close: Callable[[], None]  # anuluj zadania połączenia
+    last_seen: float = field(default_factory=time.monotonic)
+
+    def seen(self) -> None:
+        self.last_seen = time.monotonic()
+
+
+class Heartbeat:
+    """Application-level ping/pong for browser sockets.
+
+    Every ``interval`` seconds each registered peer gets ``{"type": "ping"}``;
+    any message from the client (``pong`` included) counts as a sign of life.
+    A peer silent for longer than ``timeout`` - typically a phone that left
+    the network without closing its socket - is returned by ``sweep`` so the
+    terminal manager can drop its subscriptions and cancel its tasks before
+    its queues fill up with output nobody will read.
+    """
+
+    def __init__(self) -> None:
+        self.peers: set[Peer] = set()
+        self.interval = 20.0
+        self.timeout = 60.0
+        self.reclaimed_connections = 0
+        self.reclaimed_bytes = 0
+
+    def configure(self, cfg: dict) -> None:
+        self.interval = float(cfg.get("ws_ping_interval_seconds", 20))
+        # Co najmniej dwa pingi bez odpowiedzi, zanim uznamy klienta za martwego
+        self.timeout = max(2 * self.interval, float(cfg.get("ws_ping_timeout_seconds", 60)))
+
+    def register(self, peer: Peer) -> None:
+        self.peers.add(peer)
+
+    def unregister(self, peer: Peer) -> None:
+        self.peers.discard(peer)
+
+    def sweep(self) -> list[Peer]:
+        """Ping live peers; unregister and return the ones past the timeout."""
+        now = time.monotonic()
+        dead = [p for p in self.peers if now - p.last_seen > self.timeout]
+        for p in dead:
+            self.peers.discard(p)
+        at = time.time()
+        for p in self.peers:
+            try:
+                res = p.ping(at)
+                if asyncio.iscoroutine(res):
+                    asyncio.ensure_future(res)
+            except Exception as e:
+                print(f"Heartbeat ping to {p.kind} peer failed: {e}")
+        return dead
+
+    def stats(self) -> dict:
+        return {
+            "peers": len(self.peers),
+            "interval_seconds": self.interval,
+            "timeout_seconds": self.timeout,
+            "reclaimed_connections": self.reclaimed_connections,
+            "reclaimed_bytes": self.reclaimed_bytes,
+        }
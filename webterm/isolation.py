@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import contextlib
+import ctypes
+import functools
+import os
+import platform
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+try:  # tylko Unix - na Windows limity sesji nic nie robią
+    import resource
+except ImportError:
+    resource = None
+
+# ioprio_set(2) nie ma opakowania w Pythonie - numer wywołania zależy od architektury
+_IOPRIO_SET = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "riscv64": 30, "armv7l": 314, "ppc64le": 273, "s390x": 282}
+_IOPRIO_CLASS = {"realtime": 1, "best-effort": 2, "idle": 3}
+_IOPRIO_WHO_PROCESS = 1
+
+_SERVER_LEAF = "devbridge-server"
+_SESSION_PREFIX = "session-"
+
+
+@dataclass
+class SessionLimits:
+    """Resource limits applied to a session's shell between fork and exec.
+
+    rlimits are inherited by everything the shell starts; ``cpu_seconds``
+    and ``address_space_bytes`` apply per process, ``processes`` to all
+    processes of the user (use the cgroup ``pids.max`` for a per-session
+    cap). 0 / empty means "leave as is". On Windows nothing is applied.
+    """
+
+    address_space_bytes: int = 0
+    processes: int = 0
+    cpu_seconds: int = 0
+    nice: int = 0
+    ionice_class: str = ""  # best-effort / idle / realtime
+    ionice_level: int = 4  # 0 (najwyższy) - 7
+    cgroup: Path | None = None
+
+    @classmethod
+    def from_settings(cls, cfg: dict) -> SessionLimits:
+        return cls(
+            address_space_bytes=int(cfg.get("session_limit_address_space_mb", 0)) * 1024 * 1024,
+            processes=int(cfg.get("session_limit_processes", 0)),
+            cpu_seconds=int(cfg.get("session_limit_cpu_seconds", 0)),
+            nice=int(cfg.get("session_nice", 0)),
+            ionice_class=str(cfg.get("session_ionice_class") or ""),
+            ionice_level=int(cfg.get("session_ionice_level", 4)),
+        )
+
+    def prepare(self) -> PreparedLimits:
+        """Resolve everything ``apply`` needs; call in the parent, before fork.
+
+        The forked child of a threaded server may only do what is safe
+        between fork and exec, so it gets ready paths, numbers, the libc
+        function and error messages and does nothing but the system calls.
+        """
+        if resource is None:
+            return PreparedLimits()
+        out = PreparedLimits(nice=self.nice)
+        if self.cgroup is not None:
+            out.cgroup_procs = os.fsencode(self.cgroup / "cgroup.procs")
+            out.cgroup_error = _message(f"cannot join cgroup {self.cgroup.name}")
+        for name, limit, value in (
+            ("address space", resource.RLIMIT_AS, self.address_space_bytes),
+            ("processes", resource.RLIMIT_NPROC, self.processes),
+            ("cpu time", resource.RLIMIT_CPU, self.cpu_seconds),
+        ):
+            if value > 0:
+                out.rlimits.append((limit, (value, value), _message(f"cannot set {name} limit to {value}")))
+        if self.nice:
+            out.nice_error = _message(f"cannot set nice {self.nice}")
+        if self.ionice_class:
+            try:
+                out.ioprio = _ioprio_call(self.ionice_class, self.ionice_level)
+                out.ioprio_error = _message(f"cannot set ionice {self.ionice_class}")
+            except (OSError, ValueError) as e:
+                out.errors.append(_message(f"ionice: {e}"))
+        return out
+
+
+@dataclass
+class PreparedLimits:
+    """``SessionLimits`` ready for the child (``SessionLimits.prepare``)."""
+
+    cgroup_procs: bytes | None = None
+    cgroup_error: bytes = b""
+    rlimits: list[tuple[int, tuple[int, int], bytes]] = field(default_factory=list)
+    nice: int = 0
+    nice_error: bytes = b""
+    ioprio: tuple[Any, int, int] | None = None  # (libc syscall, numer wywołania, priorytet)
+    ioprio_error: bytes = b""
+    errors: list[bytes] = field(default_factory=list)  # wykryte już w rodzicu
+
+    def apply(self, err_fd: int = 2) -> None:
+        """Apply to the current (child) process; failures are written to ``err_fd``."""
+        for msg in self.errors:
+            _write(err_fd, msg)
+        if self.cgroup_procs is not None:
+            try:
+                # "0" = proces piszący; sam siebie, przed exec - nic nie zdąży uciec poza cgroup
+                fd = os.open(self.cgroup_procs, os.O_WRONLY)
+                try:
+                    os.write(fd, b"0")
+                finally:
+                    os.close(fd)
+            except OSError:
+                _write(err_fd, self.cgroup_error)
+        for limit, value, msg in self.rlimits:
+            try:
+                resource.setrlimit(limit, value)
+            except (OSError, ValueError):
+                _write(err_fd, msg)
+        if self.nice:
+            try:
+                os.nice(self.nice)
+            except OSError:
+                _write(err_fd, self.nice_error)
+        if self.ioprio is not None:
+            call, nr, prio = self.ioprio
+            if call(nr, _IOPRIO_WHO_PROCESS, 0, prio) != 0:
+                _write(err_fd, self.ioprio_error)
+
+
+def _message(text: str) -> bytes:
+    # stderr dziecka to już terminal sesji - użytkownik zobaczy, czego nie udało się ustawić
+    return f"devbridge: {text}\r\n".encode()
+
+
+def _write(fd: int, data: bytes) -> None:
+    with contextlib.suppress(OSError):
+        os.write(fd, data)
+
+
+@functools.lru_cache(maxsize=1)
+def _libc() -> Any:
+    return ctypes.CDLL(None, use_errno=True)
+
+
+def _ioprio_call(cls_name: str, level: int) -> tuple[Any, int, int]:
+    """ioprio_set(2) arguments: the libc ``syscall`` function, its number and the priority."""
+    nr = _IOPRIO_SET.get(platform.machine())
+    if nr is None or cls_name not in _IOPRIO_CLASS:
+        raise ValueError(f"unsupported ({platform.machine()}, {cls_name})")
+    prio = (_IOPRIO_CLASS[cls_name] << 13) | (0 if cls_name == "idle" else max(0, min(7, level)))
+    return _libc().syscall, nr, prio
+
+
+def _own_cgroup() -> Path | None:
+    """Directory of this process's cgroup in the v2 hierarchy, if it is mounted."""
+    try:
+        rel = next(
+            line[3:].strip() for line in Path("/proc/self/cgroup").read_text().splitlines() if line.startswith("0::")
+        )
+        mounts = Path("/proc/self/mountinfo").read_text().splitlines()
+    except (OSError, StopIteration):
+        return None
+    for line in mounts:
+        fields = line.split()
+        # ... mount_point ... - fstype source opts
+        if "-" in fields and fields[fields.index("-") + 1] == "cgroup2":
+            return Path(fields[4]) / rel.lstrip("/")
+    return None
+
+
+class CgroupManager:
+    """Optional cgroup v2 placement: one child cgroup per session.
+
+    Needs a delegated subtree (e.g. systemd ``Delegate=yes``) with the
+    ``cpu`` and ``memory`` controllers. Because cgroups with processes may
+    not enable controllers for their children, ``setup`` first moves the
+    server into its own leaf (``devbridge-server``) next to the sessions.
+    Every session gets ``cpu.weight``, ``memory.max`` and, with the ``pids``
+    controller, ``pids.max``; ``remove`` kills what is left and deletes it.
+    """
+
+    def __init__(self) -> None:
+        self.base: Path | None = None
+        self.controllers: set[str] = set()
+        self.error = ""
+
+    @property
+    def enabled(self) -> bool:
+        return self.base is not None
+
+    def setup(self) -> bool:
+        if self.base is not None:
+            return True
+        if resource is None:
+            self.error = "cgroups are not available on this platform"
+            return False
+        base = _own_cgroup()
+        if base is None:
+            self.error = "cgroup v2 is not mounted"
+            return False
+        if base.name == _SERVER_LEAF:
+            base = base.parent  # serwer już przeniesiony (np. przez poprzednie setup)
+        try:
+            available = set((base / "cgroup.controllers").read_text().split())
+            if not {"cpu", "memory"} <= available:
+                self.error = f"cpu/memory controllers not delegated to {base}"
+                return False
+            if base != base.parent:
+                leaf = base / _SERVER_LEAF
+                leaf.mkdir(exist_ok=True)
+                (leaf / "cgroup.procs").write_text(str(os.getpid()))
+            enable = {"cpu", "memory"} | ({"pids"} & available)
+            (base / "cgroup.subtree_control").write_text(" ".join(f"+{c}" for c in sorted(enable)))
+        except OSError as e:
+            self.error = f"cannot use {base}: {e}"
+            return False
+        self.base, self.controllers, self.error = base, enable, ""
+        # Pozostałości po poprzednim uruchomieniu
+        for stale in base.glob(f"{_SESSION_PREFIX}*"):
+            self.remove(stale.name[len(_SESSION_PREFIX):])
+        return True
+
+    def create(self, sid: str, cpu_weight: int, memory_max: int, pids_max: int) -> Path | None:
+        if self.base is None:
+            return None
+        path = self.base / f"{_SESSION_PREFIX}{sid}"
+        try:
+            path.mkdir(exist_ok=True)
+            (path / "cpu.weight").write_text(str(max(1, min(10000, cpu_weight))))
+            (path / "memory.max").write_text(str(memory_max) if memory_max > 0 else "max")
+            if "pids" in self.controllers:
+                (path / "pids.max").write_text(str(pids_max) if pids_max > 0 else "max")
+        except OSError as e:
+            print(f"Cannot create cgroup for session {sid}: {e}")
+            with contextlib.suppress(OSError):
+                path.rmdir()
+            return None
+        return path
+
+    def remove(self, sid: str) -> bool:
+        """Kill the session's remaining processes and delete its cgroup; False while busy."""
+        if self.base is None:
+            return True
+        path = self.base / f"{_SESSION_PREFIX}{sid}"
+        if not path.exists():
+            return True
+        with contextlib.suppress(OSError):
+            (path / "cgroup.kill").write_text("1")  # Linux 5.14+
+        try:
+            path.rmdir()
+        except OSError:
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "cgroup": str(self.base) if self.base else None,
+            "controllers": sorted(self.controllers),
+            "error": self.error or None,
+        }
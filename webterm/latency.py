@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import time
+from dataclasses import dataclass
+
+# Etapy w kolejności przepływu klawisza
+STAGES = ("recv_to_write", "write_to_read", "read_to_send", "network", "render", "total")
+
+
+@dataclass
+class Probe:
+    """Timestamps of one tagged keystroke on its way through the server.
+
+    The client tags an input message with an id; ``TerminalManager.write``
+    stamps the PTY write and the pump stamps the first read after it, then
+    queues the probe to the issuing WebSocket, whose sender stamps the send.
+    """
+
+    id: int
+    queue: asyncio.Queue
+    t_recv: float
+    t_write: float = 0.0
+    t_read: float = 0.0
+    t_send: float = 0.0
+
+
+class LatencyTracker:
+    """Rolling per-stage samples (milliseconds) with percentile summaries."""
+
+    def __init__(self, window: int = 2000) -> None:
+        self.samples = {s: collections.deque(maxlen=window) for s in STAGES}
+
+    def finish(self, probe: Probe) -> dict[str, float]:
+        probe.t_send = time.perf_counter()
+        stages = {
+            "recv_to_write": (probe.t_write - probe.t_recv) * 1000,
+            "write_to_read": (probe.t_read - probe.t_write) * 1000,
+            "read_to_send": (probe.t_send - probe.t_read) * 1000,
+        }
+        for k, v in stages.items():
+            self.samples[k].append(v)
+        return stages
+
+    def report(self, server_ms: float, rtt_ms: float, render_ms: float) -> None:
+        """Client-side measurements: round trip and xterm.js parse/render time."""
+        self.samples["network"].append(max(0.0, rtt_ms - server_ms))
+        self.samples["render"].append(render_ms)
+        self.samples["total"].append(rtt_ms + render_ms)
+
+    def summary(self) -> dict[str, dict]:
+        out = {}
+        for stage, values in self.samples.items():
+            data = sorted(values)
+            if not data:
+                out[stage] = {"count": 0}
+                continue
+            out[stage] = {
+                "count": len(data),
+                "p50": _pct(data, 0.50),
+                "p90": _pct(data, 0.90),
+                "p99": _pct(data, 0.99),
+                "max": round(data[-1], 3),
+            }
+        return out
+
+    def reset(self) -> None:
+        for values in self.samples.values():
+            values.clear()
+
+
+def _pct(data: list[float], q: float) -> float:
+    return round(data[min(len(data) - 1, int(q * len(data)))], 3)
@@ -7,38 +7,56 @@ Continue your local AI coding sessions from anywhere.
 """
 from __future__ import annotations
 
+import asyncio
+import fnmatch
+import hmac
 import json
 import os
+import threading
+import time
 from pathlib import Path
-from fastapi import Depends, FastAPI, Form, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import Depends, FastAPI, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, RedirectResponse, Response, StreamingResponse
 
+from . import assets, metrics, wscompress
+from .batch import BatchRunner, list_projects, run_command
 from .db import DB
+from .events import activity_sse
 from .settings import env
 from .security import (
     Principal,
     get_effective_settings,
     hash_password,
     make_session_token,
+    make_share_token,
     require_admin,
     require_principal,
     verify_password,
     parse_session_token,
+    parse_share_token,
 )
-from .terminal_manager import TerminalManager
+from .heartbeat import Peer
+from .latency import Probe
+from .mux import MuxConnection
+from .profiler import LoopMonitor, SamplingProfiler
+from .recording import take_lines
+from .share import SHARE_BATCH
+from .terminal_manager import InputAck, Ping, TerminalManager
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 app = FastAPI(title="WebTerm")
-app.mount("/static", StaticFiles(directory=str(BASE_DIR / "webterm" / "static")), name="static")
+static_assets = assets.AssetStore(BASE_DIR / "webterm" / "static", BASE_DIR / "webterm_templates")
 
 db = DB(str(BASE_DIR / env.DB_PATH))
 tm = TerminalManager(db)
+profiler = SamplingProfiler()
+loop_monitor = LoopMonitor()
+batch_runner = BatchRunner()
 
 
-def tpl(name: str) -> str:
-    return (BASE_DIR / "webterm_templates" / name).read_text(encoding="utf-8")
+def tpl(name: str, request: Request) -> Response:
+    return assets.response(request, static_assets.page(name), assets.REVALIDATE)
 
 
 @app.on_event("startup")
@@ -51,20 +69,41 @@ async def startup() -> None:
             is_admin=True,
         )
 
+    # Szablony i pliki statyczne raz do pamięci (z wersjami gzip/br)
+    static_assets.load()
+
     # Oznacz running z DB jako stale (bo nie wznawiamy procesów)
     await tm.mark_db_sessions_stale_on_start()
+    # Najpierw retencja - do pamięci trafia tylko historia, która zostaje
+    cfg = get_effective_settings(db)
+    tm.configure_retention(cfg)
+    await tm.compact_history()
     await tm.load_sessions_from_db()
 
+    tm.configure_flood_control(cfg)
+    loop_monitor.configure(int(cfg.get("loop_lag_threshold_ms", 0)) / 1000)
+    loop_monitor.start(asyncio.get_running_loop())
+    tm.configure_heartbeat(cfg)
+    tm.configure_process_stats(cfg)
+    tm.configure_isolation(cfg)
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    loop_monitor.stop()
 
-@app.get("/login", response_class=HTMLResponse)
-def login_page() -> str:
-    return tpl("login.html")
+
+@app.get("/login")
+def login_page(request: Request) -> Response:
+    return tpl("login.html", request)
 
 
 @app.post("/login")
 def login(username: str = Form(), password: str = Form()) -> RedirectResponse:
+    t0 = time.perf_counter()
     user = db.get_user_by_username(username)
     if not user or not verify_password(password, user["password_hash"]):
+        metrics.LOGIN_SECONDS.labels("fail").observe(time.perf_counter() - t0)
         return RedirectResponse(url="/login?err=1", status_code=302)
 
     token = make_session_token(username)
@@ -77,6 +116,7 @@ def login(username: str = Form(), password: str = Form()) -> RedirectResponse:
         samesite="lax",
         secure=False,  # ustaw True za HTTPS
     )
+    metrics.LOGIN_SECONDS.labels("ok").observe(time.perf_counter() - t0)
     return resp
 
 
@@ -87,9 +127,34 @@ def logout() -> RedirectResponse:
     return resp
 
 
-@app.get("/", response_class=HTMLResponse)
-def index(_: Principal = Depends(lambda: require_principal(db))) -> str:
-    return tpl("index.html")
+@app.get("/")
+def index(request: Request, _: Principal = Depends(lambda: require_principal(db))) -> Response:
+    return tpl("index.html", request)
+
+
+@app.get("/share/{token}")
+def share_page(token: str, request: Request) -> Response:
+    # Bez logowania - token jest jedynym uprawnieniem (i tylko do podglądu)
+    parsed = parse_share_token(token)
+    if not parsed or not tm.shared_session(*parsed):
+        raise HTTPException(status_code=404, detail="Share link expired or revoked")
+    return tpl("share.html", request)
+
+
+# ---------- static files ----------
+@app.api_route("/static/{name:path}", methods=["GET", "HEAD"])
+def static_file(name: str, request: Request) -> Response:
+    found = static_assets.lookup(name)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return assets.response(request, *found)
+
+
+@app.get("/sw.js")
+def service_worker(request: Request) -> Response:
+    # Z katalogu głównego, żeby zakres workera obejmował całą aplikację
+    asset, cache_control = static_assets.lookup("sw.js")
+    return assets.response(request, asset, cache_control)
 
 
 # ---------- API: settings ----------
@@ -100,7 +165,7 @@ def api_get_settings(p: Principal = Depends(lambda: require_principal(db))) -> d
 
 
 @app.put("/api/settings")
-def api_put_settings(body: dict, p: Principal = Depends(lambda: require_principal(db))) -> dict:
+async def api_put_settings(body: dict, p: Principal = Depends(lambda: require_principal(db))) -> dict:
     # jeśli auth_required=True to tylko admin może zmieniać
     cfg = get_effective_settings(db)
     if bool(cfg.get("auth_required", False)):
@@ -113,6 +178,38 @@ def api_put_settings(body: dict, p: Principal = Depends(lambda: require_principa
         "max_sessions",
         "idle_ttl_seconds",
         "scrollback_limit_chars",
+        "memory_budget_bytes",
+        "history_max_age_days",
+        "history_max_sessions",
+        "history_max_bytes",
+        "recording_enabled",
+        "recording_input",
+        "recording_rotate_bytes",
+        "output_rate_limit_chars",
+        "output_rate_limit_user_chars",
+        "output_burst_seconds",
+        "output_snapshot_interval_ms",
+        "loop_lag_threshold_ms",
+        "process_stats_interval_seconds",
+        "session_limit_address_space_mb",
+        "session_limit_processes",
+        "session_limit_cpu_seconds",
+        "session_nice",
+        "session_ionice_class",
+        "session_ionice_level",
+        "session_cgroup_enabled",
+        "session_cgroup_cpu_weight",
+        "session_cgroup_memory_max_mb",
+        "session_cgroup_pids_max",
+        "ws_compression_enabled",
+        "ws_compression_level",
+        "ws_compression_window_bits",
+        "ws_compression_context_takeover",
+        "ws_compression_min_bytes",
+        "ws_ping_interval_seconds",
+        "ws_ping_timeout_seconds",
+        "share_token_ttl_minutes",
+        "share_max_spectators",
         "default_unix_shell",
         "default_windows_shell",
     }
@@ -122,7 +219,14 @@ def api_put_settings(body: dict, p: Principal = Depends(lambda: require_principa
             continue
         db.set_setting(k, v)
 
-    return {"ok": True, "settings": get_effective_settings(db)}
+    cfg = get_effective_settings(db)
+    tm.configure_flood_control(cfg)
+    tm.configure_heartbeat(cfg)
+    tm.configure_retention(cfg)
+    tm.configure_process_stats(cfg)
+    tm.configure_isolation(cfg)
+    loop_monitor.configure(int(cfg.get("loop_lag_threshold_ms", 0)) / 1000)
+    return {"ok": True, "settings": cfg}
 
 
 # ---------- API: users ----------
@@ -210,11 +314,65 @@ def api_delete_user(user_id: int, p: Principal = Depends(lambda: require_princip
 # ---------- API: sessions ----------
 @app.get("/api/sessions")
 async def api_list_sessions(_: Principal = Depends(lambda: require_principal(db))) -> dict:
-    return {"sessions": await tm.list_sessions()}
+    return {"sessions": await tm.list_sessions(), "version": tm.events.version}
+
+
+# Maksymalny czas jednej odpowiedzi SSE (przeglądarka łączy się ponownie)
+SSE_STREAM_SECONDS = 30.0
+
+
+@app.get("/api/sessions/events")
+async def api_session_events(
+    request: Request,
+    since: int = 0,
+    _: Principal = Depends(lambda: require_principal(db)),
+) -> StreamingResponse:
+    """Server-sent session lifecycle events after version ``since``.
+
+    On reconnect the browser's ``Last-Event-ID`` takes precedence. A
+    ``resync`` event means the version is no longer in the log and the
+    client should reload ``GET /api/sessions``. Each response ends after
+    ``SSE_STREAM_SECONDS`` and the browser reconnects from the last id, so
+    an open tab never holds up a server shutdown or reload for long.
+    ``activity`` events (last activity, flooding) carry no id: they are
+    sent as they change and never make a client resync.
+    """
+    last_id = request.headers.get("last-event-id", "")
+    version = int(last_id) if last_id.isdigit() else since
+    deadline = time.monotonic() + SSE_STREAM_SECONDS
+
+    async def stream():
+        nonlocal version
+        activity = tm.events.activity_seq
+        yield "retry: 1000\n\n"
+        while time.monotonic() < deadline:
+            events = tm.events.since(version)
+            if events is None:
+                version = tm.events.version
+                yield f"id: {version}\nevent: resync\ndata: {{\"version\": {version}}}\n\n"
+                continue
+            for ev in events:
+                yield ev.sse()
+                version = ev.version
+            for sid, data in tm.events.activity_since(activity):
+                yield activity_sse(sid, data)
+            activity = tm.events.activity_seq
+            before = version
+            await tm.events.wait(version, timeout=min(15.0, max(0.0, deadline - time.monotonic())), activity_seq=activity)
+            if tm.events.version == before and tm.events.activity_seq == activity:
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/api/sessions")
-async def api_create_session(body: dict, p: Principal = Depends(lambda: require_principal(db))) -> dict:
+async def api_create_session(
+    body: dict, request: Request, p: Principal = Depends(lambda: require_principal(db))
+) -> dict:
     cfg = get_effective_settings(db)
     if bool(cfg.get("auth_required", False)):
         # logged users only; principal already verified
@@ -228,7 +386,16 @@ async def api_create_session(body: dict, p: Principal = Depends(lambda: require_
     shell = body.get("shell")
     cols = int(body.get("cols", 120))
     rows = int(body.get("rows", 30))
-    return await tm.create_session(cwd=cwd, shell=shell, cols=cols, rows=rows)
+    record = body.get("record")
+    return await tm.create_session(
+        cwd=cwd,
+        shell=shell,
+        cols=cols,
+        rows=rows,
+        record=None if record is None else bool(record),
+        owner=p.username,
+        client=request.client.host if request.client else None,
+    )
 
 
 @app.delete("/api/sessions/{sid}")
@@ -237,57 +404,180 @@ async def api_kill_session(sid: str, _: Principal = Depends(lambda: require_prin
     return {"ok": True}
 
 
-# ---------- API: projects ----------
-@app.get("/api/projects")
-async def api_list_projects(path: str, _: Principal = Depends(lambda: require_principal(db))) -> dict:
-    """List all subdirectories in the given path as projects."""
-    import os
-    from pathlib import Path as PathLib
+@app.post("/api/sessions/{sid}/share")
+async def api_share_session(
+    sid: str,
+    body: dict | None = None,
+    _: Principal = Depends(lambda: require_principal(db)),
+) -> dict:
+    """Issue a signed read-only link to a running session."""
+    sess = tm.sessions.get(sid)
+    if not sess or sess.status != "running":
+        raise HTTPException(status_code=404, detail="Session not running")
+    cfg = get_effective_settings(db)
+    ttl = int((body or {}).get("ttl_minutes") or cfg.get("share_token_ttl_minutes", 60))
+    ttl = max(1, min(ttl, 7 * 24 * 60)) * 60
+    token = make_share_token(sid, sess.share_epoch, ttl)
+    return {
+        "token": token,
+        "url": f"/share/{token}",
+        "expires_at": int(time.time()) + ttl,
+        "spectators": len(sess.share.spectators) if sess.share else 0,
+    }
 
-    try:
-        base_path = PathLib(path).expanduser().resolve()
 
-        if not base_path.exists():
-            raise HTTPException(status_code=404, detail=f"Path not found: {path}")
+@app.delete("/api/sessions/{sid}/share")
+async def api_revoke_share(sid: str, _: Principal = Depends(lambda: require_principal(db))) -> dict:
+    """Invalidate all share links of a session and disconnect its spectators."""
+    return {"ok": True, "disconnected": tm.revoke_shares(sid)}
+
+
+@app.get("/api/search")
+async def api_search_scrollback(
+    q: str,
+    session_id: str | None = None,
+    limit: int = 50,
+    _: Principal = Depends(lambda: require_principal(db)),
+) -> dict:
+    """Full-text search over session scrollback (live and historical)."""
+    if not db.fts_enabled:
+        raise HTTPException(status_code=501, detail="Scrollback search unavailable (SQLite without FTS5)")
+    limit = max(1, min(limit, 200))
+    return {"matches": await tm.search(q, session_id=session_id, limit=limit)}
+
+
+@app.get("/api/sessions/{sid}/recording")
+async def api_download_recording(sid: str, _: Principal = Depends(lambda: require_principal(db))) -> StreamingResponse:
+    """Download the session recording as an asciicast v2 file."""
+    if not tm.recordings.exists(sid):
+        raise HTTPException(status_code=404, detail="No recording for this session")
+
+    lines = tm.recordings.iter_lines(sid)
+    loop = asyncio.get_event_loop()
+
+    async def body():
+        while batch := await loop.run_in_executor(None, take_lines, lines):
+            yield ("\n".join(batch) + "\n").encode("utf-8")
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-asciicast",
+        headers={"Content-Disposition": f'attachment; filename="{sid}.cast"'},
+    )
+
+
+# ---------- API: latency probe ----------
+@app.get("/api/latency")
+def api_latency(_: Principal = Depends(lambda: require_principal(db))) -> dict:
+    """Per-stage keystroke latency percentiles (ms) from opt-in client probes."""
+    return {"stages": tm.latency.summary()}
+
+
+@app.delete("/api/latency")
+def api_reset_latency(_: Principal = Depends(lambda: require_principal(db))) -> dict:
+    tm.latency.reset()
+    return {"ok": True}
+
 
-        if not base_path.is_dir():
-            raise HTTPException(status_code=400, detail=f"Path is not a directory: {path}")
+# ---------- API: stats ----------
+@app.get("/api/stats")
+async def api_stats(_: Principal = Depends(lambda: require_principal(db))) -> dict:
+    return {
+        "memory": tm.memory_stats(),
+        "compression": wscompress.stats(),
+        "heartbeat": tm.heartbeat.stats(),
+        "history": tm.history_stats(),
+        "isolation": tm.cgroups.stats(),
+        "sharing": tm.share_stats(),
+        "flooding": [s.id for s in tm.sessions.values() if s.flooding],
+    }
 
-        projects = []
 
-        # List all subdirectories
+# ---------- API: debug (admin) ----------
+@app.get("/api/debug/profile")
+async def api_debug_profile(
+    seconds: float = 10.0,
+    interval_ms: float = 5.0,
+    p: Principal = Depends(lambda: require_principal(db)),
+) -> PlainTextResponse:
+    """Sample all threads for ``seconds``; returns collapsed stacks for flamegraph tools."""
+    require_admin(p)
+    seconds = min(max(seconds, 0.1), 60.0)
+    interval = min(max(interval_ms, 1.0), 100.0) / 1000
+    if profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    # Osobny wątek (nie executor) - nie zajmuje workera, którego profilujemy
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+
+    def run() -> None:
         try:
-            for item in base_path.iterdir():
-                if item.is_dir() and not item.name.startswith('.'):
-                    # Check if has .git directory
-                    has_git = (item / '.git').exists()
+            result = profiler.profile(seconds, interval)
+        except RuntimeError as e:
+            loop.call_soon_threadsafe(fut.set_exception, HTTPException(status_code=409, detail=str(e)))
+            return
+        loop.call_soon_threadsafe(fut.set_result, result)
+
+    threading.Thread(target=run, name="profiler", daemon=True).start()
+    return PlainTextResponse(
+        await fut,
+        headers={"Content-Disposition": f'attachment; filename="devbridge-{int(time.time())}.collapsed"'},
+    )
+
+
+@app.get("/api/debug/loop")
+def api_debug_loop(p: Principal = Depends(lambda: require_principal(db))) -> dict:
+    """Recent event-loop stalls with the stack of the blocking callback."""
+    require_admin(p)
+    return {
+        "threshold_ms": loop_monitor.threshold * 1000,
+        "stalls": list(reversed(loop_monitor.stalls)),
+    }
 
-                    projects.append({
-                        'name': item.name,
-                        'path': str(item),
-                        'hasGit': has_git
-                    })
-        except PermissionError:
-            raise HTTPException(status_code=403, detail=f"Permission denied: {path}")
 
-        # Sort by name
-        projects.sort(key=lambda x: x['name'].lower())
+@app.get("/metrics")
+def prometheus_metrics(request: Request) -> PlainTextResponse:
+    """Prometheus text exposition; accepts METRICS_TOKEN as a bearer token."""
+    auth = request.headers.get("authorization", "")
+    if not (env.METRICS_TOKEN and hmac.compare_digest(auth, f"Bearer {env.METRICS_TOKEN}")):
+        require_principal(db, request.cookies.get(env.SESSION_COOKIE))
+    return PlainTextResponse(
+        metrics.REGISTRY.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
 
-        return {"projects": projects}
 
+# ---------- API: projects ----------
+@app.get("/api/projects")
+async def api_list_projects(path: str, _: Principal = Depends(lambda: require_principal(db))) -> dict:
+    """List all subdirectories in the given path as projects."""
+    try:
+        return {"projects": _projects_in(path)}
     except Exception as e:
         if isinstance(e, HTTPException):
             raise
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _projects_in(path: str) -> list[dict]:
+    base_path = Path(path).expanduser().resolve()
+
+    if not base_path.exists():
+        raise HTTPException(status_code=404, detail=f"Path not found: {path}")
+
+    if not base_path.is_dir():
+        raise HTTPException(status_code=400, detail=f"Path is not a directory: {path}")
+
+    try:
+        return list_projects(base_path)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail=f"Permission denied: {path}")
+
+
 # ---------- API: quick actions ----------
 @app.post("/api/quick-action/execute")
 async def api_execute_quick_action(body: dict, _: Principal = Depends(lambda: require_principal(db))) -> dict:
     """Execute a quick action command in the background and return the result."""
-    import asyncio
-    import subprocess
-
     command = body.get("command", "").strip()
     cwd = body.get("cwd", "").strip()
 
@@ -297,74 +587,94 @@ async def api_execute_quick_action(body: dict, _: Principal = Depends(lambda: re
     if not cwd or not os.path.isdir(cwd):
         raise HTTPException(status_code=400, detail="Invalid working directory")
 
-    try:
-        # Determine shell based on OS
-        if os.name == "nt":
-            # Windows
-            shell_cmd = ["powershell.exe", "-Command", command]
-        else:
-            # Unix/Linux
-            shell_cmd = ["/bin/bash", "-c", command]
-
-        # Execute command in background with timeout
-        process = await asyncio.create_subprocess_exec(
-            *shell_cmd,
-            cwd=cwd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
+    return await run_command(command, cwd, timeout=60.0)
 
-        try:
-            # Wait for command to complete with 60 second timeout
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(),
-                timeout=60.0
-            )
-
-            output = stdout.decode("utf-8", errors="ignore")
-            error_output = stderr.decode("utf-8", errors="ignore")
-
-            # Combine output
-            combined_output = output
-            if error_output:
-                combined_output += "\n" + error_output
-
-            success = process.returncode == 0
-
-            return {
-                "success": success,
-                "exit_code": process.returncode,
-                "output": combined_output.strip(),
-                "error": error_output.strip() if not success else None
-            }
 
-        except asyncio.TimeoutError:
-            # Kill process if it times out
-            try:
-                process.kill()
-                await process.wait()
-            except Exception:
-                pass
-
-            return {
-                "success": False,
-                "exit_code": -1,
-                "output": "",
-                "error": "Command timed out after 60 seconds"
-            }
+# ---------- API: batch execution ----------
+@app.post("/api/batch")
+async def api_start_batch(body: dict, _: Principal = Depends(lambda: require_principal(db))) -> dict:
+    """Run one command in many projects under ``path``; follow ``/api/batch/{id}/events``.
+
+    Projects can be narrowed by ``projects`` (names), ``pattern`` (glob on
+    the name) and ``git_only``. ``concurrency`` (default 4) bounds how many
+    run at once, ``timeout`` (default 60 s) applies per project.
+    """
+    command = str(body.get("command", "")).strip()
+    if not command:
+        raise HTTPException(status_code=400, detail="Command is required")
+    projects = _projects_in(str(body.get("path", "")))
+    names = body.get("projects")
+    if names:
+        projects = [p for p in projects if p["name"] in set(names)]
+    pattern = str(body.get("pattern") or "")
+    if pattern:
+        projects = [p for p in projects if fnmatch.fnmatch(p["name"], pattern)]
+    if body.get("git_only"):
+        projects = [p for p in projects if p["hasGit"]]
+    if not projects:
+        raise HTTPException(status_code=400, detail="No matching projects")
+
+    timeout = min(3600.0, max(1.0, float(body.get("timeout", 60))))
+    run = batch_runner.start(command, projects, int(body.get("concurrency", 4)), timeout)
+    return {"id": run.id, "concurrency": run.concurrency, "projects": projects}
+
+
+@app.get("/api/batch/{bid}")
+async def api_get_batch(bid: str, _: Principal = Depends(lambda: require_principal(db))) -> dict:
+    run = batch_runner.runs.get(bid)
+    if not run:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return run.snapshot()
+
+
+@app.get("/api/batch/{bid}/events")
+async def api_batch_events(
+    request: Request,
+    bid: str,
+    _: Principal = Depends(lambda: require_principal(db)),
+) -> StreamingResponse:
+    """Server-sent ``started`` / ``result`` per project, then ``summary``.
+
+    Resumes after ``Last-Event-ID``. The stream ends after ``summary``;
+    clients should close their ``EventSource`` there instead of reconnecting.
+    """
+    run = batch_runner.runs.get(bid)
+    if not run:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    last_id = request.headers.get("last-event-id", "")
+    seen = int(last_id) if last_id.isdigit() else 0
+    deadline = time.monotonic() + SSE_STREAM_SECONDS
+
+    async def stream():
+        nonlocal seen
+        yield "retry: 1000\n\n"
+        while time.monotonic() < deadline:
+            for frame in run.events[seen:]:
+                yield frame
+            seen = len(run.events)
+            if run.status != "running" and seen == len(run.events):
+                return
+            await run.wait(seen, timeout=min(15.0, max(0.0, deadline - time.monotonic())))
+            if len(run.events) == seen:
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    except Exception as e:
-        return {
-            "success": False,
-            "exit_code": -1,
-            "output": "",
-            "error": str(e)
-        }
+
+@app.delete("/api/batch/{bid}")
+async def api_cancel_batch(bid: str, _: Principal = Depends(lambda: require_principal(db))) -> dict:
+    if bid not in batch_runner.runs:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"ok": batch_runner.cancel(bid)}
 
 
 # ---------- WebSocket: terminal ----------
-@app.websocket("/ws/terminal/{sid}")
-async def ws_terminal(ws: WebSocket, sid: str) -> None:
+async def ws_authorize(ws: WebSocket) -> bool:
+    """Check the cookie (or anonymous mode) before accepting a WebSocket."""
     cfg = get_effective_settings(db)
     auth_required = bool(cfg.get("auth_required", False))
 
@@ -373,49 +683,286 @@ async def ws_terminal(ws: WebSocket, sid: str) -> None:
         username = parse_session_token(cookie) if cookie else None
         if not username or not db.get_user_by_username(username):
             await ws.close(code=4401)
-            return
+            return False
     else:
         # anon mode
         if not bool(cfg.get("allow_anonymous_terminal", True)):
             await ws.close(code=4403)
-            return
+            return False
+    return True
+
+
+@app.websocket("/ws/terminal/{sid}")
+async def ws_terminal(ws: WebSocket, sid: str) -> None:
+    if not await ws_authorize(ws):
+        return
 
     await ws.accept()
+    metrics.WS_CONNECTIONS.labels("terminal").inc()
+    metrics.WS_CONNECTIONS_TOTAL.labels("terminal").inc()
+
+    deflater = None
+    if ws.query_params.get("compress") == "deflate":
+        deflater = wscompress.from_settings("terminal", get_effective_settings(db))
+
+    async def send(texts: list[str]) -> None:
+        out = deflater.encode(texts) if deflater else texts
+        if isinstance(out, bytes):
+            await ws.send_bytes(out)
+            return
+        for text in out:
+            await ws.send_text(text)
+
+    if deflater:
+        await ws.send_text(json.dumps(deflater.params()))
 
     scrollback = await tm.get_scrollback(sid)
     if scrollback:
-        await ws.send_text(json.dumps({"type": "replay", "data": scrollback}))
+        await send([json.dumps({"type": "replay", "data": scrollback})])
 
     q = await tm.subscribe(sid)
 
+    def encode(item) -> str:
+        if isinstance(item, Probe):
+            stages = tm.latency.finish(item)
+            return json.dumps({"type": "probe", "id": item.id, "server": stages})
+        if isinstance(item, InputAck):
+            return json.dumps({"type": "input_ack", "seq": item.seq, "offset": item.offset})
+        if isinstance(item, Ping):
+            return json.dumps({"type": "ping", "t": item.at})
+        return item.frame()
+
     async def sender() -> None:
         while True:
-            chunk = await q.get()
-            await ws.send_text(json.dumps({"type": "output", "data": chunk}))
+            if q.empty():
+                tm.resume(sid, q)
+            texts = [encode(await q.get())]
+            # Z kompresją: zaległe wiadomości idą razem w jednej ramce
+            while deflater and len(texts) < 64 and not q.empty():
+                texts.append(encode(q.get_nowait()))
+            await send(texts)
 
     async def receiver() -> None:
         while True:
             raw = await ws.receive_text()
+            peer.seen()
             msg = json.loads(raw)
             t = msg.get("type")
             if t == "input":
                 data = msg.get("data", "")
-                await tm.write(sid, data.encode("utf-8", errors="ignore"))
+                probe = None
+                if "probe" in msg:
+                    probe = Probe(id=int(msg["probe"]), queue=q, t_recv=time.perf_counter())
+                ack = InputAck(seq=int(msg["seq"]), queue=q) if "seq" in msg else None
+                await tm.write(sid, data.encode("utf-8", errors="ignore"), probe=probe, ack=ack)
             elif t == "resize":
                 await tm.resize(sid, int(msg.get("cols", 120)), int(msg.get("rows", 30)))
-
-    import asyncio
+            elif t == "visibility":
+                tm.set_visible(sid, q, bool(msg.get("visible", True)))
+            elif t == "probe_report":
+                tm.latency.report(
+                    server_ms=float(msg.get("server_ms", 0)),
+                    rtt_ms=float(msg.get("rtt_ms", 0)),
+                    render_ms=float(msg.get("render_ms", 0)),
+                )
+
+    def ping(at: float) -> None:
+        try:
+            q.put_nowait(Ping(at=at))
+        except asyncio.QueueFull:
+            pass  # pełna kolejka - brak odpowiedzi i tak zakończy połączenie
 
     st = asyncio.create_task(sender())
     rt = asyncio.create_task(receiver())
+    peer = Peer("terminal", queues=lambda: [(sid, q)], ping=ping, close=lambda: (st.cancel(), rt.cancel()))
+    tm.heartbeat.register(peer)
 
     try:
         done, pending = await asyncio.wait({st, rt}, return_when=asyncio.FIRST_EXCEPTION)
         for d in done:
-            _ = d.result()
+            # Anulowane = klient nie odpowiadał na pingi
+            if not d.cancelled():
+                _ = d.result()
     except WebSocketDisconnect:
         pass
     finally:
+        tm.heartbeat.unregister(peer)
         for t in (st, rt):
             t.cancel()
-        await tm.unsubscribe(sid, q)
\ No newline at end of file
+        await tm.unsubscribe(sid, q)
+        if deflater:
+            deflater.close()
+        metrics.WS_CONNECTIONS.labels("terminal").dec()
+
+
+@app.websocket("/ws/mux")
+async def ws_mux(ws: WebSocket) -> None:
+    """All terminal tabs over one socket; see ``MuxConnection`` for the protocol."""
+    if not await ws_authorize(ws):
+        return
+
+    await ws.accept()
+    metrics.WS_CONNECTIONS.labels("mux").inc()
+    metrics.WS_CONNECTIONS_TOTAL.labels("mux").inc()
+    try:
+        deflater = None
+        if ws.query_params.get("compress") == "deflate":
+            deflater = wscompress.from_settings("mux", get_effective_settings(db))
+        await MuxConnection(ws, tm, deflater).run()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        metrics.WS_CONNECTIONS.labels("mux").dec()
+
+
+# ---------- WebSocket: read-only spectators ----------
+@app.websocket("/ws/share/{token}")
+async def ws_share(ws: WebSocket, token: str) -> None:
+    """Read-only view of a shared session; the share token replaces the cookie.
+
+    Spectators do not get subscriber queues: each is a position in the
+    session's ``ShareLog`` and this loop sends whatever lies past it. Input
+    from the client is ignored except as a sign of life for the heartbeat.
+    """
+    parsed = parse_share_token(token)
+    sess = tm.shared_session(*parsed) if parsed else None
+    limit = int(get_effective_settings(db).get("share_max_spectators", 200))
+    # Odrzucenie po accept - strona widza dostaje kod i przestaje się łączyć
+    await ws.accept()
+    if not sess:
+        await ws.close(code=4401)
+        return
+    if limit and sess.share and len(sess.share.spectators) >= limit:
+        await ws.close(code=4429)
+        return
+
+    metrics.WS_CONNECTIONS.labels("share").inc()
+    metrics.WS_CONNECTIONS_TOTAL.labels("share").inc()
+
+    sid = sess.id
+    log, sp, replay = tm.open_share(sess)
+
+    async def sender() -> None:
+        await ws.send_text(json.dumps({"type": "replay", "data": replay, "cols": sess.cols, "rows": sess.rows}))
+        while True:
+            # Przed read - wpis lub ping dodany w trakcie wysyłania obudzi od razu
+            changed = log.changed()
+            batch = log.read(sp, SHARE_BATCH)
+            if batch is None:
+                # Za wolny widz - zamiast zaległości reset i aktualny ogon
+                chunk = tm.share_skip(sid, log, sp)
+                if chunk:
+                    await ws.send_text(json.dumps({"type": "output", "data": chunk, "offset": sp.offset}))
+                continue
+            for item in batch:
+                await ws.send_text(item.frame())
+            if sp.ping_at is not None:
+                await ws.send_text(json.dumps({"type": "ping", "t": sp.ping_at}))
+                sp.ping_at = None
+            if batch:
+                continue
+            if log.status:
+                await ws.send_text(json.dumps({"type": "end", "status": log.status}))
+                await ws.close()
+                return
+            await changed.wait()
+
+    async def receiver() -> None:
+        while True:
+            await ws.receive_text()
+            peer.seen()
+
+    def ping(at: float) -> None:
+        sp.ping_at = at
+        log.wake()
+
+    st = asyncio.create_task(sender())
+    rt = asyncio.create_task(receiver())
+    peer = Peer("share", queues=lambda: [], ping=ping, close=lambda: (st.cancel(), rt.cancel()))
+    tm.heartbeat.register(peer)
+
+    try:
+        done, pending = await asyncio.wait({st, rt}, return_when=asyncio.FIRST_COMPLETED)
+        for d in done:
+            if not d.cancelled():
+                _ = d.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        tm.heartbeat.unregister(peer)
+        for t in (st, rt):
+            t.cancel()
+        tm.close_share(sid, log, sp)
+        metrics.WS_CONNECTIONS.labels("share").dec()
+
+
+# ---------- WebSocket: recording playback ----------
+@app.websocket("/ws/recording/{sid}")
+async def ws_recording(ws: WebSocket, sid: str, speed: float = 1.0, idle_limit: float = 2.0) -> None:
+    """Replay a recording with its original timing, scaled by ``speed``.
+
+    Pauses longer than ``idle_limit`` seconds (recording time) are shortened.
+    The client may send ``{"type": "speed", "value": x}`` to change speed
+    and ``{"type": "pause"}`` / ``{"type": "resume"}`` while playing.
+    """
+    if not await ws_authorize(ws):
+        return
+    if not tm.recordings.exists(sid):
+        await ws.close(code=4404)
+        return
+
+    await ws.accept()
+    metrics.WS_CONNECTIONS.labels("recording").inc()
+    metrics.WS_CONNECTIONS_TOTAL.labels("recording").inc()
+
+    control = {"speed": max(0.1, speed)}
+    playing = asyncio.Event()
+    playing.set()
+
+    async def player() -> None:
+        loop = asyncio.get_event_loop()
+        lines = tm.recordings.iter_lines(sid)
+        header = True
+        last_t = 0.0
+        while batch := await loop.run_in_executor(None, take_lines, lines):
+            for line in batch:
+                if header:
+                    header = False
+                    await ws.send_text(json.dumps({"type": "header", "data": json.loads(line)}))
+                    continue
+                t, code, data = json.loads(line)
+                delay = min(t - last_t, idle_limit) if idle_limit > 0 else t - last_t
+                last_t = t
+                if delay > 0:
+                    await asyncio.sleep(delay / control["speed"])
+                await playing.wait()
+                if code == "o":
+                    await ws.send_text(json.dumps({"type": "output", "data": data, "t": t}))
+                elif code == "r":
+                    cols, rows = data.split("x", 1)
+                    await ws.send_text(json.dumps({"type": "resize", "cols": int(cols), "rows": int(rows)}))
+        await ws.send_text(json.dumps({"type": "end"}))
+
+    async def receiver() -> None:
+        while True:
+            msg = json.loads(await ws.receive_text())
+            t = msg.get("type")
+            if t == "speed":
+                control["speed"] = max(0.1, float(msg.get("value", 1.0)))
+            elif t == "pause":
+                playing.clear()
+            elif t == "resume":
+                playing.set()
+
+    pt = asyncio.create_task(player())
+    rt = asyncio.create_task(receiver())
+    try:
+        done, pending = await asyncio.wait({pt, rt}, return_when=asyncio.FIRST_COMPLETED)
+        for d in done:
+            _ = d.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for t in (pt, rt):
+            t.cancel()
+        metrics.WS_CONNECTIONS.labels("recording").dec()
@@ -0,0 +1,322 @@
+"""Minimal in-process metrics registry with Prometheus text exposition.
+
+Updates are plain attribute arithmetic (no locks, no allocation once a label
+set exists), so instrumentation can stay on in production. All metrics are
+module-level objects registered in ``REGISTRY`` and rendered by ``/metrics``.
+"""
+from __future__ import annotations
+
+import bisect
+import math
+from collections.abc import Callable, Iterable
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], _Metric] = {}
+        REGISTRY.register(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def remove(self, *values: str) -> None:
+        self._children.pop(values, None)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _series(self) -> Iterable[tuple[tuple[str, ...], _Metric]]:
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._series():
+            out.extend(child._render_child(self.name, self.labelnames, values))
+        return out
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        self.value = 0.0
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self) -> Counter:
+        c = Counter.__new__(Counter)
+        c.value = 0.0
+        return c
+
+    def inc(self, n: float = 1.0) -> None:
+        self.value += n
+
+    def _render_child(self, name, names, values) -> list[str]:
+        return [f"{name}{_labels(names, values)} {_fmt(self.value)}"]
+
+
+class Gauge(_Metric):
+    """Gauge set directly or computed at scrape time by ``set_function``.
+
+    The function returns a number, or for labelled gauges a mapping of
+    label-value tuples to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        self.value = 0.0
+        self._fn: Callable[[], object] | None = None
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self) -> Gauge:
+        g = Gauge.__new__(Gauge)
+        g.value = 0.0
+        g._fn = None
+        return g
+
+    def set(self, v: float) -> None:
+        self.value = v
+
+    def inc(self, n: float = 1.0) -> None:
+        self.value += n
+
+    def dec(self, n: float = 1.0) -> None:
+        self.value -= n
+
+    def set_function(self, fn: Callable[[], object]) -> None:
+        self._fn = fn
+
+    def _series(self):
+        if self._fn is None:
+            return super()._series()
+        try:
+            v = self._fn()
+        except Exception:
+            return []
+        if isinstance(v, dict):
+            out = []
+            for values, x in v.items():
+                g = self._new_child()
+                g.value = x
+                out.append((values, g))
+            return out
+        g = self._new_child()
+        g.value = v
+        return [((), g)]
+
+    def _render_child(self, name, names, values) -> list[str]:
+        return [f"{name}{_labels(names, values)} {_fmt(self.value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: Iterable[float],
+        labelnames: Iterable[str] = (),
+    ) -> None:
+        self.bounds = sorted(buckets)
+        self._reset()
+        super().__init__(name, help, labelnames)
+
+    def _reset(self) -> None:
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self) -> Histogram:
+        h = Histogram.__new__(Histogram)
+        h.bounds = self.bounds
+        h._reset()
+        return h
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def _render_child(self, name, names, values) -> list[str]:
+        out = []
+        acc = 0
+        for bound, n in zip([*self.bounds, math.inf], self.counts):
+            acc += n
+            le = 'le="' + _fmt(bound) + '"'
+            out.append(f"{name}_bucket{_labels(names, values, le)} {acc}")
+        out.append(f"{name}_sum{_labels(names, values)} {_fmt(self.sum)}")
+        out.append(f"{name}_count{_labels(names, values)} {self.count}")
+        return out
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        self.metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for m in self.metrics.values():
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+_LATENCY = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# ----- PTY / pompa wyjścia -----
+PTY_READ_BYTES = Histogram(
+    "devbridge_pty_read_bytes",
+    "Size of non-empty PTY reads.",
+    buckets=(16, 64, 256, 1024, 2048, 4096, 16384),
+)
+PUMP_ITERATION_SECONDS = Histogram(
+    "devbridge_pump_iteration_seconds",
+    "Time of one output pump iteration that produced output (read, scrollback, broadcast).",
+    buckets=_LATENCY,
+)
+SESSION_OUTPUT_CHARS = Counter(
+    "devbridge_session_output_chars_total",
+    "Characters of PTY output per session.",
+    ["session"],
+)
+SESSION_CPU_PERCENT = Gauge(
+    "devbridge_session_cpu_percent",
+    "CPU use of the session's whole process tree (100 = one core).",
+    ["session"],
+)
+SESSION_RSS_BYTES = Gauge("devbridge_session_rss_bytes", "Resident memory of the session's process tree.", ["session"])
+SESSION_PROCESSES = Gauge("devbridge_session_processes", "Processes in the session's tree.", ["session"])
+PROC_SWEEP_SECONDS = Histogram(
+    "devbridge_proc_sweep_seconds",
+    "Duration of one /proc sweep for all sessions.",
+    buckets=_LATENCY,
+)
+SESSION_INPUT_BYTES = Counter(
+    "devbridge_session_input_bytes_total",
+    "Bytes written to the PTY per session.",
+    ["session"],
+)
+INPUT_BATCH_MESSAGES = Histogram(
+    "devbridge_input_batch_messages",
+    "Input messages coalesced into one PTY write.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+SUBSCRIBER_QUEUE_DEPTH = Gauge(
+    "devbridge_subscriber_queue_depth",
+    "Chunks waiting in the deepest subscriber queue of a session.",
+    ["session"],
+)
+DROPPED_CHUNKS = Counter(
+    "devbridge_dropped_chunks_total",
+    "Output chunks dropped because a subscriber queue was full.",
+    ["session"],
+)
+# Bez etykiety sesji - nie znika razem z sesją (porównania w benchmarks/run.py)
+DROPPED_CHUNKS_ALL = Counter(
+    "devbridge_dropped_chunks_all_total",
+    "Output chunks dropped because a subscriber queue was full, all sessions.",
+)
+OUTPUT_SUMMARIZED_CHARS = Counter(
+    "devbridge_output_summarized_chars_total",
+    "Output characters not streamed because the session was flooding (sent as snapshots).",
+    ["session"],
+)
+OUTPUT_FLOODS = Counter("devbridge_output_floods_total", "Times a session switched to summarize mode.")
+
+# ----- sesje i połączenia -----
+SESSIONS_ACTIVE = Gauge("devbridge_sessions_active", "Running terminal sessions.")
+SESSIONS_CREATED = Counter("devbridge_sessions_created_total", "Terminal sessions created.")
+WS_CONNECTIONS = Gauge("devbridge_websocket_connections", "Open WebSocket connections.", ["endpoint"])
+MUX_CHANNELS = Gauge("devbridge_mux_channels", "Sessions attached over multiplexed WebSockets.")
+WS_CONNECTIONS_TOTAL = Counter("devbridge_websocket_connections_total", "Accepted WebSocket connections.", ["endpoint"])
+SHARE_SPECTATORS = Gauge("devbridge_share_spectators", "Read-only spectators watching shared sessions.")
+SHARE_SKIPS = Counter(
+    "devbridge_share_skips_total",
+    "Times a slow spectator was moved ahead instead of being sent the backlog.",
+)
+WS_PEERS_RECLAIMED = Counter(
+    "devbridge_websocket_peers_reclaimed_total",
+    "WebSockets dropped after missing heartbeats.",
+    ["endpoint"],
+)
+WS_RECLAIMED_BYTES = Counter(
+    "devbridge_websocket_reclaimed_bytes_total",
+    "Queued output bytes freed from dropped WebSockets.",
+)
+WS_COMPRESSION_BYTES = Counter(
+    "devbridge_websocket_compression_bytes_total",
+    "Bytes before (raw) and after (compressed) application-level deflate.",
+    ["kind"],
+)
+WS_COMPRESSION_SECONDS = Counter(
+    "devbridge_websocket_compression_cpu_seconds_total",
+    "CPU time spent compressing WebSocket frames.",
+)
+LOGIN_SECONDS = Histogram(
+    "devbridge_login_seconds",
+    "Duration of login requests (including password hashing).",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    labelnames=["result"],
+)
+
+# ----- baza danych -----
+DB_OP_SECONDS = Histogram(
+    "devbridge_db_op_seconds",
+    "Duration of SQLite operations, including waiting for the DB lock.",
+    buckets=_LATENCY,
+    labelnames=["op"],
+)
+HISTORY_PRUNED_SESSIONS = Counter(
+    "devbridge_history_pruned_sessions_total",
+    "Finished sessions deleted by the retention policy.",
+)
+DB_FREE_PAGES = Gauge("devbridge_db_free_pages", "Free SQLite pages left after the last incremental vacuum.")
+
+# ----- pamięć -----
+MEMORY_BYTES = Gauge("devbridge_memory_bytes", "Scrollback memory accounting (see /api/stats).", ["kind"])
+
+# ----- pętla zdarzeń -----
+LOOP_LAG_SECONDS = Histogram(
+    "devbridge_event_loop_lag_seconds",
+    "Delay between scheduling a heartbeat callback on the event loop and running it.",
+    buckets=_LATENCY,
+)
+SCHEDULER_WAKEUPS = Counter("devbridge_scheduler_wakeups_total", "Times the housekeeping timer woke the event loop.")
+LOOP_STALLS = Counter(
+    "devbridge_event_loop_stalls_total",
+    "Heartbeats delayed beyond loop_lag_threshold_ms (slow callbacks).",
+)
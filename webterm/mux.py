@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+
+from fastapi import WebSocket
+
+from . import metrics
+from .heartbeat import Peer
+from .latency import Probe
+from .terminal_manager import InputAck, Output, TerminalManager
+from .wscompress import Deflater
+
+# Okno kontroli przepływu na kanał (znaki wysłane, a niepotwierdzone przez klienta)
+WINDOW_CHARS = 256 * 1024
+# Maksymalny rozmiar jednej ramki output przy łączeniu zaległych kawałków
+MAX_FRAME_CHARS = 64 * 1024
+
+
+@dataclass
+class Channel:
+    sid: str
+    queue: asyncio.Queue
+    credit: int = WINDOW_CHARS
+    has_credit: asyncio.Event = field(default_factory=asyncio.Event)
+    task: asyncio.Task | None = None
+
+
+class MuxConnection:
+    """Many terminal sessions over one WebSocket (``/ws/mux``).
+
+    Every frame carries the session id as its channel (``ch``). The client
+    sends ``subscribe`` / ``unsubscribe`` to attach channels and then the same
+    ``input`` / ``resize`` / ``visibility`` / ``probe_report`` messages as on
+    ``/ws/terminal/{sid}``. Output is flow controlled per channel: at most
+    ``WINDOW_CHARS`` characters may be unacknowledged, and the client returns
+    credit with ``{"type": "ack", "ch": sid, "chars": n}`` once it has rendered
+    them, so one busy session cannot starve the others on the shared socket.
+    With a ``deflater`` frames above its threshold are sent compressed.
+    Connection-level ``{"type": "ping"}`` messages expect a ``pong``; a
+    client that stays silent past the heartbeat timeout is disconnected.
+    """
+
+    def __init__(self, ws: WebSocket, tm: TerminalManager, deflater: Deflater | None = None) -> None:
+        self.ws = ws
+        self.tm = tm
+        self.deflater = deflater
+        self.channels: dict[str, Channel] = {}
+        self.peer: Peer | None = None
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, msg: dict) -> None:
+        text = json.dumps(msg, ensure_ascii=False)
+        async with self._send_lock:
+            # Kompresja pod blokadą - kolejność ramek = kolejność w strumieniu deflate
+            out = self.deflater.encode([text]) if self.deflater else [text]
+            if isinstance(out, bytes):
+                await self.ws.send_bytes(out)
+            else:
+                await self.ws.send_text(text)
+
+    async def run(self) -> None:
+        peer = self.peer = Peer(
+            "mux",
+            queues=lambda: [(ch.sid, ch.queue) for ch in self.channels.values()],
+            ping=self.ping,
+            close=lambda: reader.cancel(),
+        )
+        reader = asyncio.create_task(self._receive())
+        self.tm.heartbeat.register(peer)
+        try:
+            await asyncio.wait({reader})
+            # Anulowany = klient nie odpowiadał na pingi
+            if not reader.cancelled():
+                reader.result()
+        finally:
+            self.tm.heartbeat.unregister(peer)
+            reader.cancel()
+            for sid in list(self.channels):
+                await self.unsubscribe(sid)
+            if self.deflater:
+                self.deflater.close()
+
+    async def _receive(self) -> None:
+        if self.deflater:
+            await self.ws.send_text(json.dumps(self.deflater.params()))
+        while True:
+            msg = json.loads(await self.ws.receive_text())
+            self.peer.seen()
+            await self.handle(msg)
+
+    async def ping(self, at: float) -> None:
+        try:
+            await self.send({"type": "ping", "t": at})
+        except Exception:
+            pass  # zamknięte gniazdo - receiver zakończy połączenie
+
+    async def handle(self, msg: dict) -> None:
+        t = msg.get("type")
+        sid = str(msg.get("ch", ""))
+        if t == "subscribe":
+            await self.subscribe(sid, replay=bool(msg.get("replay", True)))
+        elif t == "unsubscribe":
+            await self.unsubscribe(sid)
+            await self.send({"type": "unsubscribed", "ch": sid})
+        elif t == "ack":
+            ch = self.channels.get(sid)
+            if ch:
+                ch.credit = min(WINDOW_CHARS, ch.credit + max(0, int(msg.get("chars", 0))))
+                if ch.credit > 0:
+                    ch.has_credit.set()
+        elif t == "input":
+            ch = self.channels.get(sid)
+            if not ch:
+                return
+            data = msg.get("data", "")
+            probe = None
+            if "probe" in msg:
+                probe = Probe(id=int(msg["probe"]), queue=ch.queue, t_recv=time.perf_counter())
+            ack = InputAck(seq=int(msg["seq"]), queue=ch.queue) if "seq" in msg else None
+            await self.tm.write(sid, data.encode("utf-8", errors="ignore"), probe=probe, ack=ack)
+        elif t == "resize":
+            await self.tm.resize(sid, int(msg.get("cols", 120)), int(msg.get("rows", 30)))
+        elif t == "visibility":
+            ch = self.channels.get(sid)
+            if ch:
+                self.tm.set_visible(sid, ch.queue, bool(msg.get("visible", True)))
+        elif t == "probe_report":
+            self.tm.latency.report(
+                server_ms=float(msg.get("server_ms", 0)),
+                rtt_ms=float(msg.get("rtt_ms", 0)),
+                render_ms=float(msg.get("render_ms", 0)),
+            )
+
+    async def subscribe(self, sid: str, replay: bool = True) -> None:
+        if not sid or sid in self.channels:
+            return
+        # Replay nie liczy się do okna - klient i tak musi go w całości dostać
+        scrollback = await self.tm.get_scrollback(sid) if replay else ""
+        ch = Channel(sid=sid, queue=await self.tm.subscribe(sid))
+        ch.has_credit.set()
+        self.channels[sid] = ch
+        metrics.MUX_CHANNELS.inc()
+        await self.send({"type": "replay", "ch": sid, "data": scrollback})
+        ch.task = asyncio.create_task(self._forward(ch))
+
+    async def unsubscribe(self, sid: str) -> None:
+        ch = self.channels.pop(sid, None)
+        if not ch:
+            return
+        metrics.MUX_CHANNELS.dec()
+        if ch.task:
+            ch.task.cancel()
+        await self.tm.unsubscribe(sid, ch.queue)
+
+    async def _forward(self, ch: Channel) -> None:
+        try:
+            while True:
+                if ch.queue.empty():
+                    # Zaległości wysłane - jeśli coś przepadło przy pełnej kolejce, dogoń
+                    self.tm.resume(ch.sid, ch.queue)
+                item = await ch.queue.get()
+                if not isinstance(item, Output):
+                    await self._send_control(ch, item)
+                    continue
+                await ch.has_credit.wait()
+                # Zbierz zaległe kawałki w jedną ramkę (mniej ramek przy dużym ruchu)
+                offset = item.offset
+                parts, n, control = [item.data], len(item.data), None
+                while n < min(ch.credit, MAX_FRAME_CHARS) and not ch.queue.empty():
+                    nxt = ch.queue.get_nowait()
+                    if not isinstance(nxt, Output):
+                        control = nxt
+                        break
+                    offset = nxt.offset
+                    parts.append(nxt.data)
+                    n += len(nxt.data)
+                await self.send({"type": "output", "ch": ch.sid, "data": "".join(parts), "offset": offset})
+                ch.credit -= n
+                if ch.credit <= 0:
+                    ch.has_credit.clear()
+                if control:
+                    await self._send_control(ch, control)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Gniazdo zamknięte - receiver zakończy połączenie
+            print(f"Mux channel {ch.sid} stopped: {e}")
+
+    async def _send_control(self, ch: Channel, item: Probe | InputAck) -> None:
+        if isinstance(item, InputAck):
+            await self.send({"type": "input_ack", "ch": ch.sid, "seq": item.seq, "offset": item.offset})
+            return
+        stages = self.tm.latency.finish(item)
+        await self.send({"type": "probe", "ch": ch.sid, "id": item.id, "server": stages})
+
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+
+@dataclass
+class ProcUsage:
+    cpu_percent: float | None  # None po pierwszym przebiegu (brak punktu odniesienia)
+    rss_bytes: int
+    processes: int
+    foreground: str | None  # nazwa zadania na pierwszym planie; None = sama powłoka
+    foreground_pid: int | None
+    foreground_cmdline: str | None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class _Proc:
+    ppid: int
+    pgrp: int
+    tpgid: int
+    ticks: int  # utime + stime
+    rss_pages: int
+    comm: str
+
+
+def _read_stat(path: Path) -> _Proc:
+    raw = path.read_bytes().decode("utf-8", errors="replace")
+    # comm może zawierać spacje i nawiasy - pola liczymy od ostatniego ')'
+    head, _, rest = raw.rpartition(")")
+    f = rest.split()
+    return _Proc(
+        ppid=int(f[1]),
+        pgrp=int(f[2]),
+        tpgid=int(f[5]),
+        ticks=int(f[11]) + int(f[12]),
+        rss_pages=int(f[21]),
+        comm=head.partition("(")[2],
+    )
+
+
+class ProcSampler:
+    """Per-session CPU, memory and foreground job from one ``/proc`` sweep.
+
+    ``sweep`` reads ``/proc/<pid>/stat`` of every process once, builds the
+    parent→child map and sums each session's process tree below its shell.
+    CPU% is the tick delta since the previous sweep; the foreground job is
+    the process group the shell's terminal has in front (``tpgid``). Linux
+    only - elsewhere ``available`` is False and sweeps return nothing.
+    """
+
+    def __init__(self, proc: str = "/proc") -> None:
+        self.proc = Path(proc)
+        self.available = (self.proc / "self" / "stat").exists()
+        self._ticks: dict[int, int] = {}
+        self._at = 0.0
+        self.last_sweep_seconds = 0.0
+        if self.available:
+            self.clk_tck = os.sysconf("SC_CLK_TCK")
+            self.page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def _scan(self) -> dict[int, _Proc]:
+        procs: dict[int, _Proc] = {}
+        with os.scandir(self.proc) as it:
+            for entry in it:
+                if not entry.name.isdigit():
+                    continue
+                try:
+                    procs[int(entry.name)] = _read_stat(Path(entry.path) / "stat")
+                except (OSError, ValueError, IndexError):
+                    continue  # proces zniknął w trakcie przebiegu
+        return procs
+
+    def _cmdline(self, pid: int) -> str | None:
+        try:
+            raw = (self.proc / str(pid) / "cmdline").read_bytes()
+        except OSError:
+            return None
+        return raw.rstrip(b"\0").replace(b"\0", b" ").decode("utf-8", errors="replace")[:256]
+
+    def sweep(self, roots: dict[str, int]) -> dict[str, ProcUsage]:
+        """Usage of each session's tree; ``roots`` maps session id to shell PID."""
+        if not self.available or not roots:
+            return {}
+        t0 = time.perf_counter()
+        now = time.monotonic()
+        procs = self._scan()
+        children: dict[int, list[int]] = defaultdict(list)
+        for pid, p in procs.items():
+            children[p.ppid].append(pid)
+
+        elapsed = now - self._at if self._at else 0.0
+        out: dict[str, ProcUsage] = {}
+        for sid, root in roots.items():
+            shell = procs.get(root)
+            if shell is None:
+                continue
+            ticks = rss = n = 0
+            stack = [root]
+            while stack:
+                pid = stack.pop()
+                p = procs[pid]
+                n += 1
+                rss += p.rss_pages
+                # Nowy proces (nieznany w poprzednim przebiegu) liczy się od zera
+                ticks += p.ticks - self._ticks.get(pid, 0)
+                stack.extend(children.get(pid, ()))
+            fg = procs.get(shell.tpgid) if shell.tpgid > 0 and shell.tpgid != shell.pgrp else None
+            out[sid] = ProcUsage(
+                cpu_percent=round(100.0 * ticks / self.clk_tck / elapsed, 1) if elapsed else None,
+                rss_bytes=rss * self.page_size,
+                processes=n,
+                foreground=fg.comm if fg else None,
+                foreground_pid=shell.tpgid if fg else None,
+                foreground_cmdline=self._cmdline(shell.tpgid) if fg else None,
+            )
+
+        self._ticks = {pid: p.ticks for pid, p in procs.items()}
+        self._at = now
+        self.last_sweep_seconds = time.perf_counter() - t0
+        return out
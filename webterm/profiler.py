@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+import traceback
+
+from . import metrics
+
+# Moduły, w których czeka bezczynna pętla zdarzeń
+_IDLE_FILES = {"selectors.py", "windows_events.py"}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> list[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler over ``sys._current_frames()``.
+
+    Samples every thread of the process (event loop and ``run_in_executor``
+    workers alike) from a background thread, so the profiled code runs
+    unmodified. The result is in the collapsed-stack format understood by
+    ``flamegraph.pl`` and speedscope: ``thread;outer;...;inner count``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def profile(self, seconds: float, interval: float) -> str:
+        """Blocking; run it in its own thread. Raises RuntimeError if already running."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            counts: collections.Counter[str] = collections.Counter()
+            me = threading.get_ident()
+            end = time.monotonic() + seconds
+            while time.monotonic() < end:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    stack = [names.get(ident, f"thread-{ident}"), *_collapse(frame)]
+                    counts[";".join(stack)] += 1
+                time.sleep(interval)
+            return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+        finally:
+            self._lock.release()
+
+
+class LoopMonitor:
+    """Event-loop lag watchdog.
+
+    A watchdog thread posts a heartbeat callback to the loop every
+    ``check_interval`` seconds. If it is not run within ``threshold`` the loop
+    is blocked by a slow callback: the loop thread's stack is captured while
+    it is still stuck and logged once the loop catches up, together with the
+    measured lag. ``threshold = 0`` disables the monitor; the thread then
+    sleeps until ``configure`` turns it back on, since the heartbeat itself
+    costs a wakeup every ``check_interval``.
+    """
+
+    def __init__(self, threshold: float = 0.0, check_interval: float = 0.05, log_every: float = 1.0) -> None:
+        self.threshold = threshold
+        self.check_interval = check_interval
+        self.log_every = log_every
+        self.stalls: collections.deque[dict] = collections.deque(maxlen=50)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread = 0
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._enabled = threading.Event()
+        if threshold > 0:
+            self._enabled.set()
+        self._last_log = 0.0
+        self._suppressed = 0
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._loop_thread = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    def configure(self, threshold: float) -> None:
+        self.threshold = threshold
+        if threshold > 0:
+            self._enabled.set()
+        else:
+            self._enabled.clear()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._enabled.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            if self.threshold <= 0:
+                # Wyłączony - bez cyklicznych wybudzeń, czekamy na configure()/stop()
+                self._enabled.wait()
+                continue
+            beat = threading.Event()
+            posted = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(beat.set)
+            except RuntimeError:
+                return  # pętla zamknięta
+            if beat.wait(self.threshold):
+                metrics.LOOP_LAG_SECONDS.observe(time.perf_counter() - posted)
+                continue
+            # Pętla wciąż zablokowana - stos wolnego callbacku jest teraz na wierzchu
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            while not beat.wait(1.0):
+                if self._stop.is_set():
+                    return
+            lag = time.perf_counter() - posted
+            metrics.LOOP_LAG_SECONDS.observe(lag)
+            # Pętla czekała w select() - opóźnienie wybudzenia (GIL), nie wolny callback
+            if frame is not None and os.path.basename(frame.f_code.co_filename) not in _IDLE_FILES:
+                self._report(lag, stack)
+
+    def _report(self, lag: float, stack: str) -> None:
+        metrics.LOOP_STALLS.inc()
+        self.stalls.append({"at": time.time(), "lag_ms": round(lag * 1000, 1), "stack": stack})
+        now = time.monotonic()
+        if now - self._last_log < self.log_every:
+            self._suppressed += 1
+            return
+        extra = f" ({self._suppressed} more suppressed)" if self._suppressed else ""
+        print(f"Event loop blocked for {lag * 1000:.1f} ms{extra}; stack of the slow callback:\n{stack}")
+        self._last_log = now
+        self._suppressed = 0
@@ -5,8 +5,11 @@ import pty
 import fcntl
 import termios
 import struct
+import time
 from dataclasses import dataclass
 
+from .isolation import SessionLimits
+
 
 @dataclass
 class UnixPty:
@@ -21,8 +24,12 @@ class UnixPty:
         winsz = struct.pack("HHHH", rows, cols, 0, 0)
         fcntl.ioctl(self.master_fd, termios.TIOCSWINSZ, winsz)
 
-    def write(self, data: bytes) -> None:
-        os.write(self.master_fd, data)
+    def write(self, data: bytes) -> int:
+        # Master jest nieblokujący - przy pełnym buforze wejścia zapis jest częściowy
+        try:
+            return os.write(self.master_fd, data)
+        except BlockingIOError:
+            return 0
 
     def read(self, n: int = 4096) -> bytes:
         try:
@@ -30,6 +37,23 @@ class UnixPty:
         except BlockingIOError:
             return b""
 
+    def exit_code(self, timeout: float = 0.0) -> int | None:
+        """Reap the child and return its exit code (negative = killed by signal).
+
+        Blocks up to ``timeout`` seconds; None if it is still running.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                pid, status = os.waitpid(self.pid, os.WNOHANG)
+            except ChildProcessError:
+                return None
+            if pid:
+                return os.waitstatus_to_exitcode(status)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.01)
+
     def terminate(self) -> None:
         try:
             os.kill(self.pid, 15)
@@ -37,13 +61,17 @@ class UnixPty:
             pass
 
 
-def spawn_unix(shell: str, cwd: str, cols: int, rows: int) -> UnixPty:
+def spawn_unix(shell: str, cwd: str, cols: int, rows: int, limits: SessionLimits | None = None) -> UnixPty:
+    # Wszystko, co wymaga Pythona "na poważnie" (ścieżki, ctypes, formatowanie), przed fork
+    prepared = limits.prepare() if limits is not None else None
     pid, master_fd = pty.fork()
     if pid == 0:
         try:
             os.chdir(cwd)
         except Exception:
             os.chdir(os.path.expanduser("~"))
+        if prepared is not None:
+            prepared.apply()
         os.execvp(shell, [shell])
 
     p = UnixPty(pid=pid, master_fd=master_fd)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
 import winpty  # type: ignore
 
@@ -32,6 +33,14 @@ class WindowsPty:
         except Exception:
             return b""
 
+    def exit_code(self, timeout: float = 0.0) -> int | None:
+        deadline = time.monotonic() + timeout
+        while self.pty.isalive():
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.01)
+        return self.pty.exitstatus
+
     def terminate(self) -> None:
         try:
             self.pty.close()
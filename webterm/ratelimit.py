@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+
+# Wyjście z trybu streszczania, gdy kubełek napełni się do tej części pojemności
+RESUME_FRACTION = 0.25
+
+
+@dataclass
+class TokenBucket:
+    """Characters-per-second bucket; ``rate <= 0`` means unlimited."""
+
+    rate: float
+    burst: float
+    tokens: float = 0.0
+    updated: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self) -> None:
+        self.tokens = self.burst
+
+    def refill(self, now: float) -> None:
+        # Kubełek mógł powstać już po odczycie zegara przez wołającego
+        self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def take(self, n: int, now: float) -> bool:
+        """Charge ``n`` chars; False if the bucket could not cover them."""
+        if self.rate <= 0:
+            return True
+        self.refill(now)
+        ok = self.tokens >= n
+        self.tokens = max(0.0, self.tokens - n)
+        return ok
+
+    def recovered(self, now: float) -> bool:
+        if self.rate <= 0:
+            return True
+        self.refill(now)
+        return self.tokens >= self.burst * RESUME_FRACTION
+
+
+class OutputLimiter:
+    """Output flood control: one bucket per session and one per owner.
+
+    The pump charges every read to both buckets. A session whose own bucket
+    runs dry, or that reads at full speed while its owner's bucket is dry,
+    is flagged as flooding; it leaves that state once its buckets have
+    refilled to ``RESUME_FRACTION``. Small interactive reads never trip the
+    owner limit, so one user's runaway log does not freeze their other tabs.
+    Without logins the owner is the client's address (``owner_key``).
+    """
+
+    @staticmethod
+    def owner_key(username: str | None, client: str | None) -> str | None:
+        """Owner bucket of a new session: the user, or for anonymous sessions the client address."""
+        if username is not None:
+            return username
+        # Prefiks - adres nie może trafić do kubełka użytkownika o takiej nazwie
+        return f"client:{client}" if client else None
+
+    def __init__(self) -> None:
+        self.sessions: dict[str, TokenBucket] = {}
+        self.owners: dict[str, TokenBucket] = {}
+        self.session_rate = 0.0
+        self.owner_rate = 0.0
+        self.burst_seconds = 5.0
+
+    def configure(self, cfg: dict) -> None:
+        self.session_rate = float(cfg.get("output_rate_limit_chars", 0))
+        self.owner_rate = float(cfg.get("output_rate_limit_user_chars", 0))
+        self.burst_seconds = max(0.1, float(cfg.get("output_burst_seconds", 5)))
+        for b in self.sessions.values():
+            b.rate, b.burst = self.session_rate, self.session_rate * self.burst_seconds
+        for b in self.owners.values():
+            b.rate, b.burst = self.owner_rate, self.owner_rate * self.burst_seconds
+
+    def _bucket(self, table: dict[str, TokenBucket], key: str, rate: float) -> TokenBucket:
+        b = table.get(key)
+        if b is None:
+            b = table[key] = TokenBucket(rate=rate, burst=rate * self.burst_seconds)
+        return b
+
+    def admit(self, sid: str, owner: str | None, n: int, full_read: bool) -> bool:
+        now = time.monotonic()
+        ok = self._bucket(self.sessions, sid, self.session_rate).take(n, now)
+        if owner is not None:
+            owner_ok = self._bucket(self.owners, owner, self.owner_rate).take(n, now)
+            ok = ok and (owner_ok or not full_read)
+        return ok
+
+    def recovered(self, sid: str, owner: str | None) -> bool:
+        now = time.monotonic()
+        ok = self._bucket(self.sessions, sid, self.session_rate).recovered(now)
+        if owner is not None:
+            ok = ok and self._bucket(self.owners, owner, self.owner_rate).recovered(now)
+        return ok
+
+    def forget(self, sid: str) -> None:
+        self.sessions.pop(sid, None)
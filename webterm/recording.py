@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import gzip
+import json
+import shutil
+import threading
+import time
+import zlib
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+# Co ile sekund bufor nagrań trafia na dysk
+FLUSH_EVERY = 1.0
+# Tyle znaków w buforze zapisuje go od razu, nie czekając na FLUSH_EVERY
+FLUSH_CHARS = 1024 * 1024
+# Powyżej tego (dysk nie nadąża) nowe zdarzenia są pomijane, w nagraniu zostaje znacznik
+MAX_PENDING_CHARS = 16 * 1024 * 1024
+
+
+class Recorder:
+    """Asciicast v2 recording of one session.
+
+    The pump only appends ``(time, code, data)`` tuples to a deque; encoding,
+    gzip compression and file I/O happen in ``flush()``, which the
+    ``RecordingWriter`` runs in an executor thread. Output is split into
+    gzip parts of about ``rotate_bytes``; only the first part carries the
+    header, so concatenating the decompressed parts gives one ``.cast`` file.
+
+    The deque is bounded: past ``FLUSH_CHARS`` it asks for an early flush
+    (``on_backlog``), past ``MAX_PENDING_CHARS`` events are dropped and an
+    asciicast marker (``"m"``) records how much is missing.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        cols: int,
+        rows: int,
+        shell: str,
+        record_input: bool = False,
+        rotate_bytes: int = 8 * 1024 * 1024,
+    ) -> None:
+        self.directory = directory
+        self.record_input = record_input
+        self.rotate_bytes = rotate_bytes
+        self._t0 = time.monotonic()
+        self._events: collections.deque[tuple[float, str, str]] = collections.deque()
+        self._pending_chars = 0
+        self._dropped_chars = 0
+        self._count_lock = threading.Lock()  # licznik zmieniają pętla i wątek executora
+        self.on_backlog: Callable[[], None] | None = None
+        self._part = 0
+        self._gz: gzip.GzipFile | None = None
+        self._io_lock = threading.Lock()
+        self._header = {
+            "version": 2,
+            "width": cols,
+            "height": rows,
+            "timestamp": int(time.time()),
+            "env": {"SHELL": shell, "TERM": "xterm-256color"},
+        }
+        self.closed = False
+
+    # ----- wywoływane z pętli zdarzeń (tanie) -----
+    def output(self, text: str) -> None:
+        self._add("o", text)
+
+    def input(self, text: str) -> None:
+        if self.record_input:
+            self._add("i", text)
+
+    def resize(self, cols: int, rows: int) -> None:
+        self._add("r", f"{cols}x{rows}")
+
+    def _add(self, code: str, data: str) -> None:
+        with self._count_lock:
+            if self._pending_chars >= MAX_PENDING_CHARS:
+                self._dropped_chars += len(data)
+                return
+            self._pending_chars += len(data)
+            backlog = self._pending_chars >= FLUSH_CHARS
+        self._events.append((time.monotonic() - self._t0, code, data))
+        if backlog and self.on_backlog:
+            self.on_backlog()
+
+    # ----- wywoływane w wątku executora -----
+    def flush(self) -> None:
+        with self._io_lock:
+            self._flush()
+
+    def close(self) -> None:
+        with self._io_lock:
+            self._flush()
+            if self._gz:
+                self._gz.close()
+                self._gz = None
+            self.closed = True
+
+    def _flush(self) -> None:
+        if not self._events or self.closed:
+            return
+        lines = []
+        taken = 0
+        for _ in range(len(self._events)):
+            t, code, data = self._events.popleft()
+            taken += len(data)
+            lines.append(json.dumps([round(t, 6), code, data], ensure_ascii=False))
+        with self._count_lock:
+            self._pending_chars -= taken
+            dropped, self._dropped_chars = self._dropped_chars, 0
+        if dropped:
+            t = round(time.monotonic() - self._t0, 6)
+            lines.append(json.dumps([t, "m", f"recording skipped {dropped} characters"]))
+        gz = self._open_part()
+        gz.write(("\n".join(lines) + "\n").encode("utf-8"))
+        # Z_SYNC_FLUSH: dane są czytelne zanim część zostanie zamknięta
+        gz.flush()
+        if gz.fileobj.tell() >= self.rotate_bytes:
+            gz.close()
+            self._gz = None
+            self._part += 1
+
+    def _open_part(self) -> gzip.GzipFile:
+        if self._gz is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._gz = gzip.open(self.directory / f"part-{self._part:04d}.cast.gz", "wb", compresslevel=6)
+            if self._part == 0:
+                self._gz.write((json.dumps(self._header) + "\n").encode("utf-8"))
+        return self._gz
+
+
+class RecordingWriter:
+    """Background writer flushing all active recorders once per ``FLUSH_EVERY``."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.recorders: dict[str, Recorder] = {}
+        self._task: asyncio.Task | None = None
+        self._wake: asyncio.Event | None = None
+
+    def path(self, sid: str) -> Path:
+        return self.directory / sid
+
+    def start(self, sid: str, **kwargs) -> Recorder:
+        rec = Recorder(self.path(sid), **kwargs)
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        rec.on_backlog = self._wake.set
+        self.recorders[sid] = rec
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return rec
+
+    async def stop(self, sid: str) -> None:
+        rec = self.recorders.pop(sid, None)
+        if rec:
+            await asyncio.get_event_loop().run_in_executor(None, rec.close)
+
+    def exists(self, sid: str) -> bool:
+        return (self.path(sid) / "part-0000.cast.gz").exists()
+
+    def delete(self, sid: str) -> None:
+        shutil.rmtree(self.path(sid), ignore_errors=True)
+
+    def sweep(self, keep: set[str]) -> int:
+        """Delete recordings of sessions not in ``keep`` (pruned from history); returns the count."""
+        if not self.directory.is_dir():
+            return 0
+        removed = 0
+        for d in self.directory.iterdir():
+            if d.is_dir() and d.name not in keep and d.name not in self.recorders:
+                self.delete(d.name)
+                removed += 1
+        return removed
+
+    def flush_all(self) -> None:
+        for rec in list(self.recorders.values()):
+            try:
+                rec.flush()
+            except Exception as e:
+                print(f"Error writing recording {rec.directory.name}: {e}")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_event_loop()
+        while self.recorders:
+            try:
+                # Co FLUSH_EVERY albo od razu, gdy któryś bufor urósł ponad FLUSH_CHARS
+                await asyncio.wait_for(self._wake.wait(), FLUSH_EVERY)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await loop.run_in_executor(None, self.flush_all)
+
+    def iter_lines(self, sid: str) -> Iterator[str]:
+        """Yield the recording as asciicast lines (header first), streaming from disk.
+
+        Tolerates the unfinished gzip member of a recording still in progress.
+        """
+        for part in sorted(self.path(sid).glob("part-*.cast.gz")):
+            d = zlib.decompressobj(wbits=31)
+            pending = b""
+            with open(part, "rb") as f:
+                while chunk := f.read(64 * 1024):
+                    pending += d.decompress(chunk)
+                    *lines, pending = pending.split(b"\n")
+                    for line in lines:
+                        if line:
+                            yield line.decode("utf-8")
+
+
+def take_lines(lines: Iterator[str], n: int = 500) -> list[str]:
+    """Take up to ``n`` lines from ``lines`` (for batched reads from an executor)."""
+    out = []
+    for line in lines:
+        out.append(line)
+        if len(out) >= n:
+            break
+    return out
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Hashable
+
+from . import metrics
+
+
+class Scheduler:
+    """One timer heap for all sessions' housekeeping.
+
+    Jobs are keyed: scheduling a key again replaces its earlier deadline,
+    and ``cancel(key)`` drops it (lazily - stale heap entries are skipped
+    when they surface). Only the earliest deadline is armed on the event
+    loop, so thousands of dormant sessions cost no wakeups at all.
+    Callbacks run on the loop; coroutine functions are started as tasks.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._jobs: dict[Hashable, tuple[int, Callable[[], Any]]] = {}
+        self._seq = itertools.count()
+        self._handle: asyncio.TimerHandle | None = None
+        self._armed_at = float("inf")
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def call_later(self, delay: float, key: Hashable, fn: Callable[[], Any]) -> None:
+        self.call_at(time.monotonic() + delay, key, fn)
+
+    def call_at(self, when: float, key: Hashable, fn: Callable[[], Any]) -> None:
+        seq = next(self._seq)
+        self._jobs[key] = (seq, fn)
+        heapq.heappush(self._heap, (when, seq, key))
+        if when < self._armed_at:
+            self._arm(when)
+
+    def every(self, interval: float, key: Hashable, fn: Callable[[], Any], first: float | None = None) -> None:
+        def tick() -> Any:
+            self.call_later(interval, key, tick)
+            return fn()
+
+        self.call_later(interval if first is None else first, key, tick)
+
+    def scheduled(self, key: Hashable) -> bool:
+        return key in self._jobs
+
+    def cancel(self, key: Hashable) -> None:
+        self._jobs.pop(key, None)
+
+    def _arm(self, when: float) -> None:
+        if self._handle:
+            self._handle.cancel()
+        loop = asyncio.get_running_loop()
+        # Opóźnienie, nie call_at: zegar uvloop nie musi być time.monotonic()
+        self._handle = loop.call_later(max(0.0, when - time.monotonic()), self._run)
+        self._armed_at = when
+
+    def _run(self) -> None:
+        self._handle = None
+        self._armed_at = float("inf")
+        metrics.SCHEDULER_WAKEUPS.inc()
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            job = self._jobs.get(key)
+            if job is None or job[0] != seq:
+                continue  # anulowane albo przełożone
+            del self._jobs[key]
+            try:
+                res = job[1]()
+                if asyncio.iscoroutine(res):
+                    asyncio.ensure_future(res)
+            except Exception as e:
+                print(f"Scheduled job {key!r} failed: {e}")
+        # Wyrzuć z wierzchu wpisy już nieaktualne, żeby nie budzić pętli na darmo
+        while self._heap and self._jobs.get(self._heap[0][2], (None,))[0] != self._heap[0][1]:
+            heapq.heappop(self._heap)
+        if self._heap:
+            self._arm(self._heap[0][0])
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import contextlib
+import struct
+import zlib
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from .spill import SpillStore
+
+_MAGIC = b"SB1\n"
+_HDR = struct.Struct(">II")  # liczba znaków, liczba bajtów bloku
+
+# Kompaktuj plik spill dopiero gdy martwy prefiks jest większy niż to
+_COMPACT_MIN_BYTES = 1024 * 1024
+
+
+@dataclass
+class Block:
+    nchars: int
+    data: bytes | None  # tekst UTF-8 skompresowany zlib; None = wyrzucony na dysk
+    spill: tuple[int, int] | None = None  # (offset, długość) w pliku SpillStore
+    seq: int = 0  # numer kolejny bloku w sesji (klucz w tabeli scrollback_blocks)
+
+
+class Scrollback:
+    """Session output kept as compressed frozen blocks plus a hot tail.
+
+    Appends go to an uncompressed tail; once it reaches ``block_chars`` it is
+    compressed into an immutable block. Whole blocks are dropped from the
+    front when they are no longer needed to cover ``limit`` characters, and
+    ``text()`` returns exactly the last ``limit`` characters. Blocks are only
+    decompressed when the text is actually read (replay).
+
+    Under memory pressure ``spill()`` moves frozen blocks to a ``SpillStore``;
+    they are read back through mmap whenever the text is needed.
+
+    Persistence is incremental: every frozen block is written once
+    (``delta`` / ``mark_saved``) and the session row only carries the hot
+    tail (``tail_bytes``), so saving a session neither re-reads spilled
+    blocks nor rewrites the whole history.
+    """
+
+    def __init__(self, limit: int, block_chars: int = 64 * 1024) -> None:
+        self.limit = max(0, limit)
+        self.block_chars = block_chars
+        self.blocks: list[Block] = []
+        self._frozen_chars = 0
+        self._tail: list[str] = []
+        self._tail_chars = 0
+        self._store: SpillStore | None = None
+        self._key = ""
+        self._next_seq = 0
+        self._saved_seq = 0  # bloki o numerach poniżej są już w bazie
+
+    def __len__(self) -> int:
+        return min(self._frozen_chars + self._tail_chars, self.limit)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def append(self, text: str) -> None:
+        if not text:
+            return
+        self._tail.append(text)
+        self._tail_chars += len(text)
+        if self._tail_chars >= self.block_chars:
+            self._freeze()
+        self._trim()
+
+    def text(self) -> str:
+        with self._payloads() as payloads:
+            parts = [zlib.decompress(p).decode("utf-8") for p in payloads]
+        parts.extend(self._tail)
+        s = "".join(parts)
+        return s[len(s) - self.limit :] if len(s) > self.limit else s
+
+    def tail(self, n: int) -> str:
+        """Last ``n`` characters, decompressing only the blocks that cover them."""
+        n = min(n, len(self))
+        if n <= 0:
+            return ""
+        hot = "".join(self._tail)
+        if len(hot) >= n:
+            return hot[len(hot) - n :]
+        need = n - len(hot)
+        first = len(self.blocks)
+        while first > 0 and need > 0:
+            first -= 1
+            need -= self.blocks[first].nchars
+        with self._payloads() as payloads:
+            parts = [zlib.decompress(p).decode("utf-8") for p in payloads[first:]]
+        s = "".join(parts) + hot
+        return s[len(s) - n :]
+
+    def memory_bytes(self) -> int:
+        """Approximate payload size held in memory."""
+        return sum(len(b.data) for b in self.blocks if b.data is not None) + self._tail_chars
+
+    def spilled_bytes(self) -> int:
+        return sum(b.spill[1] for b in self.blocks if b.spill is not None)
+
+    def spill(self, store: SpillStore, key: str, include_tail: bool = False) -> int:
+        """Move in-memory blocks to ``store``; returns the number of bytes freed.
+
+        ``include_tail`` also freezes the hot tail, which only makes sense for
+        sessions that will not receive more output.
+        """
+        self._store = store
+        self._key = key
+        before = self.memory_bytes()
+        if include_tail and self._tail_chars:
+            self._freeze(partial=True)
+        for b in self.blocks:
+            if b.data is not None:
+                b.spill = store.write(key, b.data)
+                b.data = None
+        return before - self.memory_bytes()
+
+    def release(self) -> None:
+        """Forget spilled data (session removed from memory)."""
+        if self._store:
+            self._store.drop(self._key)
+            self._store = None
+
+    @contextlib.contextmanager
+    def _payloads(self):
+        if self._store and any(b.data is None for b in self.blocks):
+            with self._store.view(self._key) as mm:
+                yield [b.data if b.data is not None else mm[b.spill[0] : b.spill[0] + b.spill[1]] for b in self.blocks]
+        else:
+            yield [b.data for b in self.blocks]
+
+    def _freeze(self, partial: bool = False) -> None:
+        tail = "".join(self._tail)
+        self._tail = []
+        self._tail_chars = 0
+        for i in range(0, len(tail), self.block_chars):
+            chunk = tail[i : i + self.block_chars]
+            if len(chunk) < self.block_chars and not partial:
+                # Reszta zostaje w gorącym ogonie
+                self._tail = [chunk]
+                self._tail_chars = len(chunk)
+                break
+            self.blocks.append(Block(len(chunk), zlib.compress(chunk.encode("utf-8"), 6), seq=self._next_seq))
+            self._next_seq += 1
+            self._frozen_chars += len(chunk)
+
+    def _trim(self) -> None:
+        dropped_spilled = False
+        while self.blocks and self._frozen_chars + self._tail_chars - self.blocks[0].nchars >= self.limit:
+            b = self.blocks.pop(0)
+            self._frozen_chars -= b.nchars
+            dropped_spilled = dropped_spilled or b.spill is not None
+        if dropped_spilled and self._store:
+            self._compact_spill()
+
+    def _compact_spill(self) -> None:
+        spilled = [b for b in self.blocks if b.spill is not None]
+        if not spilled:
+            self.release()
+            return
+        # Bloki są dopisywane w kolejności strumienia, więc martwe dane to prefiks pliku
+        start = spilled[0].spill[0]
+        if start < _COMPACT_MIN_BYTES or start < self._store.size(self._key) - start:
+            return
+        shift = self._store.compact(self._key, start)
+        for b in spilled:
+            b.spill = (b.spill[0] - shift, b.spill[1])
+
+    # ----- serializacja do DB -----
+    def delta(self) -> tuple[list[tuple[int, int, bytes]], int, int]:
+        """Blocks frozen since the last save as ``(seq, nchars, data)``.
+
+        Also returns the first block still kept (older ones may be deleted)
+        and the value to pass to ``mark_saved`` once the write succeeded.
+        Only the new blocks are read, normally straight from memory.
+        """
+        new = []
+        pending = [b for b in self.blocks if b.seq >= self._saved_seq]
+        if any(b.data is None for b in pending):
+            with self._store.view(self._key) as mm:
+                for b in pending:
+                    data = b.data if b.data is not None else mm[b.spill[0] : b.spill[0] + b.spill[1]]
+                    new.append((b.seq, b.nchars, data))
+        else:
+            new = [(b.seq, b.nchars, b.data) for b in pending]
+        first = self.blocks[0].seq if self.blocks else self._next_seq
+        return new, first, self._next_seq
+
+    def mark_saved(self, upto: int) -> None:
+        self._saved_seq = max(self._saved_seq, upto)
+
+    def tail_bytes(self) -> bytes:
+        """The hot tail in the serialized format (frozen blocks are saved by ``delta``)."""
+        out = [_MAGIC]
+        if self._tail_chars:
+            data = zlib.compress("".join(self._tail).encode("utf-8"), 1)
+            out.append(_HDR.pack(self._tail_chars, len(data)))
+            out.append(data)
+        return b"".join(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, limit: int, frozen: Sequence[tuple[int, int, bytes]] = ()) -> Scrollback:
+        """Rebuild from ``tail_bytes`` and the saved ``frozen`` blocks (``(seq, nchars, data)``).
+
+        Rows written before incremental saving hold every block in ``data``;
+        those blocks count as unsaved.
+        """
+        sb = cls(limit)
+        if not data.startswith(_MAGIC):
+            raise ValueError("Not a serialized scrollback")
+        pos = len(_MAGIC)
+        records = []
+        while pos < len(data):
+            nchars, nbytes = _HDR.unpack_from(data, pos)
+            pos += _HDR.size
+            records.append((nchars, data[pos : pos + nbytes]))
+            pos += nbytes
+        # Ostatni rekord to zapisany ogon - wraca do pamięci nieskompresowany
+        tail = records.pop() if records else None
+        sb.blocks = [Block(nchars, d, seq=seq) for seq, nchars, d in frozen]
+        sb._next_seq = sb._saved_seq = sb.blocks[-1].seq + 1 if sb.blocks else 0
+        for nchars, d in records:
+            sb.blocks.append(Block(nchars, d, seq=sb._next_seq))
+            sb._next_seq += 1
+        sb._frozen_chars = sum(b.nchars for b in sb.blocks)
+        if tail:
+            sb.append(zlib.decompress(tail[1]).decode("utf-8"))
+        sb._trim()
+        return sb
+
+    @classmethod
+    def from_text(cls, text: str, limit: int) -> Scrollback:
+        sb = cls(limit)
+        sb.append(text)
+        return sb
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import re
+import time
+from dataclasses import dataclass, field
+
+from .db import DB
+
+# CSI, OSC (zakończone BEL lub ST), DCS/SOS/PM/APC oraz pojedyncze sekwencje ESC
+_ANSI_RE = re.compile(
+    r"\x1b(?:\[[0-?]*[ -/]*[@-~]"
+    r"|\][^\x07\x1b]*(?:\x07|\x1b\\)"
+    r"|[PX^_][^\x1b]*\x1b\\"
+    r"|[ -/]*[0-~])"
+)
+# Początek sekwencji, której reszta jeszcze nie przyszła (cała końcówka bufora)
+_INCOMPLETE_RE = re.compile(r"\x1b(?:\[[0-?]*[ -/]*|\][^\x07\x1b]*|[PX^_][^\x1b]*|[ -/]*)")
+# Znaki sterujące poza \t i \n (\r, backspace, BEL, ...)
+_CTRL_RE = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+# Usuwaj segmenty spoza okna scrollbacku dopiero, gdy okno przesunie się o tyle znaków
+PRUNE_STEP = 64 * 1024
+
+
+def strip_ansi(text: str) -> str:
+    """Remove escape sequences and control characters, keeping plain text."""
+    return _CTRL_RE.sub("", _ANSI_RE.sub("", text))
+
+
+def _split_incomplete_escape(raw: str) -> tuple[str, str]:
+    """Split off a trailing escape sequence that continues in the next chunk."""
+    esc = raw.rfind("\x1b", max(0, len(raw) - 256))
+    if esc == -1:
+        return raw, ""
+    tail = raw[esc:]
+    if _INCOMPLETE_RE.fullmatch(tail) or not _ANSI_RE.match(tail):
+        return raw[:esc], tail
+    return raw, ""
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word is a quoted term, last one as prefix."""
+    words = [w for w in re.split(r"\s+", text.strip()) if w]
+    terms = ['"' + w.replace('"', '""') + '"' for w in words]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+@dataclass
+class _Pending:
+    start_offset: int
+    parts: list[str] = field(default_factory=list)
+    size: int = 0
+    first_at: float = 0.0
+
+
+class ScrollbackIndexer:
+    """Incrementally feeds session output into the FTS index.
+
+    Output is buffered per session and written as segments of roughly
+    ``segment_chars`` characters, each tagged with the stream offset of its
+    first character, so a match can be mapped back to a scrollback position.
+    ``prune`` deletes segments that scrolled out of the session's capped
+    scrollback, so the index stays as large as the scrollback it describes.
+    """
+
+    def __init__(self, db: DB, segment_chars: int = 1024, max_age: float = 5.0) -> None:
+        self.db = db
+        self.segment_chars = segment_chars
+        self.max_age = max_age
+        self._pending: dict[str, _Pending] = {}
+        self._pruned: dict[str, int] = {}  # offset, przed którym segmenty już usunięto
+
+    def feed(self, sid: str, offset: int, text: str) -> None:
+        if not self.db.fts_enabled or not text:
+            return
+        p = self._pending.get(sid)
+        if p is None:
+            p = self._pending[sid] = _Pending(start_offset=offset, first_at=time.time())
+        p.parts.append(text)
+        p.size += len(text)
+
+    def flush(self, sid: str | None = None, force: bool = False) -> None:
+        """Write buffered output to the index.
+
+        Without ``force`` only sessions with a full segment or with output
+        older than ``max_age`` are written; partial segments keep buffering.
+        """
+        self.db.add_scrollback_segments(self.take(sid, force))
+
+    def take(self, sid: str | None = None, force: bool = False) -> list[tuple[str, int, str]]:
+        """Segments ``flush`` would write, removed from the buffers but not written yet.
+
+        Lets the caller write them outside the event loop. An escape
+        sequence cut at the end of the buffer always waits for the rest,
+        even when forced, so no fragments of it end up in the index.
+        """
+        now = time.time()
+        segments: list[tuple[str, int, str]] = []
+        for key in [sid] if sid else list(self._pending):
+            p = self._pending.get(key)
+            if p is None:
+                continue
+            if not force and p.size < self.segment_chars and now - p.first_at < self.max_age:
+                continue
+            del self._pending[key]
+            raw, rest = _split_incomplete_escape("".join(p.parts))
+            segments.extend(self._segments(key, p.start_offset, raw))
+            if rest:
+                self._pending[key] = _Pending(
+                    start_offset=p.start_offset + len(raw),
+                    parts=[rest],
+                    size=len(rest),
+                    first_at=now,
+                )
+        return segments
+
+    def prune(self, sid: str, window_start: int, force: bool = False) -> None:
+        """Delete segments of ``sid`` lying wholly before stream offset ``window_start``."""
+        if not self.db.fts_enabled:
+            return
+        # Segment zaczęty przed oknem może do niego sięgać - najwyżej segment_chars znaków
+        cutoff = window_start - self.segment_chars
+        done = self._pruned.get(sid, 0)
+        if cutoff <= done or (not force and cutoff - done < PRUNE_STEP):
+            return
+        self.db.delete_scrollback_segments(sid, before=cutoff)
+        self._pruned[sid] = cutoff
+
+    def drop(self, sid: str) -> None:
+        """Forget a session's indexing state (it will not produce more output)."""
+        self._pending.pop(sid, None)
+        self._pruned.pop(sid, None)
+
+    def _segments(self, sid: str, start: int, raw: str) -> list[tuple[str, int, str]]:
+        out = []
+        pos = 0
+        while pos < len(raw):
+            end = pos + self.segment_chars
+            if end < len(raw):
+                # Tnij na końcu linii, żeby nie rozdzielać słów
+                nl = raw.rfind("\n", pos, end)
+                if nl > pos:
+                    end = nl + 1
+                else:
+                    # Bez końca linii - nie tnij w środku sekwencji sterującej
+                    head, _ = _split_incomplete_escape(raw[pos:end])
+                    if head:
+                        end = pos + len(head)
+            text = strip_ansi(raw[pos:end]).strip()
+            if text:
+                out.append((sid, start + pos, text))
+            pos = end
+        return out
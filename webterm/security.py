@@ -22,11 +22,16 @@ def verify_password(pw: str, pw_hash: str) -> bool:
     return bcrypt.checkpw(pw.encode('utf-8'), pw_hash.encode('utf-8'))
 
 
-def _sign(data: bytes) -> str:
-    mac = hmac.new(env.SESSION_SECRET.encode("utf-8"), data, hashlib.sha256)
+def _sign(data: bytes, key: bytes | None = None) -> str:
+    mac = hmac.new(key or env.SESSION_SECRET.encode("utf-8"), data, hashlib.sha256)
     return mac.hexdigest()
 
 
+def _share_key() -> bytes:
+    # Osobny klucz: podpis linku nigdy nie jest ważnym podpisem ciasteczka logowania (i odwrotnie)
+    return hmac.new(env.SESSION_SECRET.encode("utf-8"), b"devbridge-share-token", hashlib.sha256).digest()
+
+
 def make_session_token(username: str, ttl_seconds: int = 7 * 24 * 3600) -> str:
     exp = int(time.time()) + ttl_seconds
     payload = f"{username}:{exp}".encode("utf-8")
@@ -49,6 +54,30 @@ def parse_session_token(token: str) -> str | None:
         return None
 
 
+def make_share_token(sid: str, epoch: int, ttl_seconds: int) -> str:
+    """Read-only link to one session; never accepted where the login cookie is."""
+    exp = int(time.time()) + ttl_seconds
+    payload = f"share:{sid}:{epoch}:{exp}".encode("utf-8")
+    b64 = base64.urlsafe_b64encode(payload).decode("ascii")
+    sig = _sign(payload, _share_key())
+    return f"{b64}.{sig}"
+
+
+def parse_share_token(token: str) -> tuple[str, int] | None:
+    """(session id, share epoch) of a valid, unexpired share token."""
+    try:
+        b64, sig = token.split(".", 1)
+        payload = base64.urlsafe_b64decode(b64.encode("ascii"))
+        if not hmac.compare_digest(_sign(payload, _share_key()), sig):
+            return None
+        kind, sid, epoch_s, exp_s = payload.decode("utf-8").split(":")
+        if kind != "share" or int(exp_s) < int(time.time()):
+            return None
+        return sid, int(epoch_s)
+    except Exception:
+        return None
+
+
 @dataclass
 class Principal:
     username: str | None
@@ -63,6 +92,39 @@ def get_effective_settings(db: DB) -> dict:
         "max_sessions": 50,
         "idle_ttl_seconds": 0,
         "scrollback_limit_chars": 200_000,
+        "memory_budget_bytes": 0,  # 0 = bez limitu, nic nie trafia na dysk
+        "history_max_age_days": 0,  # zakończone sesje w bazie; 0 = bez limitu (nic nie jest usuwane)
+        "history_max_sessions": 0,
+        "history_max_bytes": 0,
+        "recording_enabled": False,  # domyślne dla nowych sesji (asciicast)
+        "recording_input": False,
+        "recording_rotate_bytes": 8 * 1024 * 1024,
+        "output_rate_limit_chars": 0,  # znaki/s na sesję, 0 = bez limitu (np. 100_000)
+        "output_rate_limit_user_chars": 0,  # znaki/s na użytkownika, 0 = bez limitu (np. 250_000)
+        "output_burst_seconds": 5,
+        "output_snapshot_interval_ms": 1000,
+        "loop_lag_threshold_ms": 0,  # 0 = monitor pętli wyłączony (włączony budzi wątek co 50 ms)
+        "process_stats_interval_seconds": 5,  # przebieg /proc (Linux); 0 = wyłączony
+        # Limity sesji (Unix); 0 / "" = bez zmian
+        "session_limit_address_space_mb": 0,
+        "session_limit_processes": 0,
+        "session_limit_cpu_seconds": 0,
+        "session_nice": 0,  # np. 5 = powłoki mniej ważne od serwera
+        "session_ionice_class": "",  # best-effort / idle
+        "session_ionice_level": 4,
+        "session_cgroup_enabled": False,  # cgroup v2 z delegacją (np. systemd Delegate=yes)
+        "session_cgroup_cpu_weight": 50,  # serwer ma domyślne 100
+        "session_cgroup_memory_max_mb": 0,
+        "session_cgroup_pids_max": 0,
+        "ws_compression_enabled": False,  # deflate na poziomie aplikacji (?compress=deflate); kosztuje CPU serwera
+        "ws_compression_level": 6,
+        "ws_compression_window_bits": 15,
+        "ws_compression_context_takeover": True,
+        "ws_compression_min_bytes": 256,  # mniejsze ramki (echo) idą bez kompresji
+        "ws_ping_interval_seconds": 20,  # 0 = bez pingów i bez wykrywania martwych klientów
+        "ws_ping_timeout_seconds": 60,
+        "share_token_ttl_minutes": 60,  # linki tylko do odczytu
+        "share_max_spectators": 200,  # na sesję
         "default_unix_shell": "/bin/bash",
         "default_windows_shell": "powershell.exe",
     }
@@ -15,5 +15,8 @@ class EnvSettings(BaseSettings):
     BOOTSTRAP_ADMIN_USERNAME: str = "admin"
     BOOTSTRAP_ADMIN_PASSWORD: str = "admin-change-me"
 
+    # Bearer token dla /metrics (scraper bez cookie); pusty = wymaga zalogowania
+    METRICS_TOKEN: str = ""
+
 
 env = EnvSettings()
\ No newline at end of file
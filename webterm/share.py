@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any
+
+# Tyle znaków wyjścia (najwyżej) trzyma log udostępnionej sesji
+SHARE_LOG_CHARS = 256 * 1024
+# Wpisów wysyłanych widzowi za jednym przebiegiem
+SHARE_BATCH = 64
+
+
+@dataclass(eq=False)
+class Spectator:
+    """A read-only viewer: nothing but its position in the session's ``ShareLog``."""
+
+    pos: int  # numer następnego wpisu do wysłania
+    offset: int  # offset strumienia, do którego widz ma już wyjście
+    ping_at: float | None = None  # ping czekający na wysłanie przez pętlę widza
+    skipped: int = 0
+
+
+class ShareLog:
+    """Append-only output log of one shared session, read by many spectators.
+
+    ``_broadcast`` appends every ``Output`` once; a spectator is just a
+    position in the log and ``read`` hands it a slice of the very same
+    items (frames are encoded once for everybody). Nothing is buffered per
+    viewer: one that is more than ``max_lag`` characters behind, or behind
+    the oldest entry kept (the log holds about ``limit`` characters), gets
+    ``None`` and is moved ahead with ``skip`` - the caller sends it a
+    terminal reset and the recent tail instead of the backlog.
+    """
+
+    def __init__(self, offset: int, limit: int = SHARE_LOG_CHARS, max_lag: int = 64 * 1024) -> None:
+        self.items: list[Any] = []  # items[i] to wpis numer base + i
+        self.base = 0
+        self._head = 0  # wpisy przed _head już wypadły (usuwane partiami)
+        self.chars = 0
+        self.offset = offset  # offset strumienia po ostatnim wpisie
+        self.limit = limit
+        self.max_lag = max_lag
+        self.spectators: set[Spectator] = set()
+        self.status: str | None = None  # ustawione, gdy udostępnianie się skończyło
+        self._sizes: list[int] = []
+        self._changed = asyncio.Event()
+
+    @property
+    def end(self) -> int:
+        return self.base + len(self.items)
+
+    def join(self, offset: int) -> Spectator:
+        sp = Spectator(pos=self.end, offset=offset)
+        self.spectators.add(sp)
+        return sp
+
+    def leave(self, sp: Spectator) -> None:
+        self.spectators.discard(sp)
+
+    def append(self, item: Any, chars: int) -> None:
+        """Add an item (``offset`` = stream offset after it, ``frame()`` = its message)."""
+        self.items.append(item)
+        self._sizes.append(chars)
+        self.chars += chars
+        self.offset = item.offset
+        while self.chars > self.limit and len(self.items) - self._head > 1:
+            self.chars -= self._sizes[self._head]
+            self._head += 1
+        if self._head >= 1024 and self._head * 2 >= len(self.items):
+            del self.items[: self._head]
+            del self._sizes[: self._head]
+            self.base += self._head
+            self._head = 0
+        self.wake()
+
+    def read(self, sp: Spectator, limit: int = SHARE_BATCH) -> list[Any] | None:
+        """Next items for ``sp`` (possibly none); ``None`` when it has to skip ahead."""
+        if sp.pos < self.base + self._head or self.offset - sp.offset > self.max_lag:
+            return None
+        i = sp.pos - self.base
+        batch = self.items[i : i + limit]
+        if batch:
+            sp.pos += len(batch)
+            sp.offset = batch[-1].offset
+        return batch
+
+    def skip(self, sp: Spectator, offset: int) -> None:
+        """Move ``sp`` past everything logged so far; it has output up to ``offset``."""
+        sp.pos = self.end
+        sp.offset = offset
+        sp.skipped += 1
+
+    def wake(self) -> None:
+        # Obudź wszystkich widzów naraz i przygotuj zdarzenie na następny raz
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def changed(self) -> asyncio.Event:
+        """Set by the next ``append``, ``wake`` or ``close``.
+
+        Take it before ``read``: whatever happens while the reader is busy
+        sending then still ends its wait.
+        """
+        return self._changed
+
+    def close(self, status: str) -> None:
+        self.status = status
+        self.wake()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import contextlib
+import mmap
+import os
+from collections.abc import Iterator
+from pathlib import Path
+
+
+class SpillStore:
+    """Append-only per-session files for scrollback blocks evicted from memory.
+
+    Blocks are appended in stream order and read back through ``mmap``, so
+    paging them in for a replay goes through the OS page cache instead of the
+    Python heap. Files are scratch space only: the DB keeps the durable copy,
+    so the directory is wiped on startup.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for p in self.directory.glob("*.spill"):
+            with contextlib.suppress(OSError):
+                p.unlink()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.spill"
+
+    def write(self, key: str, data: bytes) -> tuple[int, int]:
+        """Append ``data``; returns its (offset, length) in the file."""
+        with open(self._path(key), "ab") as f:
+            offset = f.tell()
+            f.write(data)
+        return offset, len(data)
+
+    @contextlib.contextmanager
+    def view(self, key: str) -> Iterator[mmap.mmap]:
+        with open(self._path(key), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+    def size(self, key: str) -> int:
+        try:
+            return self._path(key).stat().st_size
+        except OSError:
+            return 0
+
+    def compact(self, key: str, start: int) -> int:
+        """Drop the dead prefix ``[0, start)``; returns the offset shift."""
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        with self.view(key) as mm, open(tmp, "wb") as out:
+            out.write(mm[start:])
+        os.replace(tmp, path)
+        return start
+
+    def drop(self, key: str) -> None:
+        with contextlib.suppress(OSError):
+            self._path(key).unlink()
@@ -42,6 +42,24 @@ const state = {
   // Quick Actions
   quickActions: JSON.parse(localStorage.getItem('quickActions') || '[]'),
   editingActionId: null,
+
+  // Latency probe (debug, opt-in: Ctrl+Shift+L)
+  latencyProbe: localStorage.getItem('latencyProbe') === '1',
+  latencySamples: { rtt: [], render: [], total: [] },
+
+  // All tabs over one multiplexed WebSocket (opt-in: localStorage wsMux=1)
+  wsMux: localStorage.getItem('wsMux') === '1',
+  mux: null,
+
+  // Terminal socket in a Web Worker (opt-in: localStorage wsWorker=1)
+  wsWorker: localStorage.getItem('wsWorker') === '1',
+
+  // Predictive local echo for slow links (opt-in: localStorage localEcho=1)
+  localEcho: localStorage.getItem('localEcho') === '1',
+
+  // Session list kept in sync by /api/sessions/events
+  sessionsVersion: 0,
+  sessionEvents: null,
 };
 
 // ============================================
@@ -244,7 +262,6 @@ async function restoreOpenTabs() {
 function createTerminalInstance(sessionId) {
   const term = new Terminal({
     cursorBlink: true,
-    convertEol: true,
     fontSize: window.innerWidth <= 768 ? 10 : 14,
     fontFamily: "'JetBrains Mono', 'Consolas', monospace",
     theme: {
@@ -293,26 +310,491 @@ function createTerminalPanel(sessionId) {
   return container;
 }
 
-function connectWebSocket(sessionId, term, fitAddon) {
+// ============================================
+// Multiplexed WebSocket (/ws/mux)
+// ============================================
+
+const MUX_ACK_CHARS = 32 * 1024;
+
+/**
+ * One socket carrying every open tab. Each tab gets a MuxChannel that
+ * behaves like a WebSocket (readyState, send, close, on* handlers), so the
+ * terminal code does not care which transport it runs on.
+ */
+class MuxConnection {
+  constructor() {
+    this.channels = new Map();
+    const proto = location.protocol === 'https:' ? 'wss' : 'ws';
+    this.ws = new WebSocket(withCompression(`${proto}://${location.host}/ws/mux`));
+    this.ws.binaryType = 'arraybuffer';
+    this.ws.onopen = () => {
+      for (const ch of this.channels.values()) ch._subscribe();
+    };
+    const inflater = new Inflater((msg) => {
+      if (msg.type === 'ping') {
+        this.send({ type: 'pong' });
+        return;
+      }
+      const ch = this.channels.get(msg.ch);
+      if (ch) ch._receive(msg);
+    });
+    this.ws.onmessage = (ev) => inflater.push(ev);
+    this.ws.onclose = () => {
+      if (state.mux === this) state.mux = null;
+      for (const ch of this.channels.values()) ch._closed();
+      this.channels.clear();
+    };
+    this.ws.onerror = (err) => {
+      for (const ch of this.channels.values()) {
+        if (ch.onerror) ch.onerror(err);
+      }
+    };
+  }
+
+  channel(sessionId) {
+    const ch = new MuxChannel(this, sessionId);
+    this.channels.set(sessionId, ch);
+    if (this.ws.readyState === WebSocket.OPEN) ch._subscribe();
+    return ch;
+  }
+
+  send(msg) {
+    if (this.ws.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify(msg));
+    }
+  }
+}
+
+class MuxChannel {
+  constructor(mux, sessionId) {
+    this.mux = mux;
+    this.sessionId = sessionId;
+    this.readyState = WebSocket.CONNECTING;
+    this.onopen = this.onmessage = this.onclose = this.onerror = null;
+    this.unacked = 0;
+    this.ackTimer = null;
+  }
+
+  _subscribe() {
+    this.mux.send({ type: 'subscribe', ch: this.sessionId });
+  }
+
+  _receive(msg) {
+    if (msg.type === 'replay' && this.readyState === WebSocket.CONNECTING) {
+      this.readyState = WebSocket.OPEN;
+      if (this.onopen) this.onopen();
+    } else if (msg.type === 'unsubscribed') {
+      return;
+    }
+    if (this.onmessage) this.onmessage({ msg });
+  }
+
+  _closed() {
+    if (this.readyState === WebSocket.CLOSED) return;
+    this.readyState = WebSocket.CLOSED;
+    clearTimeout(this.ackTimer);
+    if (this.onclose) this.onclose();
+  }
+
+  send(text) {
+    const msg = JSON.parse(text);
+    msg.ch = this.sessionId;
+    this.mux.send(msg);
+  }
+
+  // Return flow-control credit once output has been rendered
+  ack(chars) {
+    this.unacked += chars;
+    if (this.unacked >= MUX_ACK_CHARS) {
+      this._flushAck();
+    } else if (!this.ackTimer) {
+      this.ackTimer = setTimeout(() => this._flushAck(), 50);
+    }
+  }
+
+  _flushAck() {
+    clearTimeout(this.ackTimer);
+    this.ackTimer = null;
+    if (this.unacked > 0 && this.readyState === WebSocket.OPEN) {
+      this.mux.send({ type: 'ack', ch: this.sessionId, chars: this.unacked });
+    }
+    this.unacked = 0;
+  }
+
+  close() {
+    if (this.readyState === WebSocket.CLOSED) return;
+    this.mux.send({ type: 'unsubscribe', ch: this.sessionId });
+    this.mux.channels.delete(this.sessionId);
+    this._closed();
+  }
+}
+
+/**
+ * WebSocket-like adapter for a socket owned by static/term-worker.js.
+ * JSON parsing and output coalescing happen in the worker.
+ */
+class WorkerSocket {
+  constructor(url) {
+    this.readyState = WebSocket.CONNECTING;
+    this.onopen = this.onmessage = this.onclose = this.onerror = null;
+    this.worker = new Worker('/static/term-worker.js');
+    this.worker.onmessage = (ev) => {
+      const e = ev.data;
+      if (e.event === 'open') {
+        this.readyState = WebSocket.OPEN;
+        if (this.onopen) this.onopen();
+      } else if (e.event === 'message') {
+        if (this.onmessage) this.onmessage({ msg: e.msg });
+      } else if (e.event === 'close') {
+        this.readyState = WebSocket.CLOSED;
+        this.worker.terminate();
+        if (this.onclose) this.onclose();
+      } else if (e.event === 'error') {
+        if (this.onerror) this.onerror(e);
+      }
+    };
+    this.worker.postMessage({ cmd: 'open', url });
+  }
+
+  send(text) {
+    this.worker.postMessage({ cmd: 'send', data: text });
+  }
+
+  close() {
+    if (this.readyState === WebSocket.CLOSED) return;
+    this.readyState = WebSocket.CLOSING;
+    this.worker.postMessage({ cmd: 'close' });
+  }
+}
+
+/**
+ * WebSocket-like adapter for a compressed terminal socket: decompresses
+ * binary frames (see static/inflate.js) and hands out parsed messages.
+ */
+class InflateSocket {
+  constructor(url) {
+    this.onopen = this.onmessage = this.onclose = this.onerror = null;
+    this.ws = new WebSocket(url);
+    this.ws.binaryType = 'arraybuffer';
+    const inflater = new Inflater((msg) => {
+      if (this.onmessage) this.onmessage({ msg });
+    });
+    this.ws.onopen = () => { if (this.onopen) this.onopen(); };
+    this.ws.onmessage = (ev) => inflater.push(ev);
+    this.ws.onclose = (ev) => inflater.chain.then(() => { if (this.onclose) this.onclose(ev); });
+    this.ws.onerror = (err) => { if (this.onerror) this.onerror(err); };
+  }
+
+  get readyState() {
+    return this.ws.readyState;
+  }
+
+  send(text) {
+    this.ws.send(text);
+  }
+
+  close() {
+    this.ws.close();
+  }
+}
+
+// Ask for app-level deflate when the browser can decompress it
+function withCompression(url) {
+  return INFLATE_SUPPORTED ? `${url}?compress=deflate` : url;
+}
+
+function openTerminalSocket(sessionId) {
+  if (state.wsMux) {
+    if (!state.mux) state.mux = new MuxConnection();
+    return state.mux.channel(sessionId);
+  }
   const proto = location.protocol === 'https:' ? 'wss' : 'ws';
-  const ws = new WebSocket(`${proto}://${location.host}/ws/terminal/${sessionId}`);
+  const url = withCompression(`${proto}://${location.host}/ws/terminal/${sessionId}`);
+  if (state.wsWorker && window.Worker) {
+    return new WorkerSocket(url);
+  }
+  return INFLATE_SUPPORTED ? new InflateSocket(url) : new WebSocket(url);
+}
+
+// ============================================
+// Frame-batched output
+// ============================================
+
+// Stop feeding xterm.js while this much output is still being parsed
+const WRITE_HIGH_WATER = 256 * 1024;
+
+/**
+ * Collects output between frames and hands it to xterm.js once per
+ * animation frame. The write callback tracks how much is still being
+ * parsed; above WRITE_HIGH_WATER new output waits in the buffer instead of
+ * piling up inside xterm.js.
+ */
+class OutputWriter {
+  constructor(term, onWritten = null) {
+    this.term = term;
+    this.onWritten = onWritten;
+    this.chunks = [];
+    this.chars = 0;
+    this.inFlight = 0;
+    this.scheduled = false;
+  }
+
+  push(data) {
+    if (!data) return;
+    this.chunks.push(data);
+    this.chars += data.length;
+    this.schedule();
+  }
+
+  schedule() {
+    if (this.scheduled || this.inFlight > WRITE_HIGH_WATER) return;
+    this.scheduled = true;
+    const run = () => {
+      this.scheduled = false;
+      this.flush();
+    };
+    // No animation frames in background pages
+    if (document.visibilityState === 'visible') {
+      requestAnimationFrame(run);
+    } else {
+      setTimeout(run, 250);
+    }
+  }
+
+  // Write everything buffered now (also used to keep ordering with direct writes)
+  flush() {
+    if (this.chunks.length === 0) return;
+    const data = this.chunks.length === 1 ? this.chunks[0] : this.chunks.join('');
+    const chars = this.chars;
+    this.chunks = [];
+    this.chars = 0;
+    this.inFlight += chars;
+    this.term.write(data, () => {
+      this.inFlight -= chars;
+      if (this.onWritten) this.onWritten(chars);
+      if (this.chunks.length > 0) this.schedule();
+    });
+  }
+
+  // Client-side notice after everything received so far (not server output, so never acked)
+  note(text) {
+    this.flush();
+    this.term.write(text);
+  }
+}
+
+// ============================================
+// Predictive local echo
+// ============================================
+
+// Drop predictions the server has not echoed within this time
+const ECHO_TIMEOUT_MS = 1500;
+
+/**
+ * Mosh-style speculative echo. Printable keys typed at the end of a line are
+ * drawn at once, underlined, and confirmed against the server's echo: inputs
+ * carry a sequence number, the server answers with the output offset at
+ * which the input reached the PTY (input_ack), and output past that offset
+ * must repeat the predicted characters. Predictions are erased before each
+ * batch of real output and the unconfirmed ones are drawn again after it.
+ * A mismatch, a timeout or the alternate screen drops them all.
+ *
+ * Enter or any control key starts a new epoch whose predictions stay hidden
+ * until one of them is confirmed, so prompts that do not echo (passwords)
+ * never show what is typed.
+ */
+class LocalEcho {
+  constructor(term, writer) {
+    this.term = term;
+    this.writer = writer;
+    this.pending = [];        // { ch, seq, at }
+    this.acks = new Map();    // seq -> output offset of the PTY write
+    this.seq = 0;
+    this.shown = 0;           // predicted characters currently on screen
+    this.confirmed = false;   // current epoch has a confirmed echo
+    this.barrier = false;     // no new predictions until pending ones settle
+    this.timer = null;
+  }
+
+  // Called for every input; returns the sequence number to send with it
+  input(data) {
+    const seq = ++this.seq;
+    if (!/^[\x20-\x7e\u00a0-\ud7ff\ue000-\uffff]+$/.test(data)) {
+      this.confirmed = false;
+      this.barrier = true;
+      return seq;
+    }
+    if (this.pending.length === 0) this.barrier = false;
+    if (this.barrier || !this.canPredict(data.length)) {
+      this.barrier = true;
+      return seq;
+    }
+    const now = performance.now();
+    for (const ch of data) this.pending.push({ ch, seq, at: now });
+    if (this.confirmed) this.writer.push(this.draw());
+    if (!this.timer) this.timer = setInterval(() => this.expire(), 250);
+    return seq;
+  }
+
+  canPredict(n) {
+    const buf = this.term.buffer.active;
+    if (buf.type !== 'normal') return false;
+    if (this.pending.length === 0 && (this.writer.chunks.length > 0 || this.writer.inFlight > 0)) {
+      return false;
+    }
+    // Only at the end of the line, and never across a wrap
+    const line = buf.getLine(buf.baseY + buf.cursorY);
+    if (!line || line.translateToString(true).length > buf.cursorX) return false;
+    return buf.cursorX + n < this.term.cols - 1;
+  }
+
+  // One message may carry several coalesced inputs; it acks all up to seq
+  ack(seq, offset) {
+    for (const p of this.pending) {
+      if (p.seq <= seq && !this.acks.has(p.seq)) this.acks.set(p.seq, offset);
+    }
+  }
+
+  // Wraps a chunk of server output: erase predictions, output, redraw the rest
+  output(data, offset) {
+    if (this.pending.length === 0) return data;
+    let out = this.erase() + data;
+    if (/\x1b\[\?(1049|1047|47)h/.test(data)) {
+      this.drop();
+      return out;
+    }
+    this.reconcile(data, offset);
+    if (this.pending.length > 0 && this.confirmed) out += this.draw();
+    return out;
+  }
+
+  reconcile(data, end) {
+    // Offsets count code points on the server; astral characters can skew
+    // this and at worst cause a (safe) rollback.
+    const start = end - data.length;
+    let i = 0;
+    while (this.pending.length > 0) {
+      const p = this.pending[0];
+      const ackOffset = this.acks.get(p.seq);
+      if (ackOffset === undefined) return;  // not written yet, cannot be the echo
+      i = Math.max(i, ackOffset - start);
+      const next = nextPrintable(data, i);
+      if (!next) return;
+      if (next.ch !== p.ch) {
+        this.drop();
+        return;
+      }
+      this.pending.shift();
+      this.confirmed = true;
+      i = next.index + 1;
+      if (!this.pending.some(q => q.seq === p.seq)) this.acks.delete(p.seq);
+    }
+    this.settle();
+  }
+
+  draw() {
+    const fresh = this.pending.slice(this.shown).map(p => p.ch).join('');
+    this.shown = this.pending.length;
+    return fresh ? `\x1b[4m${fresh}\x1b[24m` : '';
+  }
+
+  erase() {
+    if (this.shown === 0) return '';
+    const s = '\b'.repeat(this.shown) + '\x1b[K';
+    this.shown = 0;
+    return s;
+  }
+
+  expire() {
+    if (this.pending.length > 0 && performance.now() - this.pending[0].at > ECHO_TIMEOUT_MS) {
+      this.writer.push(this.erase());
+      this.drop();
+    }
+    if (this.pending.length === 0) this.settle();
+  }
+
+  drop() {
+    this.pending = [];
+    this.shown = 0;
+    this.confirmed = false;
+    this.settle();
+  }
+
+  settle() {
+    if (this.pending.length > 0) return;
+    this.acks.clear();
+    clearInterval(this.timer);
+    this.timer = null;
+  }
+}
+
+// Next printable character at or after index i, skipping escape sequences
+function nextPrintable(data, i) {
+  while (i < data.length) {
+    const c = data.charCodeAt(i);
+    if (c === 0x1b) {
+      const kind = data[i + 1];
+      i += 2;
+      if (kind === '[') {
+        while (i < data.length && (data.charCodeAt(i) < 0x40 || data.charCodeAt(i) > 0x7e)) i++;
+        i++;
+      } else if (kind === ']') {
+        while (i < data.length && data[i] !== '\x07' && !(data[i] === '\x1b' && data[i + 1] === '\\')) i++;
+        i += data[i] === '\x07' ? 1 : 2;
+      }
+    } else if (c < 0x20 || c === 0x7f) {
+      i++;
+    } else {
+      return { ch: data[i], index: i };
+    }
+  }
+  return null;
+}
+
+function connectWebSocket(sessionId, term, fitAddon) {
+  const ws = openTerminalSocket(sessionId);
 
   ws.onopen = () => {
     console.log(`WebSocket connected for session ${sessionId}`);
+    updateTabVisibility();
     setTimeout(() => {
       fitAddon.fit();
       sendResize(ws, term);
     }, 100);
   };
 
+  // Keystrokes tagged for latency tracing: probe id -> send time.
+  // The server answers only the latest probe of a burst, so the rest are
+  // never resolved - keep just the most recent ones.
+  const probes = new Map();
+  let probeSeq = 0;
+
+  const writer = new OutputWriter(term, ws.ack ? (chars) => ws.ack(chars) : null);
+  ws.writer = writer;
+  const echo = state.localEcho ? new LocalEcho(term, writer) : null;
+
   ws.onmessage = (ev) => {
-    const msg = JSON.parse(ev.data);
-    if (msg.type === 'replay' || msg.type === 'output') {
+    const msg = ev.msg || JSON.parse(ev.data);
+    if (msg.type === 'replay') {
+      writer.flush();
+      probes.clear();
       term.write(msg.data);
+    } else if (msg.type === 'output') {
+      writer.push(echo ? echo.output(msg.data, msg.offset) : msg.data);
+    } else if (msg.type === 'input_ack') {
+      if (echo) echo.ack(msg.seq, msg.offset);
+    } else if (msg.type === 'probe') {
+      writer.flush();
+      handleProbe(ws, term, probes, msg);
+    } else if (msg.type === 'ping') {
+      // Heartbeat - server drops sockets that stay silent
+      ws.send(JSON.stringify({ type: 'pong' }));
     }
   };
 
   ws.onclose = () => {
+    writer.flush();
+    probes.clear();
     term.write('\r\n\x1b[31m[Connection closed]\x1b[0m\r\n');
   };
 
@@ -321,13 +803,124 @@ function connectWebSocket(sessionId, term, fitAddon) {
     term.write('\r\n\x1b[31m[Connection error]\x1b[0m\r\n');
   };
 
+  // Input produced in the same task (paste, key repeat bursts) goes out as one message
+  let inputBuffer = '';
+  let inputSeq = null;
+
+  const flushInput = () => {
+    const data = inputBuffer;
+    inputBuffer = '';
+    if (!data || ws.readyState !== WebSocket.OPEN) return;
+    const msg = { type: 'input', data };
+    if (inputSeq !== null) msg.seq = inputSeq;
+    if (state.latencyProbe) {
+      msg.probe = ++probeSeq;
+      probes.set(msg.probe, performance.now());
+      if (probes.size > MAX_PENDING_PROBES) probes.delete(probes.keys().next().value);
+    }
+    ws.send(JSON.stringify(msg));
+  };
+
   term.onData((data) => {
+    if (ws.readyState !== WebSocket.OPEN) return;
+    if (echo) inputSeq = echo.input(data);
+    if (!inputBuffer) queueMicrotask(flushInput);
+    inputBuffer += data;
+  });
+
+  return ws;
+}
+
+// ============================================
+// Latency Probe
+// ============================================
+
+// Unanswered probes remembered per terminal (older ones are forgotten)
+const MAX_PENDING_PROBES = 32;
+
+function handleProbe(ws, term, probes, msg) {
+  const sentAt = probes.get(msg.id);
+  probes.delete(msg.id);
+  if (sentAt === undefined) return;
+
+  const arrivedAt = performance.now();
+  const serverMs = Object.values(msg.server || {}).reduce((a, b) => a + b, 0);
+
+  // The write callback fires once xterm.js has parsed everything queued before it
+  term.write('', () => {
+    const doneAt = performance.now();
+    const rtt = arrivedAt - sentAt;
+    const render = doneAt - arrivedAt;
+    recordLatencySample('rtt', rtt);
+    recordLatencySample('render', render);
+    recordLatencySample('total', doneAt - sentAt);
+
     if (ws.readyState === WebSocket.OPEN) {
-      ws.send(JSON.stringify({ type: 'input', data }));
+      ws.send(JSON.stringify({
+        type: 'probe_report',
+        server_ms: serverMs,
+        rtt_ms: rtt,
+        render_ms: render
+      }));
     }
   });
+}
 
-  return ws;
+function recordLatencySample(stage, ms) {
+  const samples = state.latencySamples[stage];
+  samples.push(ms);
+  if (samples.length > 500) samples.shift();
+}
+
+function percentile(values, q) {
+  if (values.length === 0) return null;
+  const sorted = [...values].sort((a, b) => a - b);
+  return sorted[Math.min(sorted.length - 1, Math.floor(q * sorted.length))];
+}
+
+function toggleLatencyProbe() {
+  state.latencyProbe = !state.latencyProbe;
+  localStorage.setItem('latencyProbe', state.latencyProbe ? '1' : '0');
+  updateLatencyOverlay();
+}
+
+async function updateLatencyOverlay() {
+  let overlay = $('latencyOverlay');
+  if (!state.latencyProbe) {
+    if (overlay) overlay.remove();
+    return;
+  }
+
+  if (!overlay) {
+    overlay = document.createElement('div');
+    overlay.id = 'latencyOverlay';
+    overlay.className = 'latency-overlay';
+    document.body.appendChild(overlay);
+  }
+
+  const fmt = (v) => (v === null || v === undefined ? '–' : v.toFixed(1));
+  const rows = [];
+
+  for (const stage of ['rtt', 'render', 'total']) {
+    const samples = state.latencySamples[stage];
+    rows.push(`<tr><td>client ${stage}</td><td>${fmt(percentile(samples, 0.5))}</td><td>${fmt(percentile(samples, 0.99))}</td></tr>`);
+  }
+
+  try {
+    const data = await api('/api/latency');
+    for (const [stage, s] of Object.entries(data.stages)) {
+      rows.push(`<tr><td>${stage}</td><td>${fmt(s.p50)}</td><td>${fmt(s.p99)}</td></tr>`);
+    }
+  } catch (err) {
+    rows.push('<tr><td colspan="3">server stats unavailable</td></tr>');
+  }
+
+  overlay.innerHTML = `
+    <table>
+      <thead><tr><th>stage (ms)</th><th>p50</th><th>p99</th></tr></thead>
+      <tbody>${rows.join('')}</tbody>
+    </table>
+  `;
 }
 
 function sendResize(ws, term) {
@@ -430,6 +1023,7 @@ function switchToTab(sessionId, shouldSaveState = true) {
   });
 
   updateSessionListUI();
+  updateTabVisibility();
 
   const tabData = state.tabs.get(sessionId);
   if (tabData) {
@@ -445,6 +1039,22 @@ function switchToTab(sessionId, shouldSaveState = true) {
   }
 }
 
+/**
+ * Tell the server which tabs are actually on screen. Hidden tabs get no
+ * output; the server catches them up in one go when they are shown again.
+ */
+function updateTabVisibility() {
+  const pageVisible = document.visibilityState === 'visible' && state.currentView === 'terminals';
+  state.tabs.forEach((tabData, sessionId) => {
+    const visible = pageVisible && sessionId === state.activeTabId;
+    if (tabData.visible === visible) return;
+    if (tabData.ws && tabData.ws.readyState === WebSocket.OPEN) {
+      tabData.ws.send(JSON.stringify({ type: 'visibility', visible }));
+      tabData.visible = visible;
+    }
+  });
+}
+
 async function closeTab(sessionId, killSession = false) {
   const tabData = state.tabs.get(sessionId);
   if (!tabData) return;
@@ -483,7 +1093,7 @@ async function closeTab(sessionId, killSession = false) {
   if (killSession) {
     try {
       await api(`/api/sessions/${sessionId}`, { method: 'DELETE' });
-      await refreshSessions();
+      if (!state.sessionEvents) await refreshSessions();
     } catch (err) {
       console.error('Failed to kill session:', err);
     }
@@ -512,12 +1122,58 @@ async function refreshSessions() {
   try {
     const data = await api('/api/sessions');
     state.sessions = data.sessions;
+    state.sessionsVersion = data.version || 0;
     renderSessionsList();
   } catch (err) {
     showError('Failed to load sessions: ' + err.message);
   }
 }
 
+// Follow session changes made here and on other devices (server-sent events)
+function watchSessions() {
+  if (!window.EventSource || state.sessionEvents) return;
+  const es = new EventSource(`/api/sessions/events?since=${state.sessionsVersion}`);
+  es.addEventListener('session', (e) => applySessionEvent(JSON.parse(e.data)));
+  es.addEventListener('activity', (e) => applySessionActivity(JSON.parse(e.data)));
+  es.addEventListener('resync', () => refreshSessions());
+  state.sessionEvents = es;
+}
+
+function applySessionEvent(ev) {
+  // Already contained in the snapshot from /api/sessions
+  if (ev.version <= state.sessionsVersion) return;
+  state.sessionsVersion = ev.version;
+
+  const i = state.sessions.findIndex(s => s.id === ev.id);
+  if (ev.type === 'created') {
+    if (i >= 0) state.sessions[i] = ev.session;
+    else state.sessions.unshift(ev.session);
+  } else if (ev.type === 'exited' || ev.type === 'killed') {
+    if (i >= 0) state.sessions.splice(i, 1);
+    const tab = state.tabs.get(ev.id);
+    if (tab && ev.type === 'exited') {
+      const code = ev.exit_code === null ? '' : ` with code ${ev.exit_code}`;
+      tab.ws.writer.note(`\r\n\x1b[2m[process exited${code}]\x1b[0m\r\n`);
+    }
+  } else {
+    // resized: only the data changes, the list looks the same
+    if (i >= 0) {
+      const { version, type, id, at, ...fields } = ev;
+      Object.assign(state.sessions[i], fields);
+    }
+    return;
+  }
+  renderSessionsList();
+}
+
+// Latest activity of a session; not versioned, so it never moves sessionsVersion
+function applySessionActivity(ev) {
+  const session = state.sessions.find(s => s.id === ev.id);
+  if (!session) return;
+  const { id, ...fields } = ev;
+  Object.assign(session, fields);
+}
+
 function renderSessionsList() {
   const container = $('sessionsList');
   container.innerHTML = '';
@@ -538,21 +1194,28 @@ function renderSessionsList() {
 
     const pidDisplay = session.pid ? `PID: ${session.pid}` : 'PID: N/A';
     const shortId = session.id.substring(0, 8) + '...';
+    const usage = session.usage;
+    const usageDisplay = usage
+      ? `${usage.foreground || 'idle'} • CPU ${usage.cpu_percent ?? 0}% • ${(usage.rss_bytes / 1048576).toFixed(0)} MB`
+      : '';
 
     card.innerHTML = `
       <div class="session-info">
         <div class="session-id">${shortId}</div>
         <div class="session-details">${session.shell || 'shell'}</div>
         <div class="session-details">${session.cwd || '~'}</div>
-        <div class="session-details">${session.status} • ${pidDisplay}</div>
+        <div class="session-details">${session.status} • ${pidDisplay}${session.spectators ? ` • ${session.spectators} watching` : ''}</div>
+        ${usageDisplay ? `<div class="session-details">${usageDisplay}</div>` : ''}
       </div>
       <div class="session-actions">
         <button class="btn btn-sm btn-primary">Open</button>
+        <button class="btn btn-sm btn-ghost">Share</button>
         <button class="btn btn-sm btn-danger">Kill</button>
       </div>
     `;
 
     card.querySelector('.btn-primary').onclick = () => openTerminalTab(session.id);
+    card.querySelector('.btn-ghost').onclick = () => shareSession(session.id);
     card.querySelector('.btn-danger').onclick = async () => {
       if (confirm(`Kill terminal ${shortId}?`)) {
         await killSession(session.id);
@@ -583,7 +1246,7 @@ async function createSession(cwd = null, shell = null, autoCommand = null) {
       })
     });
 
-    await refreshSessions();
+    if (!state.sessionEvents) await refreshSessions();
     await openTerminalTab(created.id, autoCommand);
   } catch (err) {
     showError('Failed to create session: ' + err.message);
@@ -594,6 +1257,22 @@ async function killSession(sessionId) {
   await closeTab(sessionId, true);
 }
 
+async function shareSession(sessionId) {
+  // Read-only link: spectators see output but cannot type; DELETE the share to revoke all links
+  try {
+    const share = await api(`/api/sessions/${sessionId}/share`, { method: 'POST', body: '{}' });
+    const url = location.origin + share.url;
+    try {
+      await navigator.clipboard.writeText(url);
+      showSuccess('Read-only link copied to clipboard');
+    } catch (err) {
+      prompt('Read-only link:', url);
+    }
+  } catch (err) {
+    showError('Failed to share session: ' + err.message);
+  }
+}
+
 // ============================================
 // Projects Browser
 // ============================================
@@ -776,6 +1455,8 @@ function switchView(viewName) {
   if (viewName === 'projects' && state.projectsPath && state.projects.length === 0) {
     loadProjects();
   }
+
+  updateTabVisibility();
 }
 
 // ============================================
@@ -1372,6 +2053,12 @@ document.addEventListener('keydown', (e) => {
     }
   }
 
+  // Latency probe overlay: Ctrl+Shift+L
+  if (e.ctrlKey && e.shiftKey && (e.key === 'L' || e.key === 'l')) {
+    e.preventDefault();
+    toggleLatencyProbe();
+  }
+
   // Next/Previous tab: Ctrl+Tab / Ctrl+Shift+Tab
   if (e.ctrlKey && e.key === 'Tab') {
     e.preventDefault();
@@ -1583,6 +2270,7 @@ async function init() {
 
   await loadSettings();
   await refreshSessions();
+  watchSessions();
 
   // Restore previously open tabs
   await restoreOpenTabs();
@@ -1600,6 +2288,15 @@ async function init() {
   // Render quick actions in sidebar
   renderSidebarQuickActions();
 
+  // Background tabs / hidden page: pause output streaming
+  document.addEventListener('visibilitychange', updateTabVisibility);
+
+  // Latency probe overlay (if enabled earlier)
+  updateLatencyOverlay();
+  setInterval(() => {
+    if (state.latencyProbe) updateLatencyOverlay();
+  }, 2000);
+
   console.log('DevBridge initialized successfully');
 }
 
@@ -0,0 +1,70 @@
+/**
+ * DevBridge WebSocket decompression (?compress=deflate)
+ * Shared by app.js and term-worker.js. The server sends a
+ * {"type": "compression"} text frame first; after that, binary frames hold
+ * raw-deflate batches of JSON messages, one per line, closed by an empty
+ * line. Text frames are plain JSON. Messages are delivered in arrival order.
+ */
+
+const INFLATE_SUPPORTED = (() => {
+  if (typeof DecompressionStream === 'undefined') return false;
+  try {
+    new DecompressionStream('deflate-raw');
+    return true;
+  } catch (e) {
+    return false;
+  }
+})();
+
+class Inflater {
+  constructor(onMessage) {
+    this.onMessage = onMessage;
+    this.chain = Promise.resolve();
+    this.contextTakeover = true;
+    this.stream = null;
+    this.decoder = new TextDecoder();
+  }
+
+  // Socket message handler; text and binary frames share one queue
+  push(ev) {
+    this.chain = this.chain
+      .then(() => this._handle(ev.data))
+      .catch((err) => console.error('WebSocket decompression failed:', err));
+  }
+
+  async _handle(data) {
+    if (typeof data === 'string') {
+      const msg = JSON.parse(data);
+      if (msg.type === 'compression') {
+        this.contextTakeover = msg.context_takeover;
+        return;
+      }
+      this.onMessage(msg);
+      return;
+    }
+    const text = await this._inflate(new Uint8Array(data));
+    for (const line of text.split('\n')) {
+      if (line) this.onMessage(JSON.parse(line));
+    }
+  }
+
+  async _inflate(bytes) {
+    if (!this.contextTakeover) {
+      const ds = new DecompressionStream('deflate-raw');
+      return new Response(new Blob([bytes]).stream().pipeThrough(ds)).text();
+    }
+    // One stream for the whole connection: the server sync-flushes each frame
+    if (!this.stream) {
+      const ds = new DecompressionStream('deflate-raw');
+      this.stream = { writer: ds.writable.getWriter(), reader: ds.readable.getReader() };
+    }
+    this.stream.writer.write(bytes);
+    let text = '';
+    while (!text.endsWith('\n\n')) {
+      const { value, done } = await this.stream.reader.read();
+      if (done) break;
+      text += this.decoder.decode(value, { stream: true });
+    }
+    return text;
+  }
+}
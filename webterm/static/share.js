@@ -0,0 +1,79 @@
+/**
+ * DevBridge - read-only spectator view (/share/<token>)
+ * Output only: keystrokes are never sent, the server ignores anything but pongs
+ */
+
+(() => {
+  const token = location.pathname.split('/').pop();
+  const status = document.getElementById('shareStatus');
+
+  const term = new Terminal({
+    disableStdin: true,
+    cursorBlink: false,
+    fontSize: window.innerWidth <= 768 ? 10 : 14,
+    fontFamily: "'JetBrains Mono', 'Consolas', monospace",
+    theme: { background: '#000000', foreground: '#FAFAF9', cursor: '#FF9B4E' }
+  });
+  const fitAddon = new FitAddon.FitAddon();
+  term.loadAddon(fitAddon);
+  term.open(document.getElementById('terminal'));
+
+  // Session size wins over the window: output is laid out for the owner's terminal
+  let size = null;
+  const fit = () => {
+    if (size) term.resize(size.cols, size.rows);
+    else fitAddon.fit();
+  };
+  window.addEventListener('resize', fit);
+  fit();
+
+  const setStatus = (text, cls = '') => {
+    status.textContent = text;
+    status.className = cls;
+  };
+
+  let ended = false;
+
+  function connect() {
+    const proto = location.protocol === 'https:' ? 'wss' : 'ws';
+    const ws = new WebSocket(`${proto}://${location.host}/ws/share/${token}`);
+
+    ws.onopen = () => setStatus('● live', 'live');
+
+    ws.onmessage = (ev) => {
+      const msg = JSON.parse(ev.data);
+      if (msg.type === 'output') {
+        term.write(msg.data);
+      } else if (msg.type === 'replay') {
+        size = { cols: msg.cols, rows: msg.rows };
+        fit();
+        term.reset();
+        term.write(msg.data);
+      } else if (msg.type === 'resize') {
+        size = { cols: msg.cols, rows: msg.rows };
+        fit();
+      } else if (msg.type === 'ping') {
+        ws.send(JSON.stringify({ type: 'pong' }));
+      } else if (msg.type === 'end') {
+        ended = true;
+        setStatus(msg.status === 'revoked' ? 'sharing stopped' : 'session ended', 'ended');
+      }
+    };
+
+    ws.onclose = (ev) => {
+      if (ended) return;
+      if (ev.code === 4401) {
+        setStatus('link expired or revoked', 'ended');
+      } else if (ev.code === 4429) {
+        setStatus('too many viewers - retrying…');
+        setTimeout(connect, 10000);
+      } else {
+        // Network dropped - a new connection starts from a fresh replay
+        setStatus('reconnecting…');
+        setTimeout(connect, 2000);
+      }
+    };
+  }
+
+  connect();
+})();
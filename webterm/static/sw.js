@@ -3,16 +3,10 @@
  * Provides offline capability and caching for PWA
  */
 
-const CACHE_NAME = 'devbridge-v1';
-const STATIC_ASSETS = [
-  '/',
-  '/static/styles.css',
-  '/static/app.js',
-  '/static/xterm.js',
-  '/static/xterm.css',
-  '/static/xterm-addon-fit.js',
-  '/static/manifest.json'
-];
+// Both generated at startup by webterm/assets.py from the asset digests:
+// a deploy changes the cache name and the list of fingerprinted URLs
+const CACHE_NAME = 'devbridge-dev';
+const STATIC_ASSETS = ['/'];
 
 // Install event - cache static assets
 self.addEventListener('install', (event) => {
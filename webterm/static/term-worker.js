@@ -0,0 +1,75 @@
+/**
+ * DevBridge terminal socket worker
+ * Owns one terminal WebSocket off the main thread: decompresses and parses
+ * frames and coalesces output frames, so the page only receives a few batched
+ * messages per frame instead of one per PTY read.
+ */
+
+importScripts('/static/inflate.js');
+
+const BATCH_MS = 16;
+
+let ws = null;
+let pending = [];
+let pendingChars = 0;
+let pendingOffset = 0;
+let timer = null;
+
+function flushOutput() {
+  clearTimeout(timer);
+  timer = null;
+  if (pending.length === 0) return;
+  self.postMessage({
+    event: 'message',
+    msg: { type: 'output', data: pending.join(''), chars: pendingChars, offset: pendingOffset }
+  });
+  pending = [];
+  pendingChars = 0;
+}
+
+function open(url) {
+  ws = new WebSocket(url);
+  ws.binaryType = 'arraybuffer';
+
+  ws.onopen = () => self.postMessage({ event: 'open' });
+
+  const inflater = new Inflater(onMessage);
+  ws.onmessage = (ev) => inflater.push(ev);
+
+  // Close only after frames still being decompressed were delivered
+  ws.onclose = () => inflater.chain.then(() => {
+    flushOutput();
+    self.postMessage({ event: 'close' });
+  });
+
+  ws.onerror = () => self.postMessage({ event: 'error' });
+}
+
+function onMessage(msg) {
+  if (msg.type === 'output') {
+    pending.push(msg.data);
+    pendingChars += msg.data.length;
+    pendingOffset = msg.offset;
+    if (!timer) timer = setTimeout(flushOutput, BATCH_MS);
+    return;
+  }
+  // Heartbeat: answer here, no reason to cut the output batch
+  if (msg.type === 'ping') {
+    if (ws && ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify({ type: 'pong' }));
+    return;
+  }
+  // Everything else keeps its place in the stream
+  flushOutput();
+  self.postMessage({ event: 'message', msg });
+}
+
+self.onmessage = (ev) => {
+  const { cmd } = ev.data;
+  if (cmd === 'open') {
+    open(ev.data.url);
+  } else if (cmd === 'send') {
+    if (ws && ws.readyState === WebSocket.OPEN) ws.send(ev.data.data);
+  } else if (cmd === 'close') {
+    if (ws) ws.close();
+  }
+};
@@ -1,14 +1,30 @@
 from __future__ import annotations
 
 import asyncio
+import codecs
+import json
 import os
 import time
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Any
 
+from . import metrics
 from .db import DB
+from .events import EventLog
+from .heartbeat import Heartbeat, Peer
+from .isolation import CgroupManager, SessionLimits
+from .latency import LatencyTracker, Probe
+from .procstat import ProcSampler, ProcUsage
+from .ratelimit import OutputLimiter
+from .recording import Recorder, RecordingWriter
+from .scheduler import Scheduler
+from .scrollback import Scrollback
+from .search import ScrollbackIndexer, fts_query
 from .security import get_effective_settings
+from .share import ShareLog, Spectator
+from .spill import SpillStore
 
 IS_WINDOWS = os.name == "nt"
 if IS_WINDOWS:
@@ -16,6 +32,44 @@ if IS_WINDOWS:
 else:
     from .pty_unix import UnixPty, spawn_unix
 
+READ_SIZE = 4096
+# Jak często (s) sprawdzać globalny budżet pamięci
+BUDGET_CHECK_EVERY = 2.0
+# Ile zaległego wyjścia dosłać ukrytej karcie po powrocie (więcej = reset + ogon)
+CATCHUP_MAX_CHARS = 64 * 1024
+# Bajty generujące sygnał w trybie ISIG; kończą zbiorczy zapis wejścia
+_SIGNAL_CHARS = (b"\x03", b"\x1a", b"\x1c")
+# Sesja w trybie streszczania (zalew wyjścia): rzadsze, większe odczyty
+FLOOD_READ_SIZE = 256 * 1024
+FLOOD_POLL = 0.1
+# Z ilu ostatnich znaków budować migawkę ekranu
+SNAPSHOT_CHARS = 16 * 1024
+# Co ile sekund (najwyżej) publikować zdarzenie "activity" sesji
+ACTIVITY_EVENT_EVERY = 5.0
+# Po odczycie PTY następny najwcześniej po tym czasie (wyjście łączone w ramki)
+OUTPUT_BATCH = 0.02
+# Zapis zmienionych sesji do bazy najwyżej co tyle sekund
+PERSIST_EVERY = 0.5
+# Retencja historii: przebieg co tyle sekund, tyle sesji na transakcję
+HISTORY_COMPACT_EVERY = 300.0
+HISTORY_PRUNE_BATCH = 50
+# Stron (zwykle 4 KiB) oddawanych systemowi w jednym przebiegu
+VACUUM_PAGES = 2048
+
+
+def _drain(pty: Any, limit: int) -> bytes:
+    """Read until the PTY is empty or ``limit`` bytes are collected (one executor call)."""
+    parts, n = [], 0
+    while n < limit:
+        out = pty.read(READ_SIZE)
+        if not out:
+            break
+        parts.append(out)
+        n += len(out)
+        if IS_WINDOWS:
+            break  # odczyt winpty blokuje, gdy nie ma danych
+    return b"".join(parts)
+
 
 @dataclass
 class Session:
@@ -27,9 +81,85 @@ class Session:
     created_at: float
     last_activity_at: float
     status: str  # running/exited/killed/stale
-    scrollback: str
+    scrollback: Scrollback
     pty: Any | None
     output_task: asyncio.Task | None
+    output_offset: int = 0  # łączna liczba znaków wyjścia od startu sesji
+    recorder: Recorder | None = None
+    pending_probe: Probe | None = None  # ostatni oznaczony klawisz czekający na wyjście
+    # Wejście czekające na zbiorczy zapis do PTY: (dane, probe, ack)
+    inbox: list[tuple[bytes, Probe | None, InputAck | None]] = field(default_factory=list)
+    input_scheduled: bool = False
+    # Sekwencje UTF-8 rozcięte między odczytami czekają tu na resztę bajtów
+    decoder: codecs.IncrementalDecoder = field(
+        default_factory=lambda: codecs.getincrementaldecoder("utf-8")(errors="replace"),
+    )
+    owner: str | None = None  # użytkownik, który utworzył sesję
+    limit_key: str | None = None  # kubełek limitu "na użytkownika" (OutputLimiter.owner_key)
+    # Tryb streszczania: klienci dostają tylko migawki ekranu
+    flooding: bool = False
+    flood_since: int = 0  # offset ostatniej wysłanej migawki
+    flood_snapshot_at: float = 0.0
+    activity_published_at: float = 0.0
+    idle_ttl: int = 0
+    usage: ProcUsage | None = None
+    # Udostępnianie tylko do odczytu: log tworzony przy pierwszym widzu
+    share: ShareLog | None = None
+    share_epoch: int = 0  # zwiększenie unieważnia wszystkie wydane tokeny
+
+
+@dataclass
+class Output:
+    """Output chunk ending at stream ``offset``, shared by all subscriber queues.
+
+    ``frame()`` builds the ``/ws/terminal`` JSON message on first use, so a
+    session watched from several tabs encodes each chunk once, not per tab.
+    """
+
+    offset: int
+    data: str
+    _frame: str | None = field(default=None, repr=False)
+
+    def frame(self) -> str:
+        if self._frame is None:
+            self._frame = json.dumps(
+                {"type": "output", "data": self.data, "offset": self.offset},
+                ensure_ascii=False,
+            )
+        return self._frame
+
+
+@dataclass
+class Resize:
+    """Size change of a shared session, logged so spectators can follow it."""
+
+    offset: int
+    cols: int
+    rows: int
+
+    def frame(self) -> str:
+        return json.dumps({"type": "resize", "cols": self.cols, "rows": self.rows})
+
+
+@dataclass
+class Ping:
+    """Keepalive queued to every subscriber by the scheduler."""
+
+    at: float
+
+
+@dataclass
+class InputAck:
+    """Output offset at which a tagged input reached the PTY.
+
+    Subscriber queues carry ``Output`` items; the client's
+    local echo only compares output past ``offset`` with its predictions.
+    Queued to ``queue`` once the input has actually been written.
+    """
+
+    seq: int
+    queue: asyncio.Queue
+    offset: int = 0
 
 
 class TerminalManager:
@@ -37,12 +167,151 @@ class TerminalManager:
         self.db = db
         self.sessions: dict[str, Session] = {}
         self.subscribers: dict[str, set[asyncio.Queue[str]]] = {}
+        # Kolejki ukrytych kart -> offset wyjścia w chwili ukrycia
+        self.hidden: dict[asyncio.Queue, int] = {}
+        # Przepełnione kolejki -> offset, do którego klient ma wyjście (wznawia je resume)
+        self.stalled: dict[asyncio.Queue, int] = {}
+        self.indexer = ScrollbackIndexer(db)
+        # Tworzony przy pierwszym przekroczeniu budżetu - dopiero wtedy czyści katalog spill
+        self._spill: SpillStore | None = None
+        self.recordings = RecordingWriter(Path(db.path).parent / "recordings")
+        self.latency = LatencyTracker()
+        self.events = EventLog()
+        self.scheduler = Scheduler()
+        self._dirty: set[str] = set()
+        self.heartbeat = Heartbeat()
+        self.retention = (0.0, 0, 0)  # max wiek [s], max liczba, max bajtów
+        self.history_pruned = 0
+        self._compacting = False
+        self.procs = ProcSampler()
+        self._sampling = False
+        self.cgroups = CgroupManager()
+        self.limiter = OutputLimiter()
+        self.share_skips = 0
+        self.snapshot_interval = 1.0
+        self.evicted_bytes_total = 0
+        self._budget_checked_at = 0.0
         self._lock = asyncio.Lock()
 
-    def _truncate_scrollback(self, s: str, limit: int) -> str:
-        if len(s) <= limit:
-            return s
-        return s[-limit:]
+        metrics.SESSIONS_ACTIVE.set_function(
+            lambda: sum(1 for s in self.sessions.values() if s.status == "running"),
+        )
+        metrics.SUBSCRIBER_QUEUE_DEPTH.set_function(
+            lambda: {(sid,): max(q.qsize() for q in subs) for sid, subs in self.subscribers.items() if subs},
+        )
+        metrics.SHARE_SPECTATORS.set_function(
+            lambda: sum(len(s.share.spectators) for s in self.sessions.values() if s.share),
+        )
+        metrics.MEMORY_BYTES.set_function(
+            lambda: {
+                (k.removesuffix("_bytes"),): v
+                for k, v in self.memory_stats().items()
+                if k.endswith("_bytes")
+            },
+        )
+
+    def configure_flood_control(self, cfg: dict) -> None:
+        self.limiter.configure(cfg)
+        self.snapshot_interval = max(0.1, int(cfg.get("output_snapshot_interval_ms", 1000)) / 1000)
+
+    def configure_retention(self, cfg: dict) -> None:
+        self.retention = (
+            float(cfg.get("history_max_age_days", 0)) * 86400,
+            int(cfg.get("history_max_sessions", 0)),
+            int(cfg.get("history_max_bytes", 0)),
+        )
+        # Nowe limity obowiązują od razu, nie po pełnym okresie
+        self.scheduler.every(HISTORY_COMPACT_EVERY, "compact", self.compact_history, first=1.0)
+
+    async def compact_history(self) -> int:
+        """Prune finished sessions outside the retention policy, then vacuum a little.
+
+        Every batch is its own short transaction in the executor, so neither
+        the event loop nor other DB users wait for a large delete.
+        """
+        if self._compacting:
+            return 0
+        self._compacting = True
+        loop = asyncio.get_running_loop()
+        pruned = 0
+        try:
+            while True:
+                ids = await loop.run_in_executor(None, self.db.prune_sessions, *self.retention, HISTORY_PRUNE_BATCH)
+                for sid in ids:
+                    sess = self.sessions.get(sid)
+                    if sess and sess.status != "running":
+                        del self.sessions[sid]
+                        sess.scrollback.release()
+                pruned += len(ids)
+                if len(ids) < HISTORY_PRUNE_BATCH:
+                    break
+            # Nagrania sesji usuniętych z historii (także sprzed tej poprawki)
+            keep = await loop.run_in_executor(None, self.db.session_ids)
+            await loop.run_in_executor(None, self.recordings.sweep, keep)
+            free = await loop.run_in_executor(None, self.db.incremental_vacuum, VACUUM_PAGES)
+            metrics.DB_FREE_PAGES.set(free)
+        finally:
+            self._compacting = False
+        if pruned:
+            self.history_pruned += pruned
+            metrics.HISTORY_PRUNED_SESSIONS.inc(pruned)
+            print(f"Pruned {pruned} sessions from history")
+        return pruned
+
+    def history_stats(self) -> dict:
+        return {
+            **self.db.session_history_stats(),
+            **self.db.file_stats(),
+            "pruned_sessions": self.history_pruned,
+        }
+
+    def configure_isolation(self, cfg: dict) -> None:
+        if IS_WINDOWS or not bool(cfg.get("session_cgroup_enabled", False)) or self.cgroups.enabled:
+            return
+        if not self.cgroups.setup():
+            print(f"Session cgroups disabled: {self.cgroups.error}")
+
+    def _session_limits(self, sid: str, cfg: dict) -> SessionLimits:
+        limits = SessionLimits.from_settings(cfg)
+        if self.cgroups.enabled and bool(cfg.get("session_cgroup_enabled", False)):
+            limits.cgroup = self.cgroups.create(
+                sid,
+                cpu_weight=int(cfg.get("session_cgroup_cpu_weight", 100)),
+                memory_max=int(cfg.get("session_cgroup_memory_max_mb", 0)) * 1024 * 1024,
+                pids_max=int(cfg.get("session_cgroup_pids_max", 0)),
+            )
+        return limits
+
+    def _release_cgroup(self, sid: str, attempts: int = 10) -> None:
+        # Po SIGTERM i cgroup.kill procesy znikają z opóźnieniem - ponawiaj
+        if not self.cgroups.remove(sid) and attempts > 1:
+            self.scheduler.call_later(1.0, ("cgroup", sid), lambda: self._release_cgroup(sid, attempts - 1))
+
+    def configure_process_stats(self, cfg: dict) -> None:
+        interval = float(cfg.get("process_stats_interval_seconds", 5))
+        if interval > 0 and self.procs.available and not IS_WINDOWS:
+            self.scheduler.every(interval, "procstat", self._sample_processes, first=0.0)
+        else:
+            self.scheduler.cancel("procstat")
+
+    async def _sample_processes(self) -> None:
+        if self._sampling:
+            return
+        roots = {s.id: s.pty.pid for s in self.sessions.values() if s.status == "running" and s.pty}
+        self._sampling = True
+        try:
+            usage = await asyncio.get_running_loop().run_in_executor(None, self.procs.sweep, roots)
+        finally:
+            self._sampling = False
+        for sid, u in usage.items():
+            sess = self.sessions.get(sid)
+            if not sess or sess.status != "running":
+                continue
+            sess.usage = u
+            metrics.SESSION_CPU_PERCENT.labels(sid).set(u.cpu_percent or 0.0)
+            metrics.SESSION_RSS_BYTES.labels(sid).set(u.rss_bytes)
+            metrics.SESSION_PROCESSES.labels(sid).set(u.processes)
+        metrics.PROC_SWEEP_SECONDS.observe(self.procs.last_sweep_seconds)
 
     def _default_shell(self, cfg: dict) -> str:
         if IS_WINDOWS:
@@ -52,24 +321,20 @@ class TerminalManager:
     async def mark_db_sessions_stale_on_start(self) -> None:
         # Po restarcie nie wznawiamy procesów, więc to co było "running"
         # oznaczamy jako "stale" (historyczne).
-        rows = self.db.list_sessions()
-        for r in rows:
-            if r["status"] == "running":
-                self.db.upsert_session(
-                    session_id=r["id"],
-                    cwd=r["cwd"],
-                    shell=r["shell"],
-                    pid=r["pid"],
-                    status="stale",
-                    created_at=float(r["created_at"]),
-                    last_activity_at=float(r["last_activity_at"]),
-                    cols=int(r["cols"]),
-                    rows=int(r["rows"]),
-                    scrollback=r["scrollback"] or "",
-                )
+        self.db.mark_running_sessions_stale()
+
+    def _scrollback_from_row(self, r: Any, limit: int) -> Scrollback:
+        if r["scrollback_z"]:
+            try:
+                return Scrollback.from_bytes(r["scrollback_z"], limit, self.db.get_scrollback_blocks(r["id"]))
+            except Exception as e:
+                print(f"Corrupted scrollback for session {r['id']}: {e}")
+        return Scrollback.from_text(r["scrollback"] or "", limit)
 
     async def load_sessions_from_db(self) -> None:
         rows = self.db.list_sessions()
+        indexed = self.db.indexed_session_ids() if self.db.fts_enabled else set()
+        scrollback_limit = int(get_effective_settings(self.db).get("scrollback_limit_chars", 200_000))
         async with self._lock:
             for r in rows:
                 sid = r["id"]
@@ -84,42 +349,62 @@ class TerminalManager:
                     created_at=float(r["created_at"]),
                     last_activity_at=float(r["last_activity_at"]),
                     status=r["status"],
-                    scrollback=r["scrollback"] or "",
+                    scrollback=self._scrollback_from_row(r, scrollback_limit),
                     pty=None,
                     output_task=None,
+                    output_offset=int(r["output_offset"]),
                 )
+                # Historia sprzed indeksu: zaindeksuj jednorazowo
+                sess = self.sessions[sid]
+                if sid not in indexed and sess.scrollback:
+                    start = max(0, sess.output_offset - len(sess.scrollback))
+                    self.indexer.feed(sid, start, sess.scrollback.text())
+                    self.indexer.flush(sid, force=True)
+        self.enforce_memory_budget(force=True)
 
-    async def list_sessions(self) -> list[dict]:
-        async with self._lock:
-            items = []
-            for s in sorted(self.sessions.values(), key=lambda x: x.created_at, reverse=True):
-                # Only return active (running) sessions
-                if s.status not in ["running"]:
-                    continue
-
-                # Get PID properly
-                pid = None
-                if s.pty:
-                    try:
-                        pid = s.pty.pid
-                    except Exception:
-                        pass
+    def _summary(self, s: Session) -> dict:
+        # Get PID properly
+        pid = None
+        if s.pty:
+            try:
+                pid = s.pty.pid
+            except Exception:
+                pass
+        return {
+            "id": s.id,
+            "cwd": s.cwd,
+            "shell": s.shell,
+            "pid": pid,
+            "status": s.status,
+            "created_at": s.created_at,
+            "last_activity_at": s.last_activity_at,
+            "cols": s.cols,
+            "rows": s.rows,
+            "recording": s.recorder is not None,
+            "flooding": s.flooding,
+            "usage": s.usage.to_dict() if s.usage else None,
+            "spectators": len(s.share.spectators) if s.share else 0,
+        }
 
-                items.append(
-                    {
-                        "id": s.id,
-                        "cwd": s.cwd,
-                        "shell": s.shell,
-                        "pid": pid,
-                        "status": s.status,
-                        "created_at": s.created_at,
-                        "last_activity_at": s.last_activity_at,
-                    }
-                )
-            return items
+    async def list_sessions(self) -> list[dict]:
+        # Bez blokady: nic tu nie czeka, więc lista i events.version są spójne
+        running = [s for s in self.sessions.values() if s.status == "running"]
+        running.sort(key=lambda x: x.created_at, reverse=True)
+        return [self._summary(s) for s in running]
 
-    async def create_session(self, cwd: str | None, shell: str | None, cols: int, rows: int) -> dict:
+    async def create_session(
+        self,
+        cwd: str | None,
+        shell: str | None,
+        cols: int,
+        rows: int,
+        record: bool | None = None,
+        owner: str | None = None,
+        client: str | None = None,
+    ) -> dict:
         cfg = get_effective_settings(self.db)
+        if record is None:
+            record = bool(cfg.get("recording_enabled", False))
 
         max_sessions = int(cfg.get("max_sessions", 50))
         idle_ttl = int(cfg.get("idle_ttl_seconds", 0))
@@ -147,7 +432,8 @@ class TerminalManager:
                 pty_obj = spawn_windows(shell=shell, cwd=cwd, cols=cols, rows=rows)
                 pid = pty_obj.pid
             else:
-                pty_obj = spawn_unix(shell=shell, cwd=cwd, cols=cols, rows=rows)
+                limits = self._session_limits(sid, cfg)
+                pty_obj = spawn_unix(shell=shell, cwd=cwd, cols=cols, rows=rows, limits=limits)
                 pid = pty_obj.pid
 
             sess = Session(
@@ -159,40 +445,48 @@ class TerminalManager:
                 created_at=now,
                 last_activity_at=now,
                 status="running",
-                scrollback="",
+                scrollback=Scrollback(scrollback_limit),
                 pty=pty_obj,
                 output_task=None,
+                owner=owner,
+                limit_key=OutputLimiter.owner_key(owner, client),
             )
 
             self.sessions[sid] = sess
             self.subscribers.setdefault(sid, set())
+            metrics.SESSIONS_CREATED.inc()
 
-            self.db.upsert_session(
-                session_id=sid,
-                cwd=cwd,
-                shell=shell,
-                pid=pid,
-                status=sess.status,
-                created_at=now,
-                last_activity_at=now,
-                cols=cols,
-                rows=rows,
-                scrollback=sess.scrollback,
-            )
+            if record:
+                sess.recorder = self.recordings.start(
+                    sid,
+                    cols=cols,
+                    rows=rows,
+                    shell=shell,
+                    record_input=bool(cfg.get("recording_input", False)),
+                    rotate_bytes=int(cfg.get("recording_rotate_bytes", 8 * 1024 * 1024)),
+                )
 
-            sess.output_task = asyncio.create_task(
-                self._pump_output(sess, scrollback_limit, idle_ttl),
-            )
+            self._save_session(sess, pid)
+
+            self._start_output(sess, idle_ttl)
+            self.events.publish("created", sid, session=self._summary(sess))
             return {"id": sid}
 
-    async def kill_session(self, sid: str) -> None:
+    async def kill_session(self, sid: str, status: str = "killed", exit_code: int | None = None) -> None:
+        """Stop a session; ``status="exited"`` when the shell ended by itself."""
         async with self._lock:
             sess = self.sessions.get(sid)
             if not sess:
                 return
+            was_running = sess.status == "running"
 
-            # Cancel output task first
-            if sess.output_task:
+            # Stop output first (unless the pump itself reports the exit)
+            for key in (("idle", sid), ("flood", sid)):
+                self.scheduler.cancel(key)
+            self._dirty.discard(sid)
+            if sess.pty and not IS_WINDOWS:
+                asyncio.get_running_loop().remove_reader(sess.pty.master_fd)
+            if sess.output_task and sess.output_task is not asyncio.current_task():
                 sess.output_task.cancel()
                 try:
                     await sess.output_task
@@ -207,61 +501,247 @@ class TerminalManager:
                     sess.pty.terminate()
                 except Exception as e:
                     print(f"Error terminating PTY {sid}: {e}")
+            if self.cgroups.enabled:
+                # Chwila na łagodne zakończenie, potem cgroup.kill dla reszty drzewa
+                self.scheduler.call_later(1.0, ("cgroup", sid), lambda: self._release_cgroup(sid))
 
-            sess.status = "killed"
+            sess.status = status
             sess.last_activity_at = time.time()
             sess.pty = None
+            if sess.share:
+                sess.share.close(status)
+                sess.share = None
+            self.indexer.flush(sid, force=True)
+            self.indexer.prune(sid, sess.output_offset - len(sess.scrollback), force=True)
+            self.indexer.drop(sid)
+            if sess.recorder:
+                await self.recordings.stop(sid)
 
             # Update database
-            self.db.upsert_session(
-                session_id=sess.id,
-                cwd=sess.cwd,
-                shell=sess.shell,
-                pid=None,
-                status=sess.status,
-                created_at=sess.created_at,
-                last_activity_at=sess.last_activity_at,
-                cols=sess.cols,
-                rows=sess.rows,
-                scrollback=sess.scrollback,
-            )
+            self._save_session(sess, None)
+            if was_running:
+                self.events.publish(status, sid, **({"exit_code": exit_code} if status == "exited" else {}))
 
             # Remove from active sessions after a delay
             # This allows cleanup to complete
             await asyncio.sleep(0.1)
             if sid in self.sessions:
                 del self.sessions[sid]
+                sess.scrollback.release()
+            self.limiter.forget(sid)
+            for m in (
+                metrics.SESSION_OUTPUT_CHARS,
+                metrics.SESSION_INPUT_BYTES,
+                metrics.DROPPED_CHUNKS,
+                metrics.OUTPUT_SUMMARIZED_CHARS,
+                metrics.SESSION_CPU_PERCENT,
+                metrics.SESSION_RSS_BYTES,
+                metrics.SESSION_PROCESSES,
+            ):
+                m.remove(sid)
 
-    async def write(self, sid: str, data: bytes) -> None:
-        async with self._lock:
-            sess = self.sessions.get(sid)
-            if not sess or sess.status != "running" or not sess.pty:
-                return
-            try:
-                sess.pty.write(data)
-                sess.last_activity_at = time.time()
-            except Exception as e:
-                print(f"Error writing to PTY {sid}: {e}")
-                # Mark session as exited if write fails
-                sess.status = "exited"
+    async def write(
+        self,
+        sid: str,
+        data: bytes,
+        probe: Probe | None = None,
+        ack: InputAck | None = None,
+    ) -> None:
+        """Queue input for the PTY.
+
+        Everything queued before the event loop gets around to the scheduled
+        flush (a paste, key repeat, several WebSocket frames read at once) is
+        written with one ``pty.write``. Runs on the loop thread only, so no
+        lock is needed.
+        """
+        sess = self.sessions.get(sid)
+        if not sess or sess.status != "running" or not sess.pty:
+            return
+        sess.inbox.append((data, probe, ack))
+        if not sess.input_scheduled:
+            sess.input_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush_input, sess)
+
+    def _flush_input(self, sess: Session) -> None:
+        sess.input_scheduled = False
+        items, sess.inbox = sess.inbox, []
+        if not items or sess.status != "running" or not sess.pty:
+            return
+        # Znak sygnału (^C, ^Z, ^\) czyści bufor wejścia TTY - to, co po nim, idzie osobnym zapisem
+        for i, (d, _, _) in enumerate(items[:-1]):
+            if any(c in d for c in _SIGNAL_CHARS):
+                items, sess.inbox = items[: i + 1], items[i + 1 :] + sess.inbox
+                sess.input_scheduled = True
+                asyncio.get_running_loop().call_soon(self._flush_input, sess)
+                break
+        data = b"".join(d for d, _, _ in items)
+        try:
+            n = sess.pty.write(data)
+        except Exception as e:
+            print(f"Error writing to PTY {sess.id}: {e}")
+            # Mark session as exited if write fails
+            sess.status = "exited"
+            return
+        if n is not None and n < len(data):
+            # Bufor wejścia PTY pełny (np. ogromne wklejenie) - resztę dopisz za chwilę.
+            # Potwierdzenia i znaczniki tylko dla wiadomości zapisanych w całości;
+            # przecięta wraca do kolejki ze swoimi.
+            written, rest, pos = [], [], 0
+            for d, probe, ack in items:
+                if pos + len(d) <= n:
+                    written.append((d, probe, ack))
+                else:
+                    rest.append((d[max(0, n - pos) :], probe, ack))
+                pos += len(d)
+            items, sess.inbox = written, rest + sess.inbox
+            if not sess.input_scheduled:
+                sess.input_scheduled = True
+                asyncio.get_running_loop().call_later(0.01, self._flush_input, sess)
+            data = data[:n]
+        t_write = time.perf_counter()
+        for _, probe, ack in items:
+            if probe:
+                probe.t_write = t_write
+                sess.pending_probe = probe
+            if ack:
+                ack.offset = sess.output_offset
+                try:
+                    ack.queue.put_nowait(ack)
+                except asyncio.QueueFull:
+                    pass
+        sess.last_activity_at = time.time()
+        metrics.SESSION_INPUT_BYTES.labels(sess.id).inc(len(data))
+        metrics.INPUT_BATCH_MESSAGES.observe(len(items))
+        if sess.recorder:
+            sess.recorder.input(data.decode("utf-8", errors="replace"))
 
     async def resize(self, sid: str, cols: int, rows: int) -> None:
         async with self._lock:
             sess = self.sessions.get(sid)
             if not sess or sess.status != "running" or not sess.pty:
                 return
+            # Wejście wysłane przed zmianą rozmiaru musi trafić do PTY pierwsze
+            self._flush_input(sess)
             try:
                 sess.cols = cols
                 sess.rows = rows
                 sess.pty.resize(cols=cols, rows=rows)
                 sess.last_activity_at = time.time()
+                if sess.recorder:
+                    sess.recorder.resize(cols, rows)
+                if sess.share:
+                    sess.share.append(Resize(sess.output_offset, cols, rows), 0)
+                self.events.publish("resized", sid, cols=cols, rows=rows)
             except Exception as e:
                 print(f"Error resizing PTY {sid}: {e}")
 
     async def get_scrollback(self, sid: str) -> str:
         async with self._lock:
             sess = self.sessions.get(sid)
-            return sess.scrollback if sess else ""
+            return sess.scrollback.text() if sess else ""
+
+    def memory_stats(self) -> dict:
+        scrollback = spilled = 0
+        for s in self.sessions.values():
+            scrollback += s.scrollback.memory_bytes()
+            spilled += s.scrollback.spilled_bytes()
+        # Kolejki trzymają fragmenty po maks. READ_SIZE znaków - szacujemy od góry
+        queued = sum(q.qsize() for subs in self.subscribers.values() for q in subs) * READ_SIZE
+        # Wpisy logu są współdzielone z kolejkami, ale log trzyma je dłużej
+        shared = sum(s.share.chars for s in self.sessions.values() if s.share)
+        budget = int(get_effective_settings(self.db).get("memory_budget_bytes", 0))
+        return {
+            "budget_bytes": budget,
+            "used_bytes": scrollback + queued + shared,
+            "scrollback_bytes": scrollback,
+            "queued_bytes": queued,
+            "share_log_bytes": shared,
+            "spilled_bytes": spilled,
+            "evicted_bytes_total": self.evicted_bytes_total,
+            "sessions_in_memory": len(self.sessions),
+        }
+
+    @property
+    def spill(self) -> SpillStore:
+        if self._spill is None:
+            self._spill = SpillStore(Path(self.db.path).parent / "spill")
+        return self._spill
+
+    def enforce_memory_budget(self, force: bool = False) -> int:
+        """Spill scrollback blocks to disk until usage fits the global budget.
+
+        Victims are picked detached and finished sessions first, then by
+        least recent activity. Returns the number of bytes freed.
+        """
+        now = time.time()
+        if not force and now - self._budget_checked_at < BUDGET_CHECK_EVERY:
+            return 0
+        self._budget_checked_at = now
+
+        stats = self.memory_stats()
+        budget = stats["budget_bytes"]
+        if budget <= 0 or stats["used_bytes"] <= budget:
+            return 0
+
+        # Zwalniamy z zapasem, żeby nie wracać tu przy każdym sprawdzeniu
+        target = stats["used_bytes"] - int(budget * 0.9)
+        victims = sorted(
+            self.sessions.values(),
+            key=lambda s: (s.status == "running", bool(self.subscribers.get(s.id)), s.last_activity_at),
+        )
+        freed = 0
+        for s in victims:
+            if freed >= target:
+                break
+            try:
+                freed += s.scrollback.spill(self.spill, s.id, include_tail=s.status != "running")
+            except OSError as e:
+                print(f"Error spilling scrollback for {s.id}: {e}")
+                break
+        self.evicted_bytes_total += freed
+        return freed
+
+    def _search_rows(self, segments: list, match: str, session_id: str | None, limit: int) -> list:
+        self.db.add_scrollback_segments(segments)
+        return self.db.search_scrollback(match, session_id=session_id, limit=limit)
+
+    async def search(self, query: str, session_id: str | None = None, limit: int = 50) -> list[dict]:
+        """Full-text search over live and historical scrollback.
+
+        ``offset`` is the stream offset of the matching segment;
+        ``replay_offset`` is its position within the current replay, or
+        None if that part of the scrollback was already truncated.
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        # Świeże wyjście (jeszcze buforowane) też ma być widoczne; zapis i zapytanie poza pętlą
+        segments = self.indexer.take(force=True)
+        rows = await asyncio.get_running_loop().run_in_executor(
+            None, self._search_rows, segments, match, session_id, limit
+        )
+        async with self._lock:
+            out = []
+            for r in rows:
+                sess = self.sessions.get(r["session_id"])
+                replay_offset = None
+                if sess:
+                    base = sess.output_offset - len(sess.scrollback)
+                    if r["start_offset"] >= base:
+                        replay_offset = r["start_offset"] - base
+                out.append(
+                    {
+                        "session_id": r["session_id"],
+                        "offset": r["start_offset"],
+                        "replay_offset": replay_offset,
+                        "snippet": r["snippet"],
+                        "status": sess.status if sess else r["status"],
+                        "cwd": r["cwd"],
+                        "shell": r["shell"],
+                        "created_at": r["created_at"],
+                    }
+                )
+            return out
 
     async def subscribe(self, sid: str) -> asyncio.Queue[str]:
         q: asyncio.Queue[str] = asyncio.Queue(maxsize=300)
@@ -274,90 +754,360 @@ class TerminalManager:
             subs = self.subscribers.get(sid)
             if subs and q in subs:
                 subs.remove(q)
+            self.hidden.pop(q, None)
+            self.stalled.pop(q, None)
 
-    async def _broadcast(self, sid: str, chunk: str) -> None:
-        async with self._lock:
-            subs = list(self.subscribers.get(sid, set()))
-        for q in subs:
+    def set_visible(self, sid: str, q: asyncio.Queue, visible: bool) -> None:
+        """Pause output to a hidden subscriber; catch it up when it is shown again.
+
+        Synchronous on purpose: together with the synchronous ``_broadcast``
+        the offsets cannot move in between, so no chunk is lost or doubled.
+        """
+        sess = self.sessions.get(sid)
+        if not sess or q not in self.subscribers.get(sid, set()):
+            return
+        if not visible:
+            self.hidden.setdefault(q, self.stalled.pop(q, sess.output_offset))
+            return
+        since = self.hidden.pop(q, None)
+        if since is not None:
+            self._resync(sess, q, since)
+
+    def resume(self, sid: str, q: asyncio.Queue) -> None:
+        """Catch up a subscriber whose queue overflowed, once its consumer has drained it.
+
+        Consumers call this whenever their queue is empty; it is a no-op
+        unless output was dropped for ``q``.
+        """
+        if q not in self.stalled or not q.empty():
+            return
+        since = self.stalled.pop(q)
+        sess = self.sessions.get(sid)
+        if sess:
+            self._resync(sess, q, since)
+
+    def _resync(self, sess: Session, q: asyncio.Queue, since: int) -> None:
+        # Sesja w trybie streszczania - karta dogoni przy następnej migawce
+        if sess.flooding:
+            since = min(since, sess.flood_since)
+        chunk = self._catchup(sess, since)
+        if chunk is None:
+            return
+        try:
+            q.put_nowait(Output(sess.output_offset, chunk))
+        except asyncio.QueueFull:
+            self._stall(sess.id, q, since)
+
+    def _stall(self, sid: str, q: asyncio.Queue, since: int) -> None:
+        # Dalsze wyjście nie trafi do kolejki, dopóki klient jej nie opróżni (resume)
+        metrics.DROPPED_CHUNKS.labels(sid).inc()
+        metrics.DROPPED_CHUNKS_ALL.inc()
+        self.stalled[q] = since
+
+    def _catchup(self, sess: Session, since: int) -> str | None:
+        """Output a client that has seen everything up to ``since`` is missing."""
+        missed = sess.output_offset - since
+        if missed <= 0:
+            return None
+        if missed <= CATCHUP_MAX_CHARS and missed <= len(sess.scrollback):
+            return sess.scrollback.tail(missed)
+        # Za dużo do odtworzenia - reset terminala (RIS) i ogon od początku linii
+        tail = sess.scrollback.tail(CATCHUP_MAX_CHARS)
+        nl = tail.find("\n")
+        return "\x1bc" + (tail[nl + 1 :] if nl >= 0 else tail)
+
+    def _summarize(self, sess: Session) -> None:
+        """Flooding session: send a screen snapshot now and then, or resume streaming."""
+        now = time.monotonic()
+        if self.limiter.recovered(sess.id, sess.limit_key):
+            sess.flooding = False
+            chunk = self._catchup(sess, sess.flood_since)
+            if chunk is not None:
+                self._broadcast(sess.id, chunk, sess.output_offset)
+            return
+        if now - sess.flood_snapshot_at < self.snapshot_interval or sess.output_offset == sess.flood_since:
+            return
+        # Migawka: reset terminala i ostatni ekran (rows linii)
+        lines = sess.scrollback.tail(SNAPSHOT_CHARS).split("\n")
+        self._broadcast(sess.id, "\x1bc" + "\n".join(lines[-sess.rows :]), sess.output_offset)
+        sess.flood_since = sess.output_offset
+        sess.flood_snapshot_at = now
+
+    def _broadcast(self, sid: str, chunk: str, offset: int) -> None:
+        item = Output(offset, chunk)
+        for q in self.subscribers.get(sid, ()):
+            if q in self.hidden or q in self.stalled:
+                continue
             try:
-                q.put_nowait(chunk)
+                q.put_nowait(item)
             except asyncio.QueueFull:
-                pass
+                self._stall(sid, q, offset - len(chunk))
+        sess = self.sessions.get(sid)
+        if sess and sess.share:
+            # Jeden wpis dla wszystkich widzów, bez względu na ich liczbę
+            sess.share.append(item, len(chunk))
+
+    # ---------- udostępnianie tylko do odczytu ----------
+    def shared_session(self, sid: str, epoch: int) -> Session | None:
+        """The running session a share token (``sid``, ``epoch``) still grants access to."""
+        sess = self.sessions.get(sid)
+        if not sess or sess.status != "running" or sess.share_epoch != epoch:
+            return None
+        return sess
 
-    async def _pump_output(self, sess: Session, scrollback_limit: int, idle_ttl: int) -> None:
-        last_flush = 0.0
-        flush_every = 0.5
-        loop = asyncio.get_event_loop()
+    def open_share(self, sess: Session) -> tuple[ShareLog, Spectator, str]:
+        """Add a spectator to the session's log; returns it with the log and its replay.
 
+        Synchronous like ``set_visible``: the replay ends exactly where the
+        spectator's position starts, so nothing is lost or doubled.
+        """
+        if sess.share is None:
+            sess.share = ShareLog(sess.output_offset, max_lag=CATCHUP_MAX_CHARS)
+        sp = sess.share.join(sess.output_offset)
+        return sess.share, sp, self._catchup(sess, 0) or ""
+
+    def close_share(self, sid: str, log: ShareLog, sp: Spectator) -> None:
+        log.leave(sp)
+        sess = self.sessions.get(sid)
+        if sess and sess.share is log and not log.spectators:
+            sess.share = None  # ostatni widz wyszedł - log już niepotrzebny
+
+    def share_skip(self, sid: str, log: ShareLog, sp: Spectator) -> str | None:
+        """Move a spectator that fell behind to the present; returns what to show instead."""
+        sess = self.sessions.get(sid)
+        chunk = self._catchup(sess, sp.offset) if sess else None
+        log.skip(sp, sess.output_offset if sess else log.offset)
+        self.share_skips += 1
+        metrics.SHARE_SKIPS.inc()
+        return chunk
+
+    def revoke_shares(self, sid: str) -> int:
+        """Invalidate every share token of a session and disconnect its spectators."""
+        sess = self.sessions.get(sid)
+        if not sess:
+            return 0
+        sess.share_epoch += 1
+        n = 0
+        if sess.share:
+            n = len(sess.share.spectators)
+            sess.share.close("revoked")
+            sess.share = None
+        return n
+
+    def share_stats(self) -> dict:
+        logs = [s.share for s in self.sessions.values() if s.share]
+        return {
+            "shared_sessions": len(logs),
+            "spectators": sum(len(log.spectators) for log in logs),
+            "log_chars": sum(log.chars for log in logs),
+            "skips": self.share_skips,
+        }
+
+    def _start_output(self, sess: Session, idle_ttl: int) -> None:
+        """Start delivering the session's PTY output and schedule its idle expiry."""
+        sess.idle_ttl = idle_ttl
+        if idle_ttl:
+            self.scheduler.call_later(idle_ttl, ("idle", sess.id), lambda: self._check_idle(sess))
+        if IS_WINDOWS:
+            sess.output_task = asyncio.create_task(self._pump_output(sess))
+        else:
+            self._resume_reader(sess)
+
+    def _resume_reader(self, sess: Session) -> None:
+        if sess.pty and sess.status == "running":
+            asyncio.get_running_loop().add_reader(sess.pty.master_fd, self._on_readable, sess)
+
+    def _on_readable(self, sess: Session) -> None:
+        """Unix: the loop calls this only when the PTY has output - idle sessions cost nothing."""
+        loop = asyncio.get_running_loop()
+        loop.remove_reader(sess.pty.master_fd)
+        t0 = time.perf_counter()
         try:
-            while True:
-                if not sess.pty or sess.status != "running":
-                    return
+            if sess.flooding:
+                out = _drain(sess.pty, FLOOD_READ_SIZE)
+            else:
+                out = sess.pty.read(READ_SIZE)
+        except OSError:
+            asyncio.ensure_future(self._pty_closed(sess))
+            return
+        if out:
+            self._handle_output(sess, out, t0)
+        else:
+            # Czytelny, ale pusty: EOF (macOS) albo fałszywy alarm
+            code = sess.pty.exit_code()
+            if code is not None:
+                asyncio.ensure_future(self._pty_closed(sess, code))
+                return
+        # Kolejny odczyt po chwili - wyjście z tego czasu trafi do jednej ramki
+        loop.call_later(FLOOD_POLL if sess.flooding else OUTPUT_BATCH, self._resume_reader, sess)
 
-                # Run blocking I/O in executor to prevent freezing
+    async def _pump_output(self, sess: Session) -> None:
+        """Windows: winpty has no pollable descriptor, so read in the executor."""
+        loop = asyncio.get_running_loop()
+        try:
+            while sess.pty and sess.status == "running":
+                t0 = time.perf_counter()
                 try:
-                    out = await loop.run_in_executor(None, sess.pty.read, 4096)
-                except Exception as e:
-                    # PTY closed or error
-                    print(f"Error reading from PTY {sess.id}: {e}")
-                    await self.kill_session(sess.id)
+                    if sess.flooding:
+                        out = await loop.run_in_executor(None, _drain, sess.pty, FLOOD_READ_SIZE)
+                    else:
+                        out = await loop.run_in_executor(None, sess.pty.read, READ_SIZE)
+                except Exception:
+                    await self._pty_closed(sess)
                     return
-
                 if out:
-                    text = out.decode("utf-8", errors="ignore")
-                    sess.scrollback = self._truncate_scrollback(
-                        sess.scrollback + text,
-                        scrollback_limit,
-                    )
-                    sess.last_activity_at = time.time()
-                    await self._broadcast(sess.id, text)
-
-                now = time.time()
-                if now - last_flush >= flush_every:
-                    last_flush = now
-                    # Get PID properly
-                    pid = None
-                    if sess.pty:
-                        try:
-                            pid = sess.pty.pid
-                        except Exception:
-                            pass
-
-                    self.db.upsert_session(
-                        session_id=sess.id,
-                        cwd=sess.cwd,
-                        shell=sess.shell,
-                        pid=pid,
-                        status=sess.status,
-                        created_at=sess.created_at,
-                        last_activity_at=sess.last_activity_at,
-                        cols=sess.cols,
-                        rows=sess.rows,
-                        scrollback=sess.scrollback,
-                    )
-
-                if idle_ttl and (time.time() - sess.last_activity_at) > idle_ttl:
-                    await self.kill_session(sess.id)
+                    self._handle_output(sess, out, t0)
+                elif sess.pty.exit_code() is not None:
+                    await self._pty_closed(sess)
                     return
-
-                await asyncio.sleep(0.02)
+                # Sesje w zalewie odpytywane rzadziej - pętla obsługuje najpierw interaktywne
+                await asyncio.sleep(FLOOD_POLL if sess.flooding else OUTPUT_BATCH)
         except asyncio.CancelledError:
             return
         except Exception as e:
             print(f"Unexpected error in _pump_output for {sess.id}: {e}")
+
+    async def _pty_closed(self, sess: Session, code: int | None = None) -> None:
+        # PTY zamknięty - zwykle powłoka się zakończyła; odbierz jej kod wyjścia
+        if code is None and sess.pty:
+            code = await asyncio.get_running_loop().run_in_executor(None, sess.pty.exit_code, 1.0)
+        if code is None:
+            print(f"PTY of session {sess.id} closed without an exit status")
+        await self.kill_session(sess.id, status="exited", exit_code=code)
+
+    def _handle_output(self, sess: Session, out: bytes, t0: float) -> None:
+        metrics.PTY_READ_BYTES.observe(len(out))
+        # Niepełny znak UTF-8 na końcu odczytu zostaje w dekoderze do następnego
+        text = sess.decoder.decode(out)
+        if not text:
             return
-        except Exception:
-            sess.status = "exited"
-            sess.last_activity_at = time.time()
-            self.db.upsert_session(
-                session_id=sess.id,
-                cwd=sess.cwd,
-                shell=sess.shell,
-                pid=getattr(sess.pty, "pid", None) if sess.pty else None,
-                status=sess.status,
-                created_at=sess.created_at,
-                last_activity_at=sess.last_activity_at,
-                cols=sess.cols,
-                rows=sess.rows,
-                scrollback=sess.scrollback,
-            )
\ No newline at end of file
+        t_read = time.perf_counter()
+        sess.scrollback.append(text)
+        if sess.recorder:
+            sess.recorder.output(text)
+        self.indexer.feed(sess.id, sess.output_offset, text)
+        sess.output_offset += len(text)
+        sess.last_activity_at = time.time()
+        self._mark_dirty(sess)
+        metrics.SESSION_OUTPUT_CHARS.labels(sess.id).inc(len(text))
+        if t_read - sess.activity_published_at >= ACTIVITY_EVENT_EVERY:
+            sess.activity_published_at = t_read
+            self.events.touch(sess.id, last_activity_at=sess.last_activity_at, flooding=sess.flooding)
+        # Pełny odczyt (PTY zwraca do ~4k naraz) = sesja produkuje ile może
+        admitted = self.limiter.admit(sess.id, sess.limit_key, len(text), len(out) >= READ_SIZE // 2)
+        if sess.flooding:
+            metrics.OUTPUT_SUMMARIZED_CHARS.labels(sess.id).inc(len(text))
+        elif admitted:
+            self._broadcast(sess.id, text, sess.output_offset)
+        else:
+            # Zalew wyjścia - od teraz tylko migawki ekranu
+            sess.flooding = True
+            sess.flood_since = sess.output_offset - len(text)
+            sess.flood_snapshot_at = 0.0
+            metrics.OUTPUT_FLOODS.inc()
+            metrics.OUTPUT_SUMMARIZED_CHARS.labels(sess.id).inc(len(text))
+            self.scheduler.call_later(FLOOD_POLL, ("flood", sess.id), lambda: self._flood_tick(sess))
+        if sess.pending_probe:
+            # Znacznik trafia tylko do kolejki klienta, który go wysłał
+            probe, sess.pending_probe = sess.pending_probe, None
+            probe.t_read = t_read
+            try:
+                probe.queue.put_nowait(probe)
+            except asyncio.QueueFull:
+                pass
+        metrics.PUMP_ITERATION_SECONDS.observe(time.perf_counter() - t0)
+
+    # ---------- zadania harmonogramu ----------
+    def configure_heartbeat(self, cfg: dict) -> None:
+        """(Re)schedule the WebSocket heartbeat; needs a running event loop."""
+        self.heartbeat.configure(cfg)
+        if self.heartbeat.interval > 0:
+            self.scheduler.every(self.heartbeat.interval, "heartbeat", self._heartbeat)
+        else:
+            self.scheduler.cancel("heartbeat")
+
+    def _mark_dirty(self, sess: Session) -> None:
+        self._dirty.add(sess.id)
+        if not self.scheduler.scheduled("persist"):
+            self.scheduler.call_later(PERSIST_EVERY, "persist", self._persist_dirty)
+
+    def _save_session(self, sess: Session, pid: int | None) -> None:
+        """Upsert the session row; only scrollback blocks frozen since the last save are written."""
+        blocks, first, upto = sess.scrollback.delta()
+        self.db.upsert_session(
+            session_id=sess.id,
+            cwd=sess.cwd,
+            shell=sess.shell,
+            pid=pid,
+            status=sess.status,
+            created_at=sess.created_at,
+            last_activity_at=sess.last_activity_at,
+            cols=sess.cols,
+            rows=sess.rows,
+            scrollback_z=sess.scrollback.tail_bytes(),
+            output_offset=sess.output_offset,
+            blocks=blocks,
+            first_block=first,
+        )
+        sess.scrollback.mark_saved(upto)
+
+    def _persist_dirty(self) -> None:
+        """Write sessions changed since the last pass (one timer for all of them)."""
+        dirty, self._dirty = self._dirty, set()
+        for sid in dirty:
+            sess = self.sessions.get(sid)
+            if not sess or sess.status != "running":
+                continue
+            self.indexer.flush(sid)
+            self.indexer.prune(sid, sess.output_offset - len(sess.scrollback))
+            # Get PID properly
+            pid = None
+            if sess.pty:
+                try:
+                    pid = sess.pty.pid
+                except Exception:
+                    pass
+            self._save_session(sess, pid)
+        self.enforce_memory_budget()
+
+    def _check_idle(self, sess: Session):
+        if sess.status != "running":
+            return None
+        remaining = sess.last_activity_at + sess.idle_ttl - time.time()
+        if remaining > 0:
+            # Była aktywność od zaplanowania - przełóż na nowy termin
+            self.scheduler.call_later(remaining, ("idle", sess.id), lambda: self._check_idle(sess))
+            return None
+        return self.kill_session(sess.id)
+
+    def _flood_tick(self, sess: Session) -> None:
+        # Migawki i wyjście z trybu streszczania także wtedy, gdy sesja nagle ucichnie
+        if sess.status != "running":
+            return
+        self._summarize(sess)
+        if sess.flooding:
+            self.scheduler.call_later(FLOOD_POLL, ("flood", sess.id), lambda: self._flood_tick(sess))
+
+    def _heartbeat(self) -> None:
+        for peer in self.heartbeat.sweep():
+            self._reclaim(peer)
+
+    def _reclaim(self, peer: Peer) -> None:
+        """Drop a dead peer's subscriptions and free what was queued for it."""
+        freed = 0
+        for sid, q in peer.queues():
+            subs = self.subscribers.get(sid)
+            if subs and q in subs:
+                subs.remove(q)
+            self.hidden.pop(q, None)
+            self.stalled.pop(q, None)
+            while not q.empty():
+                item = q.get_nowait()
+                if isinstance(item, Output):
+                    freed += len(item.data.encode("utf-8"))
+        peer.close()
+        self.heartbeat.reclaimed_connections += 1
+        self.heartbeat.reclaimed_bytes += freed
+        metrics.WS_PEERS_RECLAIMED.labels(peer.kind).inc()
+        metrics.WS_RECLAIMED_BYTES.inc(freed)
+        print(f"Reclaimed unresponsive {peer.kind} WebSocket ({freed} queued bytes)")
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import itertools
+import time
+import zlib
+from dataclasses import dataclass, field
+
+from . import metrics
+
+_ids = itertools.count(1)
+
+
+@dataclass
+class CompressionStats:
+    endpoint: str
+    id: int = field(default_factory=lambda: next(_ids))
+    started_at: float = field(default_factory=time.time)
+    raw_bytes: int = 0
+    sent_bytes: int = 0
+    frames_compressed: int = 0
+    frames_plain: int = 0
+    cpu_seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "endpoint": self.endpoint,
+            "started_at": self.started_at,
+            "raw_bytes": self.raw_bytes,
+            "sent_bytes": self.sent_bytes,
+            "ratio": round(self.raw_bytes / self.sent_bytes, 2) if self.sent_bytes else None,
+            "frames_compressed": self.frames_compressed,
+            "frames_plain": self.frames_plain,
+            "cpu_ms": round(self.cpu_seconds * 1000, 3),
+        }
+
+
+class Deflater:
+    """Application-level raw deflate for one WebSocket connection.
+
+    Negotiated per connection (the client asks with ``?compress=deflate``).
+    Batches of JSON messages are sent as one binary frame, each message on
+    its own line and the batch closed by an empty line (JSON text never
+    contains a raw newline); batches smaller than ``min_bytes`` go out as
+    plain text frames, so single keystroke echoes are not inflated by
+    deflate overhead.
+
+    With ``context_takeover`` one compressor spans the whole connection
+    (``Z_SYNC_FLUSH`` after each frame, the client keeps one decompression
+    stream); without it every frame is a complete, independent deflate stream.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        level: int = 6,
+        window_bits: int = 15,
+        context_takeover: bool = True,
+        min_bytes: int = 256,
+    ) -> None:
+        self.level = min(max(level, 1), 9)
+        self.window_bits = min(max(window_bits, 9), 15)
+        self.context_takeover = context_takeover
+        self.min_bytes = max(0, min_bytes)
+        self.stats = CompressionStats(endpoint)
+        self._z = self._new() if context_takeover else None
+        ACTIVE[self.stats.id] = self.stats
+
+    def _new(self):
+        return zlib.compressobj(self.level, zlib.DEFLATED, -self.window_bits, memLevel=8)
+
+    def params(self) -> dict:
+        return {
+            "type": "compression",
+            "algorithm": "deflate-raw",
+            "context_takeover": self.context_takeover,
+            "min_bytes": self.min_bytes,
+        }
+
+    def encode(self, texts: list[str]) -> list[str] | bytes:
+        """Either the texts unchanged (send as text frames) or one compressed frame."""
+        raw = ("\n".join(texts) + "\n\n").encode("utf-8")
+        if len(raw) < self.min_bytes:
+            self.stats.frames_plain += len(texts)
+            self.stats.raw_bytes += len(raw)
+            self.stats.sent_bytes += len(raw)
+            return texts
+        t0 = time.thread_time()
+        if self._z is not None:
+            data = self._z.compress(raw) + self._z.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            z = self._new()
+            data = z.compress(raw) + z.flush(zlib.Z_FINISH)
+        cpu = time.thread_time() - t0
+        self.stats.cpu_seconds += cpu
+        self.stats.frames_compressed += 1
+        self.stats.raw_bytes += len(raw)
+        self.stats.sent_bytes += len(data)
+        metrics.WS_COMPRESSION_BYTES.labels("raw").inc(len(raw))
+        metrics.WS_COMPRESSION_BYTES.labels("compressed").inc(len(data))
+        metrics.WS_COMPRESSION_SECONDS.inc(cpu)
+        return data
+
+    def close(self) -> None:
+        ACTIVE.pop(self.stats.id, None)
+        TOTALS["connections"] += 1
+        TOTALS["raw_bytes"] += self.stats.raw_bytes
+        TOTALS["sent_bytes"] += self.stats.sent_bytes
+        TOTALS["cpu_seconds"] += self.stats.cpu_seconds
+
+
+# Aktywne połączenia i suma zamkniętych (do /api/stats)
+ACTIVE: dict[int, CompressionStats] = {}
+TOTALS = {"connections": 0, "raw_bytes": 0, "sent_bytes": 0, "cpu_seconds": 0.0}
+
+
+def from_settings(endpoint: str, cfg: dict) -> Deflater | None:
+    if not bool(cfg.get("ws_compression_enabled", False)):
+        return None
+    return Deflater(
+        endpoint,
+        level=int(cfg.get("ws_compression_level", 6)),
+        window_bits=int(cfg.get("ws_compression_window_bits", 15)),
+        context_takeover=bool(cfg.get("ws_compression_context_takeover", True)),
+        min_bytes=int(cfg.get("ws_compression_min_bytes", 256)),
+    )
+
+
+def stats() -> dict:
+    closed = dict(TOTALS)
+    closed["ratio"] = round(closed["raw_bytes"] / closed["sent_bytes"], 2) if closed["sent_bytes"] else None
+    closed["cpu_ms"] = round(closed.pop("cpu_seconds") * 1000, 3)
+    return {"connections": [s.as_dict() for s in ACTIVE.values()], "closed": closed}